@@ -0,0 +1,157 @@
+from itertools import chain
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.categories import BENCHMARK_CATEGORIES, FIXED_EXPENSE_CATEGORIES, MAX_GOAL_MONTHS, canonical_category
+
+def expense_matrix(expense_dicts: Sequence[Dict[str, float]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Pack per-user expense dicts into a category x user matrix.
+
+    Returns (labels, codes, values). Row i of column j holds user j's i-th
+    expense in their own dict order (zero-padded), and codes[i, j] indexes its
+    category name in labels (-1 for padding). Keeping each user's order means
+    column sums add values exactly as Python's sum() does, so results match
+    the scalar path bit for bit.
+    """
+
+    users = len(expense_dicts)
+    lengths = np.fromiter(map(len, expense_dicts), dtype=np.intp, count=users)
+    total = int(lengths.sum())
+
+    flat_names = list(chain.from_iterable(expenses.keys() for expenses in expense_dicts))
+    flat_values = np.fromiter(chain.from_iterable(expenses.values() for expenses in expense_dicts),
+                              dtype=float, count=total)
+    labels = list(dict.fromkeys(flat_names))
+    index = {name: code for code, name in enumerate(labels)}
+    flat_codes = np.fromiter(map(index.__getitem__, flat_names), dtype=np.intp, count=total)
+
+    # Position of each entry inside its own user's dict, and the user it belongs to
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if users else np.zeros(0, dtype=np.intp)
+    rows = np.arange(total) - np.repeat(starts, lengths)
+    cols = np.repeat(np.arange(users), lengths)
+
+    shape = (int(lengths.max()) if users else 0, users)
+    values = np.zeros(shape)
+    codes = np.full(shape, -1, dtype=np.intp)
+    values[rows, cols] = flat_values
+    codes[rows, cols] = flat_codes
+    return labels, codes, values
+
+def _category_mask(canonical: List[Optional[str]], codes: np.ndarray, categories: Sequence[str]) -> np.ndarray:
+    """Boolean matrix marking cells whose canonical category is in `categories`."""
+
+    wanted = set(categories)
+    # Lookup table indexed by code; the extra trailing False covers padding (-1)
+    lookup = np.zeros(len(canonical) + 1, dtype=bool)
+    lookup[[code for code, category in enumerate(canonical) if category in wanted]] = True
+    return lookup[codes]
+
+def _sequential_sum(values: np.ndarray) -> np.ndarray:
+    """
+    Column sums that add rows strictly in order, like the scalar sum() loops.
+    (np.sum uses pairwise summation along contiguous axes, which can differ in the last bit.)
+    """
+
+    if not values.shape[0]:
+        return np.zeros(values.shape[1])
+    return np.add.accumulate(values, axis=0)[-1]
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator * 100, or 0 where the denominator is not positive."""
+
+    return np.where(denominator > 0, numerator / denominator * 100, 0.0)
+
+def compute_budget_metrics(incomes: Sequence[float], values: np.ndarray, labels: List[str],
+                           codes: Optional[np.ndarray] = None,
+                           savings_goals: Optional[Sequence[float]] = None,
+                           goals: Optional[Sequence[List[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+    """
+    Compute budget-summary and spending-insight figures for many users at once.
+
+    `values` is a category x user matrix. Without `codes`, `labels` names each
+    row for every user; with `codes` (as returned by expense_matrix) each cell
+    carries its own category. Every result is an array with one entry per
+    user, except `shares` (same shape as `values`) and the flat per-goal arrays.
+    """
+
+    # Zero incomes, totals or goal months yield 0 / inf instead of raising
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _compute_budget_metrics(incomes, values, labels, codes, savings_goals, goals)
+
+def _compute_budget_metrics(incomes, values, labels, codes, savings_goals, goals) -> Dict[str, Any]:
+    incomes = np.asarray(incomes, dtype=float)
+    values = np.asarray(values, dtype=float)
+
+    total_expenses = _sequential_sum(values)
+    surplus = incomes - total_expenses
+
+    if codes is None:
+        codes = np.broadcast_to(np.arange(len(labels))[:, None], values.shape)
+    # Free-form labels ("Rent ", "groceries") resolve once per distinct label, not per user
+    canonical = [canonical_category(label) for label in labels]
+    fixed_mask = _category_mask(canonical, codes, FIXED_EXPENSE_CATEGORIES)
+    fixed_total = _sequential_sum(np.where(fixed_mask, values, 0.0))
+    variable_total = _sequential_sum(np.where(fixed_mask, 0.0, values))
+
+    shares = np.where(total_expenses != 0, values / total_expenses * 100, 0.0)
+
+    metrics = {
+        "total_expenses": total_expenses,
+        "surplus": surplus,
+        "annual_income": incomes * 12,
+        "annual_expenses": total_expenses * 12,
+        "savings_rate": _safe_ratio(surplus, incomes),
+        "shares": shares,
+        "fixed_mask": fixed_mask,
+        "fixed_total": fixed_total,
+        "variable_total": variable_total,
+    }
+
+    for ratio, category in BENCHMARK_CATEGORIES.items():
+        mask = _category_mask(canonical, codes, [category])
+        amount = _sequential_sum(np.where(mask, values, 0.0))
+        metrics[f"{ratio}_ratio"] = _safe_ratio(amount, incomes)
+
+    if savings_goals is not None:
+        metrics["savings_potential"] = np.maximum(0, surplus - np.asarray(savings_goals, dtype=float))
+
+    if goals is not None:
+        counts = np.array([len(user_goals) for user_goals in goals], dtype=np.intp)
+        owners = np.repeat(np.arange(len(goals)), counts)
+        amounts = np.array([g["amount"] for user_goals in goals for g in user_goals], dtype=float)
+        months = np.array([g["months"] for user_goals in goals for g in user_goals], dtype=float)
+        # Whole months due, as goal_deadline rounds them for the simulation
+        monthly_needed = amounts / np.clip(np.ceil(months), 1, MAX_GOAL_MONTHS)
+        achievable = surplus[owners] >= monthly_needed
+        misses = np.bincount(owners[~achievable], minlength=len(goals))
+        metrics.update({
+            "goal_offsets": np.concatenate(([0], np.cumsum(counts))),
+            "goal_monthly_needed": monthly_needed,
+            "goal_achievable": achievable,
+            "goals_achievable": misses == 0,
+        })
+
+    return metrics
+
+def compute_user_metrics(income: float, expenses: Dict[str, float], savings_goal: Optional[float] = None,
+                         goals: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Single-user view of compute_budget_metrics with plain Python values."""
+
+    labels, codes, values = expense_matrix([expenses])
+    metrics = compute_budget_metrics(
+        [income], values, labels, codes,
+        savings_goals=None if savings_goal is None else [savings_goal],
+        goals=None if goals is None else [goals]
+    )
+
+    result = {}
+    for key, value in metrics.items():
+        if key in ("shares", "fixed_mask"):
+            result[key] = value[:len(expenses), 0].tolist()
+        elif key in ("goal_offsets", "goal_monthly_needed", "goal_achievable"):
+            result[key] = value.tolist()
+        else:
+            result[key] = value[0].item()
+    return result
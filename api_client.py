@@ -0,0 +1,186 @@
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import httpx
+
+from app.cache import LRUCache
+
+CONNECT_ERROR = "Could not connect to backend service. Please ensure the FastAPI server is running on port 8000."
+
+# Responses worth retrying: the backend or a proxy in front of it was briefly unavailable
+RETRY_STATUSES = (502, 503, 504)
+
+# Failures that happen before the backend could have acted on the request,
+# including a keep-alive connection the server closed while it sat idle
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+def request_key(endpoint: str, data: Dict[str, Any]) -> str:
+    """Cache key for a request: the endpoint plus the body with sorted keys and no whitespace."""
+
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{endpoint}\n{canonical}".encode("utf-8")).hexdigest()
+
+class BackendClient:
+    """
+    Pooled keep-alive HTTP client for the FastAPI backend, used by the frontend.
+
+    One instance is meant to live for the whole process, so reruns reuse warm
+    connections instead of paying TCP setup on every click. Every call has a
+    connect and a read timeout. The backend endpoints are pure computations
+    over the request body, so failed calls are retried with exponential
+    backoff and jitter. Errors are returned as {"error": ...} dicts, which is
+    what the pages render.
+
+    Calls made with `cached=True` are answered from an LRU/TTL cache keyed on
+    the canonical request JSON, so resubmitting an unchanged form renders
+    without a round trip. Errors and unfinished streams are never cached.
+    """
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", connect_timeout: float = 3.0,
+                 read_timeout: float = 60.0, retries: int = 2, backoff: float = 0.25,
+                 max_connections: int = 10, http2: bool = False, cache_size: int = 128,
+                 cache_ttl: float = 600.0):
+        # HTTP/2 needs the optional h2 package; without it keep-alive HTTP/1.1 is used
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.Client(
+            base_url=f"{base_url.rstrip('/')}/api/v1",
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            http2=self.http2,
+            # The pages only render answers and figures; leave prompts and NLU details out of the payload
+            params={"verbose": "false"},
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="backend-api")
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl) if cache_size > 0 else None
+
+    def _sleep_before_retry(self, attempt: int) -> None:
+        time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0))
+
+    def post(self, endpoint: str, data: Dict[str, Any], cached: bool = False) -> Dict[str, Any]:
+        """POST a JSON body to /api/v1/<endpoint> and return the decoded response."""
+
+        if not cached or self.cache is None:
+            return self._post(endpoint, data)
+        key = request_key(endpoint, data)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._post(endpoint, data)
+            if "error" not in result:
+                self.cache.set(key, result)
+        return result
+
+    def _post(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self.client.post(f"/{endpoint}", json=data)
+                if response.status_code in RETRY_STATUSES and not last_attempt:
+                    self._sleep_before_retry(attempt)
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except RETRY_ERRORS as e:
+                if last_attempt:
+                    return {"error": CONNECT_ERROR if isinstance(e, httpx.ConnectError) else f"Request failed: {e}"}
+                self._sleep_before_retry(attempt)
+            except httpx.TimeoutException:
+                return {"error": "The backend took too long to respond. Please try again."}
+            except Exception as e:
+                return {"error": f"Request failed: {str(e)}"}
+
+    def stream(self, endpoint: str, data: Dict[str, Any],
+               cached: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream a Server-Sent Events response, yielding (event, data) pairs.
+
+        Only opening the stream is retried; once tokens have been yielded a
+        failure ends the stream with an "error" event. A cached stream is
+        replayed at once; a stream is cached only if it ends with "done".
+        """
+
+        if not cached or self.cache is None:
+            yield from self._stream(endpoint, data)
+            return
+        key = request_key(endpoint, data)
+        events = self.cache.get(key)
+        if events is not None:
+            for event, payload in events:
+                yield event, payload
+            return
+        recorded: List[Tuple[str, Dict[str, Any]]] = []
+        for event, payload in self._stream(endpoint, data):
+            recorded.append((event, payload))
+            yield event, payload
+        if recorded and recorded[-1][0] == "done":
+            self.cache.set(key, recorded)
+
+    def _stream(self, endpoint: str, data: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        started = False
+        for attempt in range(self.retries + 1):
+            try:
+                with self.client.stream("POST", f"/{endpoint}", json=data) as response:
+                    response.raise_for_status()
+                    event = "message"
+                    for line in response.iter_lines():
+                        if line.startswith("event:"):
+                            event = line[6:].strip()
+                        elif line.startswith("data:"):
+                            started = True
+                            yield event, json.loads(line[5:])
+                            event = "message"
+                return
+            except RETRY_ERRORS as e:
+                if started or attempt == self.retries:
+                    detail = CONNECT_ERROR if isinstance(e, httpx.ConnectError) else f"Request failed: {e}"
+                    yield "error", {"detail": detail}
+                    return
+                self._sleep_before_retry(attempt)
+            except httpx.TimeoutException:
+                yield "error", {"detail": "The backend took too long to respond. Please try again."}
+                return
+            except Exception as e:
+                yield "error", {"detail": f"Request failed: {str(e)}"}
+                return
+
+    def fan_out(self, calls: Dict[str, Tuple[str, Dict[str, Any]]],
+                cached: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Run several POSTs concurrently: {name: (endpoint, data)} -> {name: response}.
+
+        The calls share the connection pool, so the total wait is roughly the
+        slowest call rather than the sum.
+        """
+
+        futures = {name: self.executor.submit(self.post, endpoint, data, cached)
+                   for name, (endpoint, data) in calls.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats() if self.cache is not None else {}
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        self.client.close()
+
+def create_backend_client(base_url: Optional[str] = None) -> BackendClient:
+    """Build a BackendClient from the BACKEND_URL / API_* environment variables."""
+
+    return BackendClient(
+        base_url=base_url or os.getenv("BACKEND_URL", "http://127.0.0.1:8000"),
+        connect_timeout=float(os.getenv("API_CONNECT_TIMEOUT", "3")),
+        read_timeout=float(os.getenv("API_READ_TIMEOUT", "60")),
+        retries=int(os.getenv("API_RETRIES", "2")),
+        backoff=float(os.getenv("API_RETRY_BACKOFF", "0.25")),
+        max_connections=int(os.getenv("API_MAX_CONNECTIONS", "10")),
+        http2=os.getenv("API_HTTP2", "false").lower() in ("1", "true", "yes"),
+        cache_size=int(os.getenv("FRONTEND_CACHE_SIZE", "128")),
+        cache_ttl=float(os.getenv("FRONTEND_CACHE_TTL", "600")),
+    )
@@ -0,0 +1,51 @@
+import asyncio
+from collections import deque
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Iterable
+
+from app.responses import dumps
+
+async def _run_item(func: Callable[[Any], Awaitable[Dict[str, Any]]], index: int, item: Any) -> Dict[str, Any]:
+    """Run one batch item, turning a failure into a per-item error record."""
+
+    try:
+        result = await func(item)
+        return {"index": index, "status": "success", **result}
+    except Exception as e:
+        return {"index": index, "status": "error", "detail": str(e)}
+
+async def map_ordered(func: Callable[[Any], Awaitable[Dict[str, Any]]], items: Iterable[Any],
+                      concurrency: int = 16) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Apply an async function to every item with at most `concurrency` items in
+    flight, yielding one record per item in input order.
+
+    Only a window of `concurrency` results is ever held, so memory does not
+    grow with the size of the batch.
+    """
+
+    items = enumerate(items)
+    window = deque()
+
+    def schedule() -> None:
+        for index, item in items:
+            window.append(asyncio.ensure_future(_run_item(func, index, item)))
+            return
+
+    for _ in range(concurrency):
+        schedule()
+
+    try:
+        while window:
+            record = await window.popleft()
+            schedule()
+            yield record
+    finally:
+        # The client went away mid-stream: don't leave work running
+        for task in window:
+            task.cancel()
+
+async def ndjson_lines(records: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode records as newline-delimited JSON."""
+
+    async for record in records:
+        yield dumps(record) + b"\n"
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+class _Batch:
+    """Prompts collected for one upstream call, with the futures their callers await."""
+
+    def __init__(self):
+        self.prompts: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.timeouts: List[Optional[float]] = []
+        self.handle: Optional[asyncio.Handle] = None
+
+class MicroBatcher:
+    """
+    Collect concurrent prompts into one multi-prompt upstream call.
+
+    The first prompt opens a batch, which is sent when it reaches `max_size`
+    or when its window closes; every caller then gets its own result back.
+    The window adapts to load: it is the time the batch is expected to take
+    to fill at the arrival rate of the last `horizon` seconds, capped at
+    `max_wait`, and zero when a second prompt is not expected within
+    `max_wait`, so light traffic is never held back. Batches are tracked per event loop, since their futures
+    belong to one.
+    """
+
+    def __init__(self, send: Callable[[List[str], Optional[float]], Awaitable[List[str]]],
+                 max_size: int = 8, max_wait: float = 0.01):
+        self.send = send
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending: Dict[asyncio.AbstractEventLoop, _Batch] = {}
+        self._tasks = set()
+        # Arrival times over the last `horizon` seconds, for the recent arrival rate
+        self.horizon = max(0.1, 20 * max_wait)
+        self._arrivals = deque()
+        self.batches = 0
+        self.prompts = 0
+        self.full = 0
+
+    def _observe_arrival(self) -> float:
+        """Record one arrival; return the arrival rate (per second) over the horizon."""
+        now = time.monotonic()
+        self._arrivals.append(now)
+        while self._arrivals[0] < now - self.horizon:
+            self._arrivals.popleft()
+        return len(self._arrivals) / self.horizon
+
+    def window(self, rate: float) -> float:
+        """Seconds a newly opened batch waits for company at `rate` arrivals per second."""
+        if rate * self.max_wait < 1:
+            return 0.0
+        return min(self.max_wait, (self.max_size - 1) / rate)
+
+    async def submit(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Queue one prompt for the next batch and wait for its result."""
+
+        loop = asyncio.get_running_loop()
+        rate = self._observe_arrival()
+        batch = self._pending.get(loop)
+        if batch is None:
+            batch = self._pending[loop] = _Batch()
+            window = self.window(rate)
+            # Even with no window, prompts submitted in the same loop iteration share the batch
+            batch.handle = (loop.call_later(window, self._flush, loop) if window
+                            else loop.call_soon(self._flush, loop))
+        future = loop.create_future()
+        batch.prompts.append(prompt)
+        batch.futures.append(future)
+        batch.timeouts.append(timeout)
+        if len(batch.prompts) >= self.max_size:
+            batch.handle.cancel()
+            self.full += 1
+            self._flush(loop)
+        return await asyncio.wait_for(future, timeout)
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        batch = self._pending.pop(loop, None)
+        if batch is None:
+            return
+        # Callers that gave up (timeout, hedge loser) while the batch was open are dropped from it
+        live = [i for i, future in enumerate(batch.futures) if not future.done()]
+        if not live:
+            return
+        prompts = [batch.prompts[i] for i in live]
+        futures = [batch.futures[i] for i in live]
+        timeouts = [batch.timeouts[i] for i in live]
+        timeout = None if None in timeouts else max(timeouts)
+        self.batches += 1
+        self.prompts += len(prompts)
+        task = loop.create_task(self._send(prompts, futures, timeout))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, prompts: List[str], futures: List[asyncio.Future], timeout: Optional[float]) -> None:
+        try:
+            results = await self.send(prompts, timeout)
+            if len(results) != len(prompts):
+                raise ValueError(f"batch of {len(prompts)} prompts returned {len(results)} results")
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "prompts": self.prompts,
+            "full_batches": self.full,
+            "mean_batch_size": round(self.prompts / self.batches, 3) if self.batches else 0.0,
+            "window_ms": round(self.window(len(self._arrivals) / self.horizon) * 1000, 3),
+        }
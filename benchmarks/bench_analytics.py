@@ -0,0 +1,81 @@
+"""
+Columnar budget analytics vs the per-user dict loops, for a whole portfolio.
+
+Checks that every figure matches the scalar computation exactly, then
+reports users/sec for both paths.
+
+    python -m benchmarks.bench_analytics --users 100000
+"""
+import argparse
+import random
+import time
+
+from app.analytics import compute_budget_metrics, expense_matrix
+
+CATEGORIES = ["rent", "food", "transportation", "utilities", "entertainment",
+              "shopping", "insurance", "loan_payment", "subscriptions", "travel"]
+
+def make_portfolio(users: int, seed: int = 11):
+    rng = random.Random(seed)
+    incomes, expenses, goals = [], [], []
+    for _ in range(users):
+        incomes.append(round(rng.uniform(1500, 12000), 2))
+        expenses.append({cat: round(rng.uniform(20, 2500), 2) for cat in rng.sample(CATEGORIES, rng.randint(3, 10))})
+        goals.append([{"name": "goal", "amount": rng.randint(500, 30000), "months": rng.randint(1, 48)}
+                      for _ in range(rng.randint(0, 3))])
+    return incomes, expenses, goals
+
+def scalar_metrics(income, expenses, goals):
+    """The figures as the original per-request code computed them."""
+
+    total_expenses = sum(expenses.values())
+    surplus = income - total_expenses
+    fixed = {k: v for k, v in expenses.items() if k.lower() in ["rent", "insurance", "loan_payment"]}
+    return {
+        "total_expenses": total_expenses,
+        "surplus": surplus,
+        "savings_rate": (surplus / income * 100) if income > 0 else 0,
+        "fixed_total": sum(fixed.values()),
+        "variable_total": sum(v for k, v in expenses.items() if k not in fixed),
+        "housing_ratio": expenses.get("rent", 0) / income * 100,
+        "transportation_ratio": expenses.get("transportation", 0) / income * 100,
+        "food_ratio": expenses.get("food", 0) / income * 100,
+        "goals_achievable": all(surplus >= g["amount"] / g["months"] for g in goals),
+        "shares": [amt / total_expenses * 100 for amt in expenses.values()],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    incomes, expenses, goals = make_portfolio(args.users)
+
+    start = time.perf_counter()
+    reference = [scalar_metrics(i, e, g) for i, e, g in zip(incomes, expenses, goals)]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels, codes, values = expense_matrix(expenses)
+    pack_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    metrics = compute_budget_metrics(incomes, values, labels, codes, goals=goals)
+    compute_seconds = time.perf_counter() - start
+
+    for j, expected in enumerate(reference):
+        for key, value in expected.items():
+            if key == "shares":
+                actual = metrics["shares"][:len(value), j].tolist()
+            else:
+                actual = metrics[key][j].item()
+            assert actual == value, (j, key, actual, value)
+
+    print(f"{args.users} users, all figures identical to the scalar path")
+    print(f"{'path':<28} {'seconds':>9} {'users/s':>12}")
+    print(f"{'scalar dict loops':<28} {scalar_seconds:>9.3f} {args.users / scalar_seconds:>12,.0f}")
+    print(f"{'columnar (pack + compute)':<28} {pack_seconds + compute_seconds:>9.3f} "
+          f"{args.users / (pack_seconds + compute_seconds):>12,.0f}")
+    print(f"{'columnar (compute only)':<28} {compute_seconds:>9.3f} {args.users / compute_seconds:>12,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Throughput of /generate against a slow upstream at increasing concurrency.
+
+With the non-blocking engine, requests overlap while they wait on the stub,
+so requests/sec should grow roughly with concurrency instead of staying at
+1 / latency.
+
+    python -m benchmarks.bench_async_engine --latency-ms 100 --requests 128
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.stub_server import running_stub
+
+async def drive(app, total: int, concurrency: int, tag: str) -> float:
+    """Send `total` distinct /generate requests with at most `concurrency` in flight; return req/s."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int) -> None:
+            async with semaphore:
+                # Distinct questions so the NLU cache does not hide upstream latency
+                response = await client.post("/api/v1/generate",
+                                             json={"question": f"{tag} question {i}", "persona": "student"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms) as (url, _):
+        os.environ["NLU_ENDPOINT"] = url
+        os.environ["WATSONX_ENDPOINT"] = url
+        from app.engine import get_engine
+        get_engine.cache_clear()
+        from main import app
+
+        print(f"upstream latency: {args.latency_ms:.0f} ms per call (2 calls per request)")
+        print(f"{'concurrency':>12} {'req/s':>10} {'speedup':>9}")
+        baseline = None
+        for concurrency in args.concurrency:
+            rps = asyncio.run(drive(app, args.requests, concurrency, f"c{concurrency}"))
+            baseline = baseline or rps
+            print(f"{concurrency:>12} {rps:>10.1f} {rps / baseline:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
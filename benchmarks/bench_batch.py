@@ -0,0 +1,72 @@
+"""
+Items/sec for a nightly-job style workload: one request per budget vs the
+NDJSON batch endpoints.
+
+    python -m benchmarks.bench_batch --items 500 --latency-ms 20
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import httpx
+
+from app.ibm_api import get_generation_cache
+from benchmarks.stub_server import running_stub, serve_in_thread
+
+CATEGORIES = ["rent", "food", "transportation", "utilities", "entertainment", "shopping", "insurance"]
+
+def make_budgets(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [{
+        "income": rng.randint(2000, 9000),
+        "expenses": {cat: rng.randint(50, 1500) for cat in CATEGORIES},
+        "savings_goal": rng.randint(100, 800),
+        "user_type": rng.choice(["student", "professional"])
+    } for _ in range(count)]
+
+def single_loop(client: httpx.Client, budgets) -> float:
+    get_generation_cache().clear()
+    start = time.perf_counter()
+    for budget in budgets:
+        client.post("/api/v1/budget-summary", json=budget).raise_for_status()
+    return len(budgets) / (time.perf_counter() - start)
+
+def batched(client: httpx.Client, budgets, concurrency: int) -> float:
+    get_generation_cache().clear()
+    start = time.perf_counter()
+    received = 0
+    with client.stream("POST", f"/api/v1/batch/budget-summary?concurrency={concurrency}", json=budgets) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            record = json.loads(line)
+            assert record["index"] == received and record["status"] == "success"
+            received += 1
+    assert received == len(budgets)
+    return received / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 64])
+    args = parser.parse_args()
+
+    budgets = make_budgets(args.items)
+    with running_stub(latency_ms=args.latency_ms) as (stub_url, _):
+        os.environ["WATSONX_ENDPOINT"] = stub_url
+        from app.engine import get_engine
+        get_engine.cache_clear()
+        from main import app
+
+        with serve_in_thread(app) as app_url, httpx.Client(base_url=app_url, timeout=600) as client:
+            print(f"{args.items} budgets, upstream latency {args.latency_ms:.0f} ms")
+            print(f"{'mode':<24} {'items/s':>10}")
+            print(f"{'single-request loop':<24} {single_loop(client, budgets):>10.1f}")
+            for concurrency in args.concurrency:
+                label = f"batch (concurrency={concurrency})"
+                print(f"{label:<24} {batched(client, budgets, concurrency):>10.1f}")
+
+if __name__ == "__main__":
+    main()
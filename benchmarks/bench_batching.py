@@ -0,0 +1,82 @@
+"""
+Throughput vs added latency of generation micro-batching at several concurrency levels.
+
+A closed loop of N clients sends distinct /generate requests (so the caches
+never answer) to a stub Watsonx that serves at most --capacity generation
+calls at once. Without batching every request takes a slot of its own; with
+it, concurrent prompts share one /v1/generate_batch call. At concurrency 1
+the adaptive window should stay at zero, so batching adds no latency there.
+Hedging is turned off so every request makes exactly one upstream call.
+
+    python -m benchmarks.bench_batching --latency-ms 50 --capacity 4 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stub_server import running_stub
+
+async def closed_loop(app, concurrency: int, requests: int, offset: int):
+    """`concurrency` clients share `requests` distinct questions; return (seconds, ms per request)."""
+
+    transport = httpx.ASGITransport(app=app)
+    questions = iter(range(requests))
+    timings = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def worker():
+            for i in questions:
+                question = {"question": f"Should I refinance my loan, case {offset + i}?", "persona": "general"}
+                start = time.perf_counter()
+                response = await client.post("/api/v1/generate", json=question)
+                response.raise_for_status()
+                timings.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start, timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--batch-item-ms", type=float, default=2.0, help="stub cost of each extra prompt in a batch")
+    parser.add_argument("--capacity", type=int, default=4, help="generation calls the stub serves at once")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=400, help="requests per run (at least 10 per client)")
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms) as (url, stub):
+        stub.state.config.update(capacity=args.capacity, batch_item_ms=args.batch_item_ms)
+        os.environ["WATSONX_ENDPOINT"] = url
+        os.environ["HEDGE_ENABLED"] = "false"
+        from app.engine import get_engine
+        from app.ibm_api import get_generation_batcher
+        from app.resilience import get_backend, get_resilience_config
+        get_engine.cache_clear()
+        get_resilience_config.cache_clear()
+        get_backend.cache_clear()
+        from main import app
+
+        print(f"upstream {args.latency_ms:.0f} ms, +{args.batch_item_ms:.0f} ms per extra prompt, "
+              f"capacity {args.capacity}")
+        print(f"{'concurrency':>11} {'batching':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+              f"{'upstream calls':>15} {'mean batch':>11}")
+        run = 0
+        for concurrency in args.concurrency:
+            requests = max(args.requests, concurrency * 10)
+            for enabled in ("false", "true"):
+                os.environ["GENERATION_BATCH_ENABLED"] = enabled
+                get_generation_batcher.cache_clear()
+                before = stub.state.calls["generate"] + stub.state.calls["generate_batch"]
+                run += 1
+                seconds, timings = asyncio.run(closed_loop(app, concurrency, requests, run * 100_000))
+                calls = stub.state.calls["generate"] + stub.state.calls["generate_batch"] - before
+                timings.sort()
+                print(f"{concurrency:>11} {'on' if enabled == 'true' else 'off':>9} {requests / seconds:>8.1f} "
+                      f"{statistics.median(timings):>8.1f} {timings[int(0.99 * (len(timings) - 1))]:>8.1f} "
+                      f"{calls:>15} {requests / calls:>11.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Category classifier throughput (strings per minute) with and without the memo, and labelling accuracy.
+
+Draws a stream of free-form expense labels and statement descriptions:
+canonical names in odd casing and spacing ("Rent ", "LOAN_PAYMENT"),
+synonyms ("groceries", "Dining Out"), misspellings ("Transportaton") and
+merchant strings with store numbers ("Whole Foods Market #1042"), plus
+strings that belong nowhere. Every string has a known expected category,
+so the run also reports how many the classifier gets right.
+
+    python -m benchmarks.bench_categories --strings 1000000 --distinct 20000
+"""
+import argparse
+import random
+import time
+
+from app.categories import CategoryClassifier
+
+SAMPLES = [
+    ("rent", "rent"), ("Rent ", "rent"), ("RENT", "rent"), ("Housing", "rent"), ("mortgage payment", "rent"),
+    ("Landlord LLC rent", "rent"), ("food", "food"), ("groceries", "food"), ("Grocery", "food"),
+    ("Dining Out", "food"), ("restaurants", "food"), ("Whole Foods Market", "food"), ("Corner Cafe", "food"),
+    ("Pet Food", "food"), ("groceris", "food"), ("transportation", "transportation"),
+    ("Transportaton", "transportation"), ("Shell Gas Station", "transportation"), ("City Transit", "transportation"),
+    ("Uber trip", "transportation"), ("Parking garage", "transportation"), ("insurance", "insurance"),
+    ("Car Insurance", "insurance"), ("State Farm Insurance", "insurance"), ("loan_payment", "loan_payment"),
+    ("LOAN_PAYMENT", "loan_payment"), ("Student Loans", "loan_payment"), ("Car payment", "loan_payment"),
+    ("utilities", "utilities"), ("Electric Co", "utilities"), ("Phone bill", "utilities"),
+    ("Internet", "utilities"), ("Pharmacy", "healthcare"), ("Dentist", "healthcare"),
+    ("Netflix", "entertainment"), ("Movies", "entertainment"), ("Gym membership", "subscriptions"),
+    ("Amazon", "shopping"), ("Clothing", "shopping"), ("Tuition", "education"), ("Kids daycare", "childcare"),
+    ("Hotel", "travel"), ("Payroll ACME", None), ("misc", None), ("Acme Corp", None), ("Venmo transfer", None),
+]
+
+def make_stream(count: int, distinct: int, seed: int = 7):
+    """`count` (string, expected) pairs drawn from `distinct` variants of SAMPLES (store numbers, spacing)."""
+
+    rng = random.Random(seed)
+    variants = []
+    for i in range(distinct):
+        text, expected = SAMPLES[i % len(SAMPLES)]
+        if i >= len(SAMPLES):
+            text = rng.choice([f"{text} #{rng.randint(1, 9999)}", f"  {text}  ", f"POS {text} {rng.randint(100, 999)}",
+                               text.upper(), text.lower()])
+        variants.append((text, expected))
+    return [rng.choice(variants) for _ in range(count)]
+
+def run(classifier: CategoryClassifier, stream) -> float:
+    classify = classifier.classify
+    start = time.perf_counter()
+    for text, _ in stream:
+        classify(text)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--strings", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=20_000, help="distinct strings in the stream")
+    parser.add_argument("--memo-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    stream = make_stream(args.strings, args.distinct)
+    start = time.perf_counter()
+    classifier = CategoryClassifier(memo_size=args.memo_size)
+    print(f"index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    cold = min(len(stream), 100_000)
+    uncached = run(CategoryClassifier(memo_size=0), stream[:cold])
+    memoized = run(classifier, stream)
+    stats = classifier.stats()
+    print(f"{'mode':<10} {'strings':>10} {'seconds':>8} {'strings/min':>14}")
+    print(f"{'no memo':<10} {cold:>10} {uncached:>8.2f} {cold / uncached * 60:>14,.0f}")
+    print(f"{'memo':<10} {len(stream):>10} {memoized:>8.2f} {len(stream) / memoized * 60:>14,.0f}"
+          f"   (hit rate {stats['hit_rate']:.1%})")
+
+    wrong = [(text, expected, classifier.classify(text)) for text, expected in set(stream)
+             if classifier.classify(text) != expected]
+    distinct = len(set(stream))
+    print(f"accuracy: {distinct - len(wrong)}/{distinct} distinct strings")
+    for text, expected, got in sorted(wrong, key=str)[:10]:
+        print(f"  {text!r}: expected {expected}, got {got}")
+
+if __name__ == "__main__":
+    main()
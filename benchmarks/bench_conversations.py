@@ -0,0 +1,135 @@
+"""
+Conversation memory: prompt size and assembly latency as conversations grow, and memory per conversation.
+
+For conversations of several lengths, times assembling the prompt for the
+next question (history render plus template, NLU precomputed) the way the
+conversation store does it, against resending the whole transcript, and
+reports both prompts' estimated token counts: the store's prompt stays
+under the same bound at any length.
+
+Then fills a store with many conversations and measures the memory they
+hold with tracemalloc, for the in-memory turn log and for sqlite (where
+only the bounded prompt-side state stays in memory), next to the store's
+own estimate that drives eviction.
+
+    python -m benchmarks.bench_conversations --turns 10 100 1000 --conversations 1000 --store-turns 20
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from app.cache import SQLiteCacheBackend
+from app.conversations import (
+    Conversation, ConversationStore, SQLiteTurnLog, estimate_tokens, get_conversation_config
+)
+from app.nlu_engine import get_nlu_engine
+from app.utils import build_conversation_prompt, build_prompt_with_nlu
+
+QUESTIONS = [
+    "How much should I keep in my emergency fund if my rent is $1,400?",
+    "Should I pay off my credit card debt before investing in my 401k?",
+    "What is a realistic monthly grocery budget for two people?",
+    "How do I start saving for a house deposit on a $55,000 salary?",
+    "Is it worth refinancing my student loan at 6% interest?",
+    "How can I cut my transportation costs without selling my car?",
+]
+
+ANSWERS = [
+    "Aim for three to six months of essential expenses. With rent at $1,400 and other essentials, "
+    "that is roughly $7,000 to $14,000. Build it gradually by automating a fixed transfer every payday, "
+    "and keep it in a high-yield savings account you do not touch for everyday spending. " * 2,
+    "Pay down high-interest credit card debt first, but contribute enough to your 401k to get the full "
+    "employer match, since the match is an immediate return. After the card is paid off, redirect those "
+    "payments into retirement savings and your emergency fund. " * 2,
+]
+
+def make_turns(count: int, seed: int = 5):
+    rng = random.Random(seed)
+    engine = get_nlu_engine()
+    turns = []
+    for i in range(count):
+        question = f"{rng.choice(QUESTIONS)} (follow-up {i})"
+        keywords = [kw["text"] for kw in engine.analyze(question).get("keywords", [])]
+        # Distinct answer strings, as a real model's are, so memory is not shared between turns
+        turns.append((question, f"{rng.choice(ANSWERS)}(answer {i})", keywords))
+    return turns
+
+def assembly(turns, rounds: int):
+    """(store us, store tokens, transcript us, transcript tokens) for the prompt after `turns`."""
+
+    question = "Given all that, what should I prioritize next month?"
+    nlu = get_nlu_engine().analyze(question)
+    conversation = Conversation()
+    for turn in turns:
+        conversation.add_turn(*turn)
+
+    store_us = []
+    for _ in range(rounds):
+        # A new turn invalidates the rendered history, so every round pays the full re-render
+        conversation._history = None
+        start = time.perf_counter()
+        prompt = build_conversation_prompt(question, conversation.history(), nlu_analysis=nlu)
+        store_us.append((time.perf_counter() - start) * 1e6)
+
+    transcript_us = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        transcript = "\n".join(f"User: {q}\nAssistant: {a}" for q, a, _ in turns)
+        full = build_prompt_with_nlu(f"{transcript}\n{question}", nlu_analysis=nlu)
+        transcript_us.append((time.perf_counter() - start) * 1e6)
+    return (statistics.median(store_us), estimate_tokens(prompt),
+            statistics.median(transcript_us), estimate_tokens(full))
+
+def store_memory(conversations: int, turns, sqlite_path=None):
+    """(measured bytes per conversation, store-estimated bytes per conversation) once the store is filled."""
+
+    if sqlite_path:
+        store = ConversationStore(max_bytes=1 << 40, backend=SQLiteCacheBackend(sqlite_path, table="conversations"),
+                                  log=SQLiteTurnLog(sqlite_path))
+    else:
+        store = ConversationStore(max_bytes=1 << 40)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for number in range(conversations):
+        conversation_id, conversation = store.new_id(), Conversation()
+        for index, (question, answer, keywords) in enumerate(turns):
+            # Every conversation's own strings, allocated while memory is traced
+            question, answer = f"{question} [{number}]", f"{answer} [{number}]"
+            conversation.add_turn(question, answer, keywords)
+            store.record(conversation_id, conversation,
+                         {"index": index, "question": question, "answer": answer, "keywords": keywords})
+        conversation.history()
+    measured = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return measured / conversations, store.stats()["bytes"] / conversations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--store-turns", type=int, default=20)
+    args = parser.parse_args()
+
+    config = get_conversation_config()
+    print(f"history budget {config['context_tokens']} tokens ({config['summary_tokens']} for the summary)")
+    print(f"{'turns':>6} {'store us':>9} {'store tokens':>13} {'transcript us':>14} {'transcript tokens':>18}")
+    for count in args.turns:
+        store_us, store_tokens, transcript_us, transcript_tokens = assembly(make_turns(count), args.rounds)
+        print(f"{count:>6} {store_us:>9.1f} {store_tokens:>13} {transcript_us:>14.1f} {transcript_tokens:>18}")
+
+    turns = make_turns(args.store_turns)
+    print(f"\n{args.conversations} conversations of {args.store_turns} turns; KiB per conversation")
+    print(f"{'turn log':<10} {'measured':>9} {'estimated':>10}")
+    measured, estimated = store_memory(args.conversations, turns)
+    print(f"{'memory':<10} {measured / 1024:>9.1f} {estimated / 1024:>10.1f}")
+    with tempfile.TemporaryDirectory() as directory:
+        measured, estimated = store_memory(args.conversations, turns, os.path.join(directory, "bench.sqlite3"))
+    print(f"{'sqlite':<10} {measured / 1024:>9.1f} {estimated / 1024:>10.1f}")
+
+if __name__ == "__main__":
+    main()
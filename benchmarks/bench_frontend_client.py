@@ -0,0 +1,90 @@
+"""
+Frontend HTTP client: fresh connection per call vs pooled keep-alive vs fan-out.
+
+Serves the FastAPI app under uvicorn against the Watsonx stub and replays
+"clicks" on the budget page, each asking for a budget summary and spending
+insights, the way the Streamlit frontend would. Compares the old
+`requests.post` per call, the pooled BackendClient calling sequentially, and
+BackendClient.fan_out running both calls at once. Every click uses distinct
+numbers so the generation cache does not answer it. A last mode resubmits
+one unchanged form, which the client's response cache answers locally.
+
+    python -m benchmarks.bench_frontend_client --clicks 100 --latency-ms 50
+"""
+import argparse
+import os
+import statistics
+import time
+
+import requests
+
+from app.api_client import BackendClient
+from benchmarks.stub_server import running_stub, serve_in_thread
+
+def click_payloads(i: int):
+    expenses = {"rent": 1200 + i, "food": 400, "transportation": 300, "utilities": 150}
+    summary = {"income": 4000 + i, "expenses": expenses, "savings_goal": 500, "user_type": "professional"}
+    insights = {"income": 4000 + i, "expenses": expenses, "goals": [], "user_type": "professional"}
+    return summary, insights
+
+def fresh_connections(url: str, i: int) -> None:
+    summary, insights = click_payloads(i)
+    for endpoint, data in (("budget-summary", summary), ("spending-insights", insights)):
+        requests.post(f"{url}/api/v1/{endpoint}", json=data).raise_for_status()
+
+def pooled_sequential(client: BackendClient, i: int) -> None:
+    summary, insights = click_payloads(i)
+    for endpoint, data in (("budget-summary", summary), ("spending-insights", insights)):
+        assert "error" not in client.post(endpoint, data)
+
+def pooled_fan_out(client: BackendClient, i: int) -> None:
+    summary, insights = click_payloads(i)
+    results = client.fan_out({"summary": ("budget-summary", summary), "insights": ("spending-insights", insights)})
+    assert not any("error" in result for result in results.values())
+
+def cached_resubmit(client: BackendClient) -> None:
+    summary, insights = click_payloads(0)
+    results = client.fan_out({"summary": ("budget-summary", summary), "insights": ("spending-insights", insights)},
+                             cached=True)
+    assert not any("error" in result for result in results.values())
+
+def measure(click, clicks: int, offset: int):
+    latencies = []
+    for i in range(clicks):
+        start = time.perf_counter()
+        click(offset + i)
+        latencies.append(time.perf_counter() - start)
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return statistics.mean(latencies) * 1000, cuts[94] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub time to first token")
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms) as (stub_url, _):
+        os.environ["WATSONX_ENDPOINT"] = stub_url
+        from app.engine import get_engine
+        get_engine.cache_clear()
+        from main import app
+
+        with serve_in_thread(app) as url:
+            client = BackendClient(base_url=url)
+            modes = [
+                ("requests.post per call", lambda i: fresh_connections(url, i)),
+                ("pooled, sequential", lambda i: pooled_sequential(client, i)),
+                ("pooled, fan-out", lambda i: pooled_fan_out(client, i)),
+                ("cached resubmit", lambda i: cached_resubmit(client)),
+            ]
+            print(f"{args.clicks} clicks (budget summary + spending insights), "
+                  f"upstream latency {args.latency_ms:.0f} ms")
+            print(f"{'mode':<24} {'mean ms':>9} {'p95 ms':>9}")
+            for n, (name, click) in enumerate(modes):
+                click(-1 - n)  # warm-up
+                mean, p95 = measure(click, args.clicks, (n + 1) * 100000)
+                print(f"{name:<24} {mean:>9.2f} {p95:>9.2f}")
+            client.close()
+
+if __name__ == "__main__":
+    main()
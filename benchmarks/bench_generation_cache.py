@@ -0,0 +1,75 @@
+"""
+Generation cache and single-flight coalescing under a repetitive workload.
+
+Replays a skewed stream of /generate questions (a few popular ones, a long
+tail of rare ones) with and without the generation cache, then fires a
+burst of identical concurrent requests at a cold cache. Reports req/s and
+how many calls actually reached the stub.
+
+    python -m benchmarks.bench_generation_cache --requests 400 --latency-ms 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+from benchmarks.stub_server import running_stub
+
+QUESTIONS = [f"How should I budget for expense number {i}?" for i in range(200)]
+
+def make_workload(total: int, seed: int = 5):
+    """Zipf-like draw over QUESTIONS, so a few prompts dominate."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    return rng.choices(QUESTIONS, weights=weights, k=total)
+
+async def drive(app, questions, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(question: str) -> None:
+            async with semaphore:
+                response = await client.post("/api/v1/generate", json={"question": question, "persona": "student"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in questions))
+        return len(questions) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--burst", type=int, default=50)
+    args = parser.parse_args()
+
+    workload = make_workload(args.requests)
+    with running_stub(latency_ms=args.latency_ms) as (url, stub):
+        os.environ["WATSONX_ENDPOINT"] = url
+        from app.engine import get_engine
+        from app.ibm_api import get_generation_cache
+        get_engine.cache_clear()
+        from main import app
+
+        print(f"{args.requests} requests over {len(set(workload))} distinct questions, "
+              f"upstream latency {args.latency_ms:.0f} ms, concurrency {args.concurrency}")
+        print(f"{'mode':<22} {'req/s':>10} {'upstream calls':>15}")
+        for label, size in (("no cache, coalescing", "0"), ("cache enabled", "512")):
+            os.environ["GENERATION_CACHE_SIZE"] = size
+            get_generation_cache.cache_clear()
+            before = stub.state.calls["generate"]
+            rps = asyncio.run(drive(app, workload, args.concurrency))
+            print(f"{label:<22} {rps:>10.1f} {stub.state.calls['generate'] - before:>15}")
+
+        get_generation_cache().clear()
+        before = stub.state.calls["generate"]
+        rps = asyncio.run(drive(app, ["What is a good emergency fund size?"] * args.burst, args.burst))
+        label = f"burst x{args.burst} (cold)"
+        print(f"{label:<22} {rps:>10.1f} {stub.state.calls['generate'] - before:>15}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Statement ingestion throughput (MB/s) and memory for CSV/OFX files from 1 MB to 1 GB.
+
+Writes a synthetic bank export of each size to a temporary directory, then
+streams it through the ledger parser in-process and as a raw upload to
+/api/v1/ledger/budget-summary on a local server. Peak RSS is reported after
+each size: it should stay flat as files grow, since neither the upload nor
+the rows are ever held whole.
+
+    python -m benchmarks.bench_ledger --sizes-mb 1 10 100 1000 --format csv
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stub_server import serve_in_thread
+
+MERCHANTS = ["Whole Foods Market", "Shell Gas Station", "Netflix", "City Transit", "Landlord LLC rent",
+             "Corner Cafe", "Electric Co", "Amazon", "State Farm Insurance", "Uber trip", "Pharmacy #12"]
+CHUNK = 64 * 1024
+
+def write_statement(path: str, size_mb: int, statement_format: str) -> int:
+    """Write about `size_mb` MB of transactions; returns the number written."""
+
+    rng = random.Random(size_mb)
+    count = 0
+    target = size_mb * 1024 * 1024
+    with open(path, "w", newline="") as f:
+        f.write("Date,Description,Amount,Balance\n" if statement_format == "csv"
+                else "OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n")
+        while f.tell() < target:
+            month = count // 50_000 % 120
+            lines = []
+            for i in range(5_000):
+                merchant, amount = rng.choice(MERCHANTS), -round(rng.uniform(3, 250), 2)
+                if i % 200 == 0:
+                    merchant, amount = "Payroll ACME", 2500.0
+                date = f"{2015 + month // 12}-{month % 12 + 1:02d}-{i % 28 + 1:02d}"
+                if statement_format == "csv":
+                    lines.append(f'{date},"{merchant}",{amount},1000.00\n')
+                else:
+                    lines.append(f"<STMTTRN><TRNTYPE>POS<DTPOSTED>{date.replace('-', '')}"
+                                 f"<TRNAMT>{amount}<NAME>{merchant}</STMTTRN>\n")
+            f.write("".join(lines))
+            count += len(lines)
+        if statement_format == "ofx":
+            f.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+    return count
+
+async def file_chunks(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK):
+            yield chunk
+
+def file_iter(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK):
+            yield chunk
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--format", choices=("csv", "ofx"), default="csv")
+    args = parser.parse_args()
+
+    from main import app
+    from app.ledger import read_statement
+
+    content_type = "text/csv" if args.format == "csv" else "application/x-ofx"
+    print(f"{'size MB':>8} {'transactions':>13} {'parse MB/s':>11} {'upload MB/s':>12} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as directory, serve_in_thread(app) as url:
+        for size_mb in args.sizes_mb:
+            path = os.path.join(directory, f"statement-{size_mb}.{args.format}")
+            written = write_statement(path, size_mb, args.format)
+            megabytes = os.path.getsize(path) / (1024 * 1024)
+
+            start = time.perf_counter()
+            totals, _ = asyncio.run(read_statement(file_chunks(path), content_type))
+            parse_seconds = time.perf_counter() - start
+            assert totals.transactions == written, (totals.transactions, written)
+
+            start = time.perf_counter()
+            response = httpx.post(f"{url}/api/v1/ledger/budget-summary?verbose=false&fields=ledger",
+                                  content=file_iter(path), headers={"Content-Type": content_type}, timeout=None)
+            response.raise_for_status()
+            upload_seconds = time.perf_counter() - start
+            assert response.json()["ledger"]["transactions"] == written
+
+            print(f"{megabytes:>8.0f} {written:>13} {megabytes / parse_seconds:>11.1f} "
+                  f"{megabytes / upload_seconds:>12.1f} {peak_rss_mb():>12.0f}")
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Overhead of the built-in latency instrumentation.
+
+Drives /generate in-process against the mocks (no upstream latency, so the
+instrumentation is as large a share of each request as it will ever be)
+with METRICS_ENABLED on and off, interleaving rounds and keeping the best
+of each. Also reports the cost of a single stage() timing.
+
+    python -m benchmarks.bench_metrics --requests 2000 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import time
+import timeit
+
+import httpx
+
+async def drive(app, total: int, tag: str) -> float:
+    """Send `total` distinct /generate requests, 8 at a time; return req/s."""
+
+    semaphore = asyncio.Semaphore(8)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int) -> None:
+            async with semaphore:
+                response = await client.post("/api/v1/generate",
+                                             json={"question": f"{tag} question {i}", "persona": "student"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-overhead", type=float, default=3.0, help="fail above this many percent")
+    args = parser.parse_args()
+
+    from app.metrics import metrics_enabled, stage
+    from main import app
+
+    best = {"off": 0.0, "on": 0.0}
+    for round_number in range(args.rounds):
+        for mode in ("off", "on"):
+            os.environ["METRICS_ENABLED"] = "true" if mode == "on" else "false"
+            metrics_enabled.cache_clear()
+            rps = asyncio.run(drive(app, args.requests, f"{mode}{round_number}"))
+            best[mode] = max(best[mode], rps)
+
+    def timed_stage():
+        with stage("bench"):
+            pass
+    number = 200000
+    stage_ns = min(timeit.repeat(timed_stage, number=number, repeat=3)) / number * 1e9
+
+    overhead = (best["off"] / best["on"] - 1) * 100
+    print(f"{'metrics':<10} {'best req/s':>11}")
+    print(f"{'off':<10} {best['off']:>11.1f}")
+    print(f"{'on':<10} {best['on']:>11.1f}")
+    print(f"overhead: {overhead:.2f}% per request, {stage_ns:.0f} ns per stage timing")
+    if overhead > args.max_overhead:
+        raise SystemExit(f"instrumentation overhead {overhead:.2f}% exceeds {args.max_overhead}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Offline NLU engine vs a stubbed remote Watson NLU call.
+
+Analyzes 1k, 10k and 100k generated messages with the local engine and
+reports messages/sec and per-message latency. The remote path sends the
+same messages to the stub over the pooled async client at a fixed
+concurrency; it is capped at --remote-max messages per size because its
+cost is dominated by the modeled network latency.
+
+    python -m benchmarks.bench_nlu_engine --sizes 1000 10000 100000 --latency-ms 30
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from benchmarks.stub_server import running_stub
+
+OPENERS = ["I'm really worried about", "How do I handle", "Great news about", "Should I prioritize",
+           "I can't keep up with", "What's the best way to manage"]
+TOPICS = ["my student loans", "credit card debt", "saving for a down payment", "my 401k", "rent and groceries",
+          "an emergency fund", "investing in index funds", "my monthly budget"]
+DETAILS = ["I owe $4,500", "I earn 60k dollars a year", "it's due next month", "over the next 3 years",
+           "since March 2024", "with a 22% interest rate", "", ""]
+
+def make_messages(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    return [f"{rng.choice(OPENERS)} {rng.choice(TOPICS)}? {rng.choice(DETAILS)} (#{i})" for i in range(count)]
+
+async def remote(engine, messages, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(text: str) -> None:
+        async with semaphore:
+            await engine.post_json(f"{engine.nlu_endpoint}/v1/analyze", {"text": text})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(m) for m in messages))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--remote-max", type=int, default=2000)
+    args = parser.parse_args()
+
+    from app.nlu_engine import get_nlu_engine
+    local_engine = get_nlu_engine()
+
+    with running_stub(latency_ms=args.latency_ms) as (url, _):
+        os.environ["NLU_ENDPOINT"] = url
+        from app.engine import get_engine
+        get_engine.cache_clear()
+        engine = get_engine()
+
+        print(f"stub latency {args.latency_ms:.0f} ms, remote concurrency {args.concurrency}")
+        print(f"{'messages':>9} {'path':<8} {'sent':>7} {'msg/s':>12} {'us/msg':>10}")
+        for size in args.sizes:
+            messages = make_messages(size)
+
+            start = time.perf_counter()
+            for text in messages:
+                local_engine.analyze(text)
+            local_seconds = time.perf_counter() - start
+
+            sent = messages[:args.remote_max]
+            remote_seconds = asyncio.run(remote(engine, sent, args.concurrency))
+
+            for path, count, seconds in (("local", size, local_seconds), ("remote", len(sent), remote_seconds)):
+                print(f"{size:>9} {path:<8} {count:>7} {count / seconds:>12,.0f} {seconds / count * 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()
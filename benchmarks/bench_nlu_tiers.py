@@ -0,0 +1,95 @@
+"""
+Tiered NLU routing: share of traffic per tier, upstream calls and latency.
+
+Sends a mix of clear financial questions, vague questions and long texts
+to /nlu against the stub at several NLU_LOCAL_CONFIDENCE thresholds, from
+"everything remote" (above 1) to "everything local" (0).
+
+    python -m benchmarks.bench_nlu_tiers --requests 600 --latency-ms 80
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stub_server import running_stub
+
+CLEAR = ["How do I pay off my credit card debt faster?", "Should I save for an emergency fund or invest?",
+         "I'm worried about my student loans and rent", "Is a Roth IRA better than a 401k for me?",
+         "How much of my income should go to my budget for groceries?"]
+VAGUE = ["What do you think I should do?", "Is this a good idea or not?", "Help me figure things out",
+         "My situation is complicated", "Can you explain how this works?"]
+
+def make_traffic(count: int, seed: int = 9):
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.7:
+            texts.append(f"{rng.choice(CLEAR)} (#{i})")
+        elif roll < 0.9:
+            texts.append(f"{rng.choice(VAGUE)} (#{i})")
+        else:
+            texts.append(" ".join(rng.choice(CLEAR) for _ in range(20)) + f" (#{i})")
+    return texts
+
+async def drive(app, texts, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def one(text: str) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/v1/nlu", json={"text": text})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(t) for t in texts))
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[1.01, 0.8, 0.6, 0.0])
+    args = parser.parse_args()
+
+    texts = make_traffic(args.requests)
+    with running_stub(latency_ms=args.latency_ms) as (url, stub):
+        os.environ["NLU_ENDPOINT"] = url
+        from app.engine import get_engine
+        from app.ibm_api import get_nlu_cache, get_nlu_routing
+        from app.metrics import NLU_TIERS
+        get_engine.cache_clear()
+        from main import app
+
+        print(f"{args.requests} texts, stub latency {args.latency_ms:.0f} ms, concurrency {args.concurrency}")
+        print(f"{'threshold':>9} {'local':>7} {'remote':>7} {'upstream':>9} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8}")
+        for threshold in args.thresholds:
+            os.environ["NLU_LOCAL_CONFIDENCE"] = str(threshold)
+            os.environ["NLU_LOCAL_MAX_CHARS"] = "500" if threshold > 0 else "1000000"
+            get_nlu_routing.cache_clear()
+            get_nlu_cache().clear()
+            tiers_before = NLU_TIERS.snapshot()
+            before = stub.state.calls["analyze"]
+
+            latencies, elapsed = asyncio.run(drive(app, texts, args.concurrency))
+            served = {"local": 0, "remote": 0}
+            for (tier, reason), count in NLU_TIERS.snapshot().items():
+                served[tier] += count - tiers_before.get((tier, reason), 0)
+            fractions = {tier: count / len(texts) for tier, count in served.items()}
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            print(f"{threshold:>9.2f} {fractions['local']:>7.1%} {fractions['remote']:>7.1%} "
+                  f"{stub.state.calls['analyze'] - before:>9} {cuts[49] * 1000:>8.2f} {cuts[94] * 1000:>8.2f} "
+                  f"{len(texts) / elapsed:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Render cost per prompt for the compiled templates.
+
+Reports microseconds per call for every prompt builder, and for each raw
+template compares the precompiled segments/slots render against
+re-parsing the source with str.format_map on every call.
+
+    python -m benchmarks.bench_prompts --number 20000
+"""
+import argparse
+import timeit
+
+from app.templates import get_template_registry
+from app.utils import (
+    build_simple_prompt, build_prompt_with_nlu, build_student_prompt,
+    build_professional_prompt, build_spending_insight_prompt
+)
+
+EXPENSES = {"rent": 1500, "food": 600, "transportation": 400, "utilities": 200,
+            "entertainment": 300, "shopping": 250, "insurance": 150}
+GOALS = [{"name": "Emergency Fund", "amount": 10000, "months": 12},
+         {"name": "Vacation", "amount": 3000, "months": 6}]
+NLU = {"sentiment": {"document": {"label": "negative", "score": 0.2}},
+       "keywords": [{"text": "loan"}, {"text": "savings"}], "entities": [{"text": "month"}]}
+
+BUILDERS = {
+    "simple": lambda: build_simple_prompt("How can I save money?", "student"),
+    "nlu": lambda: build_prompt_with_nlu("How can I save money?", "student", nlu_analysis=NLU),
+    "student_budget": lambda: build_student_prompt(4000, EXPENSES, 500),
+    "professional_budget": lambda: build_professional_prompt(4000, EXPENSES, 500),
+    "spending_insights": lambda: build_spending_insight_prompt(
+        {"income": 5000, "expenses": EXPENSES, "goals": GOALS, "user_type": "professional"}),
+}
+
+def sample_values(template):
+    """Plausible slot values: floats for formatted slots, short text otherwise."""
+    return {field: 1234.5 if spec else "text" for field, spec in template.slots}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    def per_call_us(func):
+        return min(timeit.repeat(func, number=args.number, repeat=3)) / args.number * 1e6
+
+    print(f"{'builder':<22} {'us/prompt':>10}")
+    for name, builder in BUILDERS.items():
+        print(f"{name:<22} {per_call_us(builder):>10.2f}")
+
+    registry = get_template_registry()
+    print()
+    print(f"{'template':<22} {'compiled us':>12} {'format_map us':>14}")
+    for name in registry.defaults:
+        template = registry.get(name)
+        values = sample_values(template)
+        compiled = per_call_us(lambda: template.render(**values))
+        reparsed = per_call_us(lambda: template.source.format_map(values))
+        print(f"{name:<22} {compiled:>12.2f} {reparsed:>14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Tail latency and failure handling with hedging, deadlines and the circuit breaker.
+
+Runs distinct /generate requests (so the caches never answer) against a stub
+Watsonx with a slow tail, in four scenarios:
+
+- baseline: hedging off, no deadline
+- hedged: a duplicate call after the recent p95 latency
+- deadline: hedged, plus an X-Request-Timeout-Ms header; late answers degrade
+- outage: every upstream call fails; the breaker opens and requests are
+  answered from the fallback template without waiting on the upstream
+
+    python -m benchmarks.bench_resilience --requests 400 --latency-ms 20 --slow-rate 0.05 --slow-ms 400
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stub_server import running_stub
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+async def run(app, requests: int, concurrency: int, offset: int, headers=None):
+    """Send `requests` distinct questions, `concurrency` at a time; return (ms per request, cache statuses)."""
+
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def one(i: int):
+            question = {"question": f"How much should I keep in savings, case {offset + i}?", "persona": "general"}
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/v1/generate", json=question, headers=headers)
+                response.raise_for_status()
+                return (time.perf_counter() - start) * 1000, response.json()["cache_status"]
+        results = await asyncio.gather(*(one(i) for i in range(requests)))
+    return [ms for ms, _ in results], [status for _, status in results]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of upstream calls in the slow tail")
+    parser.add_argument("--slow-ms", type=float, default=400.0, help="extra latency of a slow call")
+    parser.add_argument("--deadline-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms) as (url, stub):
+        os.environ["WATSONX_ENDPOINT"] = url
+        from app.engine import get_engine
+        from app.resilience import get_backend, get_resilience_config
+        get_engine.cache_clear()
+        from main import app
+
+        stub.state.config.update(slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+        scenarios = [
+            ("baseline", {"HEDGE_ENABLED": "false"}, None),
+            ("hedged", {"HEDGE_ENABLED": "true"}, None),
+            ("deadline", {"HEDGE_ENABLED": "true"}, {"X-Request-Timeout-Ms": str(args.deadline_ms)}),
+        ]
+        print(f"upstream {args.latency_ms:.0f} ms, {args.slow_rate:.0%} of calls +{args.slow_ms:.0f} ms, "
+              f"{args.requests} requests, concurrency {args.concurrency}")
+        print(f"{'scenario':<10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'degraded':>9} {'hedges':>7}")
+        for offset, (name, env, headers) in enumerate(scenarios):
+            os.environ.update(env)
+            get_resilience_config.cache_clear()
+            get_backend.cache_clear()
+            # Warm the latency window so the hedging delay is known from the first timed request
+            asyncio.run(run(app, 50, args.concurrency, 10_000 * (offset + 1) + 5_000))
+            timings, statuses = asyncio.run(run(app, args.requests, args.concurrency, 10_000 * (offset + 1),
+                                                headers=headers))
+            print(f"{name:<10} {statistics.median(timings):>8.1f} {percentile(timings, 0.99):>8.1f} "
+                  f"{max(timings):>8.1f} {statuses.count('degraded'):>9} {get_backend('watsonx').hedges:>7}")
+
+        stub.state.config.update(slow_rate=0.0, error_rate=1.0)
+        os.environ["HEDGE_ENABLED"] = "true"
+        get_resilience_config.cache_clear()
+        get_backend.cache_clear()
+        before = stub.state.calls["generate"]
+        timings, statuses = asyncio.run(run(app, args.requests, args.concurrency, 90_000))
+        backend = get_backend("watsonx")
+        print(f"\noutage: {statuses.count('degraded')}/{args.requests} degraded, "
+              f"{stub.state.calls['generate'] - before} upstream call(s), breaker {backend.breaker.state}, "
+              f"p50 {statistics.median(timings):.1f} ms")
+
+if __name__ == "__main__":
+    main()
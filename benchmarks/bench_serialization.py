@@ -0,0 +1,68 @@
+"""
+Bytes per response and serialization time, verbose vs compact, stdlib vs orjson.
+
+Takes real response bodies from /generate, /budget-summary and
+/spending-insights, then reports:
+
+- bytes on the wire for verbose and ?verbose=false bodies, uncompressed,
+  gzipped and (if brotli is installed) brotli-compressed, as the
+  compression middleware would send them
+- time to encode each body the FastAPI default way (jsonable_encoder, then
+  JSONResponse) vs returning FastJSONResponse directly
+
+    python -m benchmarks.bench_serialization --rounds 2000
+"""
+import argparse
+import gzip
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from main import app
+from app.responses import FastJSONResponse, ResponseOptions, _brotli, _orjson, shape
+
+REQUESTS = {
+    "generate": {"question": "How should I split my paycheck between my student loan and an emergency fund?",
+                 "persona": "student"},
+    "budget-summary": {"income": 5200, "savings_goal": 800, "user_type": "professional",
+                       "expenses": {"rent": 1700, "food": 520, "transportation": 310, "utilities": 180,
+                                    "insurance": 240, "entertainment": 160, "subscriptions": 45}},
+    "spending-insights": {"income": 5200, "user_type": "professional",
+                          "expenses": {"rent": 1700, "food": 520, "transportation": 310, "utilities": 180},
+                          "goals": [{"name": "Emergency Fund", "amount": 12000, "months": 12},
+                                    {"name": "Vacation", "amount": 2500, "months": 8}]},
+}
+
+def per_call_us(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000, help="encodings timed per body")
+    args = parser.parse_args()
+
+    brotli = _brotli()
+    print(f"encoder: {'orjson' if _orjson() is not None else 'stdlib json (orjson not installed)'}")
+    print(f"{'endpoint':<18} {'mode':<8} {'raw B':>7} {'gzip B':>7} {'br B':>7} "
+          f"{'default us':>11} {'fast us':>9} {'speedup':>8}")
+    with TestClient(app) as client:
+        for endpoint, body in REQUESTS.items():
+            payload = client.post(f"/api/v1/{endpoint}", json=body).json()
+            for mode, verbose in (("verbose", True), ("compact", False)):
+                content = shape(payload, ResponseOptions(verbose, None))
+                raw = FastJSONResponse(content).body
+                gzipped = len(gzip.compress(raw, compresslevel=6))
+                brotlied = len(brotli.compress(raw, quality=4)) if brotli is not None else None
+                default = per_call_us(lambda: JSONResponse(jsonable_encoder(content)).body, args.rounds)
+                fast = per_call_us(lambda: FastJSONResponse(content).body, args.rounds)
+                print(f"{endpoint:<18} {mode:<8} {len(raw):>7} {gzipped:>7} "
+                      f"{brotlied if brotlied is not None else '-':>7} "
+                      f"{default:>11.1f} {fast:>9.1f} {default / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Per-edit latency of budget sessions vs resending the whole budget to /spending-insights.
+
+For budgets of several sizes, replays the same edit stream two ways: the
+stateless client POSTs the full expense dict and goal list after every
+edit, the session client PATCHes only the changed expenses. Half the edits
+change one expense (total spend moves, so the prompt changes and both
+paths need the model); the other half move money between two expenses
+(total unchanged: the session keeps its last answer, the stateless path
+recomputes everything and finds the prompt in the generation cache).
+
+Also times the server-side work alone: _spending_insights_prompt on the
+full budget vs BudgetSession.apply + analysis + prompt.
+
+    python -m benchmarks.bench_sessions --expenses 10 100 1000 --edits 200 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stub_server import running_stub
+
+GOALS = [{"name": "Emergency Fund", "amount": 12000, "months": 12}, {"name": "Vacation", "amount": 2500, "months": 8}]
+
+def make_budget(size: int, rng: random.Random):
+    expenses = {"rent": 1500.0, "food": 400.0, "transportation": 200.0}
+    for i in range(size - len(expenses)):
+        expenses[f"expense {i}"] = float(rng.randint(5, 200))
+    return {"income": 6000.0 + size * 100, "expenses": expenses, "goals": GOALS, "user_type": "professional"}
+
+def make_edits(budget, count: int, rng: random.Random):
+    """
+    Edits as {label: new amount}: alternately one changed amount, then an
+    amount moved between two labels. Whole dollars keep every move exact.
+    """
+
+    expenses = dict(budget["expenses"])
+    labels = list(expenses)
+    edits = []
+    for i in range(count):
+        if i % 2 == 0:
+            label = rng.choice(labels)
+            edit = {label: float(rng.randint(5, 500))}
+        else:
+            source, target = rng.sample(labels, 2)
+            moved = min(expenses[source], rng.randint(1, 50))
+            edit = {source: expenses[source] - moved, target: expenses[target] + moved}
+        expenses.update(edit)
+        edits.append(edit)
+    return edits
+
+async def replay(app, budget, edits):
+    """Return (stateless ms per edit, session ms per edit, session cache statuses)."""
+
+    from app.ibm_api import get_generation_cache
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        get_generation_cache().clear()
+        stateless, expenses = [], dict(budget["expenses"])
+        for edit in edits:
+            expenses.update(edit)
+            start = time.perf_counter()
+            response = await client.post("/api/v1/spending-insights?verbose=false",
+                                         json={**budget, "expenses": expenses})
+            response.raise_for_status()
+            stateless.append((time.perf_counter() - start) * 1000)
+
+        # Both runs see the same prompts; the session must not find the first run's answers cached
+        get_generation_cache().clear()
+        response = await client.post("/api/v1/sessions?verbose=false", json=budget)
+        response.raise_for_status()
+        session_id = response.json()["session_id"]
+        session, statuses = [], []
+        for edit in edits:
+            start = time.perf_counter()
+            response = await client.patch(f"/api/v1/sessions/{session_id}?verbose=false", json={"set": edit})
+            response.raise_for_status()
+            session.append((time.perf_counter() - start) * 1000)
+            statuses.append(response.json()["insights"]["cache_status"])
+        return stateless, session, statuses
+
+def compute_only_us(budget, edits):
+    """Server-side work per edit, without HTTP or the model: full recomputation vs session update."""
+
+    from app.ibm_api import _spending_insights_prompt
+    from app.sessions import BudgetSession
+
+    expenses = dict(budget["expenses"])
+    start = time.perf_counter()
+    for edit in edits:
+        expenses.update(edit)
+        _spending_insights_prompt({**budget, "expenses": expenses})
+    full = (time.perf_counter() - start) / len(edits) * 1e6
+
+    session = BudgetSession(budget["income"], budget["expenses"], budget["goals"], budget["user_type"])
+    start = time.perf_counter()
+    for edit in edits:
+        session.apply(set_expenses=edit)
+        session.analysis()
+        session.prompt()
+    incremental = (time.perf_counter() - start) / len(edits) * 1e6
+    return full, incremental
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--expenses", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms) as (url, stub):
+        os.environ["WATSONX_ENDPOINT"] = url
+        os.environ["HEDGE_ENABLED"] = "false"
+        from app.engine import get_engine
+        from app.resilience import get_backend, get_resilience_config
+        get_engine.cache_clear()
+        get_resilience_config.cache_clear()
+        get_backend.cache_clear()
+        from main import app
+
+        print(f"upstream {args.latency_ms:.0f} ms, {args.edits} edits per run; mean ms per edit")
+        print(f"{'expenses':>8} {'edit':<15} {'full ms':>8} {'session ms':>11} {'skipped':>8} "
+              f"{'full us':>8} {'session us':>11}")
+        for size in args.expenses:
+            rng = random.Random(size)
+            budget = make_budget(size, rng)
+            edits = make_edits(budget, args.edits, rng)
+            stateless, session, statuses = asyncio.run(replay(app, budget, edits))
+            full_us, session_us = compute_only_us(budget, edits)
+            for kind, parity in (("total changed", 0), ("total unchanged", 1)):
+                skipped = statuses[parity::2].count("unchanged")
+                print(f"{size:>8} {kind:<15} {statistics.mean(stateless[parity::2]):>8.2f} "
+                      f"{statistics.mean(session[parity::2]):>11.2f} {skipped:>8} "
+                      f"{full_us:>8.0f} {session_us:>11.0f}")
+
+if __name__ == "__main__":
+    main()
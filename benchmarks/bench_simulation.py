@@ -0,0 +1,74 @@
+"""
+Monte Carlo goal simulation: latency per request, reproducibility and process-pool scaling.
+
+Times simulate_goals for one budget at several path counts and goal
+horizons, checks that the same inputs give the same projection (twice with
+the derived seed, and across a process boundary), then simulates a
+portfolio of budgets serially and spread over worker processes.
+
+    python -m benchmarks.bench_simulation --paths 10000 20000 50000 --budgets 200 --processes 4
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.simulation import simulate_budget, simulate_goals, simulate_portfolio
+
+GOALS = [{"name": "Emergency Fund", "amount": 12000, "months": 12},
+         {"name": "Vacation", "amount": 2500, "months": 8},
+         {"name": "Car", "amount": 15000, "months": 36}]
+
+def make_budgets(count: int, seed: int = 11):
+    rng = random.Random(seed)
+    return [
+        {
+            "income": float(rng.randint(3000, 12000)),
+            "expenses": {"rent": float(rng.randint(800, 3000)), "food": float(rng.randint(200, 900)),
+                         "car insurance": float(rng.randint(50, 250)), "fun": float(rng.randint(50, 600))},
+            "goals": rng.sample(GOALS, rng.randint(1, len(GOALS))),
+        }
+        for _ in range(count)
+    ]
+
+def time_ms(call, rounds: int) -> float:
+    call()
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paths", type=int, nargs="+", default=[10000, 20000, 50000])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[36, 120, 600])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--budgets", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'paths':>8} {'horizon':>8} {'simulated':>10} {'ms/request':>11}")
+    for horizon in args.horizons:
+        goals = GOALS[:-1] + [{"name": "House", "amount": 60000, "months": horizon}]
+        for paths in args.paths:
+            ms = time_ms(lambda: simulate_goals(7000, 2200, 1500, goals, paths=paths), args.rounds)
+            simulated = simulate_goals(7000, 2200, 1500, goals, paths=paths)["paths"]
+            print(f"{paths:>8} {horizon:>8} {simulated:>10} {ms:>11.1f}")
+
+    budgets = make_budgets(args.budgets)
+    first = simulate_budget(**budgets[0])
+    print(f"reproducible: {first == simulate_budget(**budgets[0])} (derived seed {first['seed']})")
+
+    start = time.perf_counter()
+    serial = simulate_portfolio(budgets, processes=1)
+    serial_s = time.perf_counter() - start
+    start = time.perf_counter()
+    pooled = simulate_portfolio(budgets, processes=args.processes)
+    pooled_s = time.perf_counter() - start
+    print(f"portfolio of {args.budgets}: serial {serial_s:.2f} s, {args.processes} processes {pooled_s:.2f} s "
+          f"({serial_s / pooled_s:.1f}x), identical across processes: {serial == pooled}")
+
+if __name__ == "__main__":
+    main()
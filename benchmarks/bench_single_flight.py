@@ -0,0 +1,71 @@
+"""
+Upstream calls vs duplicate concurrency for identical /generate requests.
+
+Each round clears the NLU and generation caches, then fires N identical
+requests at once. With single-flight coalescing the stub should see one
+analyze and one generate call per round however large N gets. A final
+round injects upstream failures to check every duplicate gets the degraded answer.
+
+    python -m benchmarks.bench_single_flight --latency-ms 100 --duplicates 1 8 32 128
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.stub_server import running_stub
+
+QUESTION = {"question": "Is it worth paying off my credit card before investing?", "persona": "general"}
+
+async def burst(app, duplicates: int):
+    """Fire `duplicates` identical requests concurrently; return (status codes, cache statuses, seconds)."""
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.post("/api/v1/generate", json=QUESTION)
+                                           for _ in range(duplicates)))
+        return ([r.status_code for r in responses], [r.json().get("cache_status") for r in responses],
+                time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--duplicates", type=int, nargs="+", default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms) as (url, stub):
+        os.environ["NLU_ENDPOINT"] = url
+        os.environ["WATSONX_ENDPOINT"] = url
+        from app.engine import get_engine
+        from app.ibm_api import get_generation_cache, get_nlu_cache
+        get_engine.cache_clear()
+        from main import app
+
+        def run_round(duplicates: int):
+            get_nlu_cache().clear()
+            get_generation_cache().clear()
+            before = dict(stub.state.calls)
+            statuses, cache_statuses, seconds = asyncio.run(burst(app, duplicates))
+            calls = {name: stub.state.calls[name] - before[name] for name in ("analyze", "generate")}
+            return statuses, cache_statuses, seconds, calls
+
+        print(f"upstream latency {args.latency_ms:.0f} ms, caches cleared before every round")
+        print(f"{'duplicates':>10} {'ok':>5} {'seconds':>9} {'analyze calls':>14} {'generate calls':>15}")
+        for duplicates in args.duplicates:
+            statuses, _, seconds, calls = run_round(duplicates)
+            print(f"{duplicates:>10} {statuses.count(200):>5} {seconds:>9.3f} "
+                  f"{calls['analyze']:>14} {calls['generate']:>15}")
+
+        stub.state.config["error_rate"] = 1.0
+        duplicates = max(args.duplicates)
+        statuses, cache_statuses, seconds, calls = run_round(duplicates)
+        stub.state.config["error_rate"] = 0.0
+        print(f"\nfailing upstream, {duplicates} duplicates: {cache_statuses.count('degraded')} degraded, "
+              f"{calls['generate']} generate call(s)")
+        assert statuses.count(200) == duplicates and cache_statuses.count("degraded") == duplicates
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Time-to-first-token vs total latency for /generate and /generate/stream.
+
+The app is served under uvicorn so response bytes reach the client as they
+are flushed; the stub models Granite with a fixed first-token delay plus a
+per-token delay.
+
+    python -m benchmarks.bench_streaming --latency-ms 300 --token-latency-ms 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stub_server import running_stub, serve_in_thread
+
+def measure(client: httpx.Client, path: str, question: str):
+    """Return (time to first token, total time) in milliseconds for one request."""
+
+    start = time.perf_counter()
+    first_token = None
+    with client.stream("POST", path, json={"question": question, "persona": "student"}) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if first_token is None and ('"token"' in line or '"response"' in line):
+                first_token = time.perf_counter()
+    end = time.perf_counter()
+    return (first_token - start) * 1000, (end - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=20.0)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms, token_latency_ms=args.token_latency_ms) as (stub_url, _):
+        os.environ["WATSONX_ENDPOINT"] = stub_url
+        from app.engine import get_engine
+        get_engine.cache_clear()
+        from main import app
+
+        with serve_in_thread(app) as app_url, httpx.Client(base_url=app_url, timeout=60) as client:
+            print(f"{'endpoint':<26} {'ttft p50 ms':>12} {'total p50 ms':>13}")
+            for path in ("/api/v1/generate", "/api/v1/generate/stream"):
+                # Distinct questions per endpoint so the generation cache does not serve the second pass
+                samples = [measure(client, path, f"How do I budget? {path} run {i}") for i in range(args.runs)]
+                ttft = statistics.median(s[0] for s in samples)
+                total = statistics.median(s[1] for s in samples)
+                print(f"{path:<26} {ttft:>12.1f} {total:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Cold first request vs warm requests, with and without startup warm-up.
+
+Starts a fresh single-worker server for each mode, waits for /api/v1/ready,
+then times the first request to each endpoint against the median of the
+following ones. Without warm-up the first request pays for lazily built
+resources (HTTP client and TLS context, NLU matchers, template compilation,
+caches); with it the first request should be as fast as a warm one. Every
+request is distinct so result caches do not answer it.
+
+    python -m benchmarks.bench_warmup --requests 20 --latency-ms 20
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.stub_server import _free_port, running_stub
+
+def payload(endpoint: str, i: int):
+    if endpoint == "nlu":
+        return {"text": f"I want to save for rent and pay my credit card, attempt {i}"}
+    if endpoint == "generate":
+        return {"question": f"How do I build an emergency fund, attempt {i}?", "persona": "student"}
+    return {"income": 4000 + i, "expenses": {"rent": 1200, "food": 400}, "savings_goal": 500, "user_type": "student"}
+
+@contextlib.contextmanager
+def fresh_server(env):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        env={**os.environ, **env}
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{url}/api/v1/ready", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("server did not become ready")
+            time.sleep(0.05)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="requests per endpoint after the first")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stub time to first token")
+    args = parser.parse_args()
+
+    endpoints = ["nlu", "generate", "budget-summary"]
+    with running_stub(latency_ms=args.latency_ms) as (stub_url, _):
+        print(f"{'mode':<10} {'endpoint':<16} {'first ms':>9} {'warm p50 ms':>12} {'ratio':>7}")
+        for mode, enabled in (("cold", "false"), ("warmed", "true")):
+            with fresh_server({"WATSONX_ENDPOINT": stub_url, "WARMUP_ENABLED": enabled}) as url:
+                with httpx.Client(base_url=f"{url}/api/v1") as client:
+                    client.get("/health")  # open the connection outside the timings
+                    for endpoint in endpoints:
+                        timings = []
+                        for i in range(args.requests + 1):
+                            start = time.perf_counter()
+                            client.post(f"/{endpoint}", json=payload(endpoint, i)).raise_for_status()
+                            timings.append((time.perf_counter() - start) * 1000)
+                        warm = statistics.median(timings[1:])
+                        print(f"{mode:<10} {endpoint:<16} {timings[0]:>9.2f} {warm:>12.2f} {timings[0] / warm:>7.2f}")
+
+if __name__ == "__main__":
+    main()
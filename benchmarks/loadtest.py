@@ -0,0 +1,215 @@
+"""
+Load test for every API endpoint, with saved-baseline regression checks.
+
+Runs the FastAPI app in-process (ASGI transport) or under uvicorn with
+several workers, against the deterministic Watson/Watsonx stub, and drives
+/nlu, /generate, /budget-summary, /spending-insights and /health at each
+concurrency level and payload profile. Reports p50/p95/p99 latency and
+requests/sec per cell. Payloads are seeded, and each request is distinct
+so result caches do not hide the work.
+
+    python -m benchmarks.loadtest --profiles small large --concurrency 1 16
+    python -m benchmarks.loadtest --server uvicorn --workers 4 --save-baseline baseline.json
+    python -m benchmarks.loadtest --compare baseline.json --threshold 10
+
+With --compare the run exits non-zero when any cell's p95 latency rises, or
+its requests/sec drops, by more than --threshold percent.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List
+
+import httpx
+
+from benchmarks.stub_server import _free_port, running_stub
+
+ENDPOINTS = ["nlu", "generate", "budget-summary", "spending-insights", "health"]
+
+# Expense categories per budget, and words per NLU/generate question
+PROFILES = {
+    "small": {"categories": 5, "words": 12},
+    "medium": {"categories": 50, "words": 60},
+    "large": {"categories": 500, "words": 250},
+    "huge": {"categories": 5000, "words": 1000},
+}
+
+WORDS = ["budget", "save", "rent", "loan", "invest", "credit", "card", "monthly", "emergency",
+         "fund", "debt", "income", "groceries", "retirement", "car", "insurance", "should", "I"]
+
+def make_payload(endpoint: str, profile: Dict[str, int], rng: random.Random, i: int) -> Dict[str, Any]:
+    """One request body; `i` makes it distinct from every other request in the run."""
+
+    if endpoint == "health":
+        return {}
+    if endpoint in ("nlu", "generate"):
+        text = f"[{i}] " + " ".join(rng.choice(WORDS) for _ in range(profile["words"])) + "?"
+        return {"text": text} if endpoint == "nlu" else {"question": text, "persona": rng.choice(["student", "professional"])}
+    expenses = {f"category_{c}": round(rng.uniform(5, 900), 2) for c in range(profile["categories"])}
+    expenses["rent"] = round(rng.uniform(500, 2500), 2)
+    income = round(rng.uniform(2000, 15000), 2) + i / 100
+    if endpoint == "budget-summary":
+        return {"income": income, "expenses": expenses, "savings_goal": rng.randint(100, 1000),
+                "currency": "$", "user_type": rng.choice(["student", "professional"])}
+    return {"income": income, "expenses": expenses, "user_type": "professional",
+            "goals": [{"name": "Emergency Fund", "amount": 10000, "months": 12}]}
+
+async def run_cell(client: httpx.AsyncClient, endpoint: str, profile_name: str, concurrency: int,
+                   requests: int, seed: int) -> Dict[str, Any]:
+    """Drive one endpoint at a fixed concurrency; return latency percentiles and throughput."""
+
+    rng = random.Random(f"{seed}:{endpoint}:{profile_name}:{concurrency}")
+    payloads = [make_payload(endpoint, PROFILES[profile_name], rng, i) for i in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(payloads)
+
+    async def worker() -> None:
+        nonlocal errors
+        for payload in queue:
+            start = time.perf_counter()
+            if endpoint == "health":
+                response = await client.get("/api/v1/health")
+            else:
+                response = await client.post(f"/api/v1/{endpoint}", json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "endpoint": endpoint, "profile": profile_name, "concurrency": concurrency,
+        "requests": len(latencies), "errors": errors,
+        "p50_ms": round(cuts[49] * 1000, 3), "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3), "rps": round(len(latencies) / elapsed, 2),
+    }
+
+def cell_key(cell: Dict[str, Any]) -> str:
+    return f"{cell['endpoint']}/{cell['profile']}/c{cell['concurrency']}"
+
+@contextlib.contextmanager
+def uvicorn_workers(workers: int, env: Dict[str, str]):
+    """Run `uvicorn main:app` with several worker processes; yields its base URL once healthy."""
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env={**os.environ, **env}
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{url}/api/v1/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not become healthy")
+            time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+async def run_suite(args, client_factory) -> List[Dict[str, Any]]:
+    results = []
+    async with client_factory() as client:
+        for endpoint in args.endpoints:
+            profiles = ["small"] if endpoint == "health" else args.profiles
+            for profile_name in profiles:
+                for concurrency in args.concurrency:
+                    cell = await run_cell(client, endpoint, profile_name, concurrency, args.requests, args.seed)
+                    print(f"{cell_key(cell):<36} {cell['p50_ms']:>9.2f} {cell['p95_ms']:>9.2f} "
+                          f"{cell['p99_ms']:>9.2f} {cell['rps']:>9.1f} {cell['errors']:>7}", flush=True)
+                    results.append(cell)
+    return results
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> List[str]:
+    """Return a description of every cell that regressed past `threshold` percent."""
+
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {cell_key(cell): cell for cell in json.load(f)["results"]}
+    regressions = []
+    for cell in results:
+        before = baseline.get(cell_key(cell))
+        if before is None:
+            continue
+        p95_change = (cell["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+        rps_change = (cell["rps"] / before["rps"] - 1) * 100 if before["rps"] else 0.0
+        if p95_change > threshold:
+            regressions.append(f"{cell_key(cell)}: p95 {before['p95_ms']:.2f} -> {cell['p95_ms']:.2f} ms "
+                               f"(+{p95_change:.1f}%)")
+        if -rps_change > threshold:
+            regressions.append(f"{cell_key(cell)}: rps {before['rps']:.1f} -> {cell['rps']:.1f} "
+                               f"({rps_change:.1f}%)")
+        if cell["errors"] > before["errors"]:
+            regressions.append(f"{cell_key(cell)}: errors {before['errors']} -> {cell['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn worker processes")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=["small", "medium", "large"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per cell")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON written by --save-baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression, percent")
+    args = parser.parse_args()
+
+    with running_stub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms) as (stub_url, _):
+        env = {"NLU_ENDPOINT": stub_url, "WATSONX_ENDPOINT": stub_url}
+        print(f"server={args.server} stub latency {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, "
+              f"{args.requests} requests per cell")
+        print(f"{'endpoint/profile/concurrency':<36} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7}")
+
+        if args.server == "inprocess":
+            os.environ.update(env)
+            from app.engine import get_engine
+            get_engine.cache_clear()
+            from main import app
+            transport = httpx.ASGITransport(app=app)
+            results = asyncio.run(run_suite(args, lambda: httpx.AsyncClient(
+                transport=transport, base_url="http://loadtest", timeout=300)))
+        else:
+            with uvicorn_workers(args.workers, env) as url:
+                limits = httpx.Limits(max_connections=max(args.concurrency))
+                results = asyncio.run(run_suite(args, lambda: httpx.AsyncClient(
+                    base_url=url, timeout=300, limits=limits)))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare")},
+                       "results": results}, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) past {args.threshold:.0f}%:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\nno regressions past {args.threshold:.0f}% against {args.compare}")
+
+if __name__ == "__main__":
+    main()
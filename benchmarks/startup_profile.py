@@ -0,0 +1,85 @@
+"""
+Startup profiler: time `import main` (which builds the app) and break it down per module.
+
+Each run is a fresh interpreter. Reports the median wall time to import main
+(measured without `-X importtime`, which inflates it), then, from separate
+`-X importtime` runs, the slowest modules by cumulative import time and self
+time per top-level package. With --budget-ms the command exits non-zero when
+the median goes over the budget, so CI can fail a change that makes cold
+starts slower.
+
+    python -m benchmarks.startup_profile --runs 5 --top 20
+    python -m benchmarks.startup_profile --budget-ms 900
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+PROBE = ("import time\n"
+         "start = time.perf_counter()\n"
+         "import main\n"
+         "print(time.perf_counter() - start)\n")
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+def profile_once(importtime: bool) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """One fresh interpreter; returns (seconds to import main, {module: (self_us, cumulative_us)})."""
+
+    flags = ["-X", "importtime"] if importtime else []
+    result = subprocess.run([sys.executable, *flags, "-c", PROBE],
+                            capture_output=True, text=True, cwd=os.getcwd(), check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="modules to list")
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.environ["STARTUP_BUDGET_MS"]) if os.getenv("STARTUP_BUDGET_MS") else None,
+                        help="fail when the median import time exceeds this (default: STARTUP_BUDGET_MS)")
+    args = parser.parse_args()
+
+    walls: List[float] = []
+    samples: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    for _ in range(args.runs):
+        wall, _ = profile_once(importtime=False)
+        walls.append(wall * 1000)
+        _, modules = profile_once(importtime=True)
+        for name, times in modules.items():
+            samples[name].append(times)
+
+    cumulative = {name: statistics.median(t[1] for t in times) / 1000 for name, times in samples.items()}
+    packages: Dict[str, float] = defaultdict(float)
+    for name, times in samples.items():
+        packages[name.split(".")[0]] += statistics.median(t[0] for t in times) / 1000
+
+    median_wall = statistics.median(walls)
+    print(f"import main: median {median_wall:.1f} ms over {args.runs} runs "
+          f"(min {min(walls):.1f}, max {max(walls):.1f})")
+
+    print(f"\n{'module':<48} {'cumulative ms':>14}")
+    for name, ms in sorted(cumulative.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<48} {ms:>14.1f}")
+
+    print(f"\n{'package':<48} {'self ms':>14}")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<48} {ms:>14.1f}")
+
+    if args.budget_ms is not None:
+        if median_wall > args.budget_ms:
+            print(f"\nFAIL: import main took {median_wall:.1f} ms, budget {args.budget_ms:.0f} ms")
+            raise SystemExit(1)
+        print(f"\nOK: import main took {median_wall:.1f} ms, budget {args.budget_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Deterministic local stand-in for the Watson NLU and Watsonx services.
+
+Speaks the same JSON protocol that app/engine.py uses for NLU_ENDPOINT and
+WATSONX_ENDPOINT, with tunable latency so benchmarks can model a slow
+upstream without network access or credentials.
+
+Run standalone:
+    python -m benchmarks.stub_server --port 9000 --latency-ms 200
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import random
+import re
+import socket
+import threading
+import time
+from typing import Dict, Any
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+STUB_RESPONSE = (
+    "Here is a stub answer from the local Watsonx stand-in. "
+    "Build an emergency fund, pay down high-interest debt first, "
+    "and automate a fixed transfer to savings every month. "
+)
+
+STUB_TOKENS = re.findall(r"\S+\s*", STUB_RESPONSE)
+
+def create_stub_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, token_latency_ms: float = 0.0,
+                    seed: int = 0) -> FastAPI:
+    """
+    Build the stub ASGI app; settings live in app.state.config and can be changed live.
+
+    latency_ms is the time to first token, token_latency_ms the delay between
+    tokens, so a non-streamed generation costs latency + tokens * token_latency.
+    Setting app.state.config["error_rate"] makes that fraction of calls fail with 503;
+    "slow_rate" makes that fraction take "slow_ms" longer (a slow tail).
+
+    /v1/generate_batch answers several prompts in one call, each prompt after
+    the first adding "batch_item_ms". A non-zero "capacity" limits how many
+    generation calls (single or batched) are served at once, like the decode
+    slots of an inference server; the rest queue.
+    """
+
+    app = FastAPI(title="Watson/Watsonx stub")
+    app.state.config = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "token_latency_ms": token_latency_ms,
+                        "error_rate": 0.0, "slow_rate": 0.0, "slow_ms": 0.0, "batch_item_ms": 0.0,
+                        "capacity": 0}
+    app.state.calls = {"analyze": 0, "generate": 0, "generate_stream": 0, "generate_batch": 0, "batched_prompts": 0}
+    slots = {}
+    rng = random.Random(seed)
+
+    async def delay() -> None:
+        config = app.state.config
+        seconds = (config["latency_ms"] + rng.uniform(0, config["jitter_ms"])) / 1000
+        if config["slow_rate"] and rng.random() < config["slow_rate"]:
+            seconds += config["slow_ms"] / 1000
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+        if config["error_rate"] and rng.random() < config["error_rate"]:
+            raise HTTPException(status_code=503, detail="stub: injected failure")
+
+    @contextlib.asynccontextmanager
+    async def generation_slot():
+        capacity = app.state.config["capacity"]
+        if not capacity:
+            yield
+            return
+        if slots.get("capacity") != capacity:
+            slots.update(capacity=capacity, semaphore=asyncio.Semaphore(capacity))
+        async with slots["semaphore"]:
+            yield
+
+    @app.post("/v1/analyze")
+    async def analyze(body: Dict[str, Any]):
+        app.state.calls["analyze"] += 1
+        await delay()
+        digest = hashlib.sha256(body.get("text", "").encode("utf-8")).digest()
+        label = ("positive", "negative", "neutral")[digest[0] % 3]
+        return {
+            "sentiment": {"document": {"score": round(digest[1] / 255, 2), "label": label}},
+            "keywords": [{"text": "budget", "relevance": 0.9}],
+            "entities": []
+        }
+
+    @app.post("/v1/generate")
+    async def generate(body: Dict[str, Any]):
+        app.state.calls["generate"] += 1
+        async with generation_slot():
+            await delay()
+            await asyncio.sleep(len(STUB_TOKENS) * app.state.config["token_latency_ms"] / 1000)
+        return {"results": [{"generated_text": STUB_RESPONSE, "stop_reason": "eos_token"}]}
+
+    @app.post("/v1/generate_batch")
+    async def generate_batch(body: Dict[str, Any]):
+        inputs = body.get("inputs", [])
+        app.state.calls["generate_batch"] += 1
+        app.state.calls["batched_prompts"] += len(inputs)
+        async with generation_slot():
+            await delay()
+            await asyncio.sleep((len(STUB_TOKENS) * app.state.config["token_latency_ms"]
+                                 + max(0, len(inputs) - 1) * app.state.config["batch_item_ms"]) / 1000)
+        return {"results": [{"generated_text": STUB_RESPONSE, "stop_reason": "eos_token"} for _ in inputs]}
+
+    @app.post("/v1/generate_stream")
+    async def generate_stream(body: Dict[str, Any]):
+        app.state.calls["generate_stream"] += 1
+
+        async def events():
+            await delay()
+            for i, token in enumerate(STUB_TOKENS):
+                if i:
+                    await asyncio.sleep(app.state.config["token_latency_ms"] / 1000)
+                yield f"data: {json.dumps({'results': [{'generated_text': token}]})}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextlib.contextmanager
+def serve_in_thread(asgi_app, port: int = 0):
+    """Serve any ASGI app under uvicorn on a background thread; yields its base URL."""
+
+    port = port or _free_port()
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=port,
+                                           log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+@contextlib.contextmanager
+def running_stub(latency_ms: float = 0.0, jitter_ms: float = 0.0, token_latency_ms: float = 0.0,
+                 port: int = 0):
+    """Serve the stub on a background thread; yields (base_url, stub_app)."""
+
+    stub_app = create_stub_app(latency_ms, jitter_ms, token_latency_ms)
+    with serve_in_thread(stub_app, port) as url:
+        yield url, stub_app
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local Watson/Watsonx stub server.")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--token-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_stub_app(args.latency_ms, args.jitter_ms, args.token_latency_ms),
+                host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+
+    normalized = unicodedata.normalize("NFKC", text)
+    return " ".join(normalized.split()).casefold()
+
+def canonicalize_prompt(prompt: str) -> str:
+    """
+    Canonical form of a prompt for generation caching: NFKC, no trailing
+    whitespace on lines and no leading/trailing blank lines. Case and inner
+    spacing are kept because the model can see them.
+    """
+
+    normalized = unicodedata.normalize("NFKC", prompt)
+    return "\n".join(line.rstrip() for line in normalized.splitlines()).strip("\n")
+
+def content_key(text: str) -> str:
+    """Content-addressed cache key for a piece of text."""
+
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class CacheBackend(ABC):
+    """Interface for shared cache stores that sit behind the in-process LRU."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """The stored value, or None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serializable value, expiring after `ttl` seconds if given."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a key if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every key."""
+
+class SQLiteCacheBackend(CacheBackend):
+    """Local on-disk cache store backed by sqlite, shareable between worker processes."""
+
+    def __init__(self, path: str, table: str = "cache"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        payload = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with size and TTL bounds.
+
+    An optional shared backend is consulted on local misses and written
+    through on every set, so several workers can share warm entries.
+    Values are deep-copied on the way in and out so callers can never
+    mutate a cached result.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 3600.0,
+                 backend: Optional[CacheBackend] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a copy of the cached value, or None on a miss."""
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return copy.deepcopy(value)
+                del self._data[key]
+                self._stats["expirations"] += 1
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self._stats["shared_hits"] += 1
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value locally and in the shared backend, if any."""
+
+        self._store(key, copy.deepcopy(value))
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def _store(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Drop all local entries (the shared backend is left untouched)."""
+
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and the current hit rate."""
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._data)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["shared_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
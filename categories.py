@@ -0,0 +1,169 @@
+import difflib
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence
+
+from app.nlu_engine import PhraseMatcher
+
+# Canonical budget category -> category labels and merchant/description words
+# that mean it. Multi-word aliases are matched as phrases and win over the
+# single words inside them ("car insurance" is insurance, not transportation).
+CATEGORY_TAXONOMY = {
+    "rent": ["rent", "rental", "housing", "mortgage", "landlord", "lease", "apartment", "property management",
+             "hoa", "property tax"],
+    "utilities": ["utilities", "utility", "electric", "electricity", "power", "energy", "water", "sewer", "trash",
+                  "gas bill", "heating", "internet", "broadband", "wifi", "phone", "mobile", "cell phone",
+                  "telecom", "cable"],
+    "food": ["food", "groceries", "grocery", "supermarket", "market", "whole foods", "trader joes", "dining",
+             "dining out", "eating out", "restaurant", "takeout", "take out", "uber eats", "doordash",
+             "cafe", "coffee", "bakery", "meals", "lunch", "snacks"],
+    "transportation": ["transportation", "transport", "car", "auto", "vehicle", "fuel", "gas", "gasoline", "petrol",
+                       "gas station", "transit", "bus", "train", "metro", "subway", "parking", "toll", "tolls",
+                       "uber", "lyft", "taxi", "commute", "car maintenance"],
+    "insurance": ["insurance", "premium", "premiums", "car insurance", "auto insurance", "health insurance",
+                  "life insurance", "renters insurance", "home insurance"],
+    "loan_payment": ["loan payment", "loan", "student loan", "car payment", "auto loan", "debt", "debt payment",
+                     "credit card payment", "repayment"],
+    "healthcare": ["healthcare", "health", "medical", "pharmacy", "doctor", "dentist", "dental", "hospital",
+                   "clinic", "prescription", "medicine", "therapy"],
+    "entertainment": ["entertainment", "fun", "netflix", "spotify", "hulu", "cinema", "movies", "games", "gaming",
+                      "concert", "hobbies", "recreation", "nightlife"],
+    "subscriptions": ["subscriptions", "subscription", "membership", "memberships", "gym", "streaming"],
+    "shopping": ["shopping", "clothing", "clothes", "apparel", "amazon", "retail", "household", "personal care"],
+    "education": ["education", "tuition", "school", "books", "textbooks", "course", "courses", "university"],
+    "childcare": ["childcare", "child care", "daycare", "babysitter", "nanny"],
+    "travel": ["travel", "hotel", "airline", "flights", "vacation"],
+    "savings": ["savings", "saving", "investment", "investments", "retirement", "emergency fund"],
+}
+
+# Canonical categories treated as fixed costs in spending insights
+FIXED_EXPENSE_CATEGORIES = ("rent", "insurance", "loan_payment")
+
+# Benchmark ratio name -> canonical category it is computed from
+BENCHMARK_CATEGORIES = {"housing": "rent", "transportation": "transportation", "food": "food"}
+
+# Longest savings goal accepted, in months
+MAX_GOAL_MONTHS = 600
+
+def goal_deadline(months: float) -> int:
+    """The month a goal is due: whole months rounded up, within 1..MAX_GOAL_MONTHS."""
+
+    return min(max(math.ceil(float(months)), 1), MAX_GOAL_MONTHS)
+
+# Lowercase letter runs: digits, store numbers and punctuation never decide a category
+_WORD = re.compile(r"[a-z]+")
+
+# Unknown words may carry up to this many extra trailing letters beyond a known
+# stem of at least MIN_STEM letters ("rentals" -> "rental", "movie" stays unknown)
+MAX_SUFFIX = 3
+MIN_STEM = 4
+
+class CategoryClassifier:
+    """
+    Map free-form category labels and merchant strings onto CATEGORY_TAXONOMY.
+
+    Resolution is cheapest first: an exact index of every alias; then a
+    phrase match over the words, each word looked up exactly or by stem
+    prefix (plurals, "-ing"); then, for words still unknown, a fuzzy match
+    against the alias vocabulary to absorb typos. The longest phrase wins,
+    and the rightmost among equals ("Pet Food" is food). Every resolution,
+    misses included, is memoized in a bounded LRU, so the repeated labels
+    and merchants of real statements cost one dict lookup after the first.
+    """
+
+    def __init__(self, taxonomy: Optional[Dict[str, List[str]]] = None, memo_size: int = 65536,
+                 fuzzy_cutoff: float = 0.85):
+        taxonomy = CATEGORY_TAXONOMY if taxonomy is None else taxonomy
+        self.categories = tuple(taxonomy)
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+        phrases = [(tuple(_WORD.findall(alias.lower())), category)
+                   for category, aliases in taxonomy.items() for alias in [category, *aliases]]
+        self._exact = {" ".join(tokens): category for tokens, category in reversed(phrases)}
+        self._vocabulary = frozenset(token for tokens, _ in phrases for token in tokens)
+        self._stems = frozenset(token for token in self._vocabulary if len(token) >= MIN_STEM)
+        self._by_length: Dict[int, List[str]] = {}
+        for token in sorted(self._stems):
+            self._by_length.setdefault(len(token), []).append(token)
+        self._matcher = PhraseMatcher(phrases)
+
+        self.classify = lru_cache(maxsize=memo_size)(self._classify)
+        self._fuzzy_token = lru_cache(maxsize=memo_size)(self._fuzzy_token)
+
+    def _known_token(self, token: str) -> Optional[str]:
+        if token in self._vocabulary:
+            return token
+        stems = self._stems
+        for end in range(len(token) - 1, max(len(token) - MAX_SUFFIX, MIN_STEM) - 1, -1):
+            if token[:end] in stems:
+                return token[:end]
+        return None
+
+    def _fuzzy_token(self, token: str) -> Optional[str]:
+        # A similarity ratio of 2*matches/(len(a)+len(b)) >= cutoff bounds the other word's length
+        cutoff = self.fuzzy_cutoff
+        shortest, longest = math.ceil(len(token) * cutoff / (2 - cutoff)), int(len(token) * (2 - cutoff) / cutoff)
+        candidates = [word for length in range(shortest, longest + 1) for word in self._by_length.get(length, ())]
+        close = difflib.get_close_matches(token, candidates, n=1, cutoff=cutoff)
+        return close[0] if close else None
+
+    def _match(self, tokens: Sequence[str]) -> Optional[str]:
+        matches = self._matcher.find(tokens)
+        if not matches:
+            return None
+        start, end, category = max(matches, key=lambda match: (match[1] - match[0], match[1]))
+        return category
+
+    def _classify(self, text: str) -> Optional[str]:
+        words = _WORD.findall(text.lower())
+        if not words:
+            return None
+        category = self._exact.get(" ".join(words))
+        if category is not None:
+            return category
+
+        known = [self._known_token(word) for word in words]
+        category = self._match([token or word for token, word in zip(known, words)])
+        if category is not None:
+            return category
+
+        corrected = [token or (self._fuzzy_token(word) if len(word) >= MIN_STEM else None)
+                     for token, word in zip(known, words)]
+        if corrected == known:
+            return None
+        return self._match([token or word for token, word in zip(corrected, words)])
+
+    def categorize(self, text: str, default: str = "other") -> str:
+        """Canonical category of `text`, or `default` when nothing in it is recognized."""
+        return self.classify(text) or default
+
+    def stats(self) -> Dict[str, Any]:
+        """Memo hit/miss counters."""
+
+        info = self.classify.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+        }
+
+@lru_cache(maxsize=1)
+def get_category_classifier() -> CategoryClassifier:
+    """
+    Compile the taxonomy once per process: CATEGORY_MEMO_SIZE resolutions are
+    memoized, and CATEGORY_FUZZY_CUTOFF (0-1) is the similarity a misspelled
+    word needs to count as an alias.
+    """
+    return CategoryClassifier(
+        memo_size=int(os.getenv("CATEGORY_MEMO_SIZE", "65536")),
+        fuzzy_cutoff=float(os.getenv("CATEGORY_FUZZY_CUTOFF", "0.85")),
+    )
+
+def canonical_category(label: str) -> Optional[str]:
+    """Canonical category of an expense label or merchant string, or None if unrecognized."""
+    return get_category_classifier().classify(label)
@@ -0,0 +1,482 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from functools import lru_cache
+from typing import Dict, Any, Deque, List, Optional, Tuple
+
+from app.cache import CacheBackend, SQLiteCacheBackend
+from app.ibm_api import analyze_nlu_async, fallback_advice, generate_with_watsonx_cached_async
+from app.metrics import stage
+from app.utils import build_conversation_prompt
+
+# Token counts are estimated from UTF-8 length: about 4 bytes of English per token
+BYTES_PER_TOKEN = 4
+
+# Tokens of the question and of the answer kept in the one-line digest of a compacted turn
+DIGEST_QUESTION_TOKENS = 32
+DIGEST_ANSWER_TOKENS = 32
+
+# Summary header lines ("Earlier turns (N), summarized:", "Recent turns:"), reserved from the summary budget
+SUMMARY_HEADER_TOKENS = 16
+
+# Most frequent earlier topics listed in the summary, and distinct topics counted per conversation
+SUMMARY_TOPICS = 8
+TOPIC_LIMIT = 64
+
+# Bookkeeping counted toward the store's memory limit for every live conversation, in bytes
+CONVERSATION_OVERHEAD_BYTES = 2048
+
+# History rendered into the prompt of a conversation's first question
+FIRST_TURN_HISTORY = "(This is the first question.)"
+
+def estimate_tokens(text: str) -> int:
+    """Token count estimate: never below what the model's tokenizer sees for English text."""
+    return -(-len(text.encode("utf-8")) // BYTES_PER_TOKEN)
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    """`text` on one line, cut at a word boundary to at most `max_tokens` estimated tokens ("..." marks a cut)."""
+
+    text = " ".join(text.split())
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    clipped = text.encode("utf-8")[:max(max_tokens * BYTES_PER_TOKEN - 3, 0)].decode("utf-8", "ignore")
+    if " " in clipped:
+        clipped = clipped.rsplit(" ", 1)[0]
+    return clipped + "..."
+
+@lru_cache(maxsize=1)
+def get_conversation_config() -> Dict[str, int]:
+    """
+    Prompt budgets, in estimated tokens: CONVERSATION_CONTEXT_TOKENS of history per
+    prompt, of which CONVERSATION_SUMMARY_TOKENS summarize compacted turns, and
+    CONVERSATION_QUESTION_TOKENS for the question itself.
+    """
+    config = {
+        "context_tokens": int(os.getenv("CONVERSATION_CONTEXT_TOKENS", "1536")),
+        "summary_tokens": int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "384")),
+        "question_tokens": int(os.getenv("CONVERSATION_QUESTION_TOKENS", "512")),
+    }
+    if not SUMMARY_HEADER_TOKENS * 2 <= config["summary_tokens"] < config["context_tokens"]:
+        raise ValueError("CONVERSATION_SUMMARY_TOKENS must be at least "
+                         f"{SUMMARY_HEADER_TOKENS * 2} and below CONVERSATION_CONTEXT_TOKENS")
+    return config
+
+def check_question(question: str) -> str:
+    """The question stripped; ValueError when it is empty or over CONVERSATION_QUESTION_TOKENS."""
+
+    question = question.strip()
+    if not question:
+        raise ValueError("question must not be empty")
+    limit = get_conversation_config()["question_tokens"]
+    if estimate_tokens(question) > limit:
+        raise ValueError(f"question is longer than {limit} tokens")
+    return question
+
+class Conversation:
+    """
+    The prompt-side state of one multi-turn conversation; every turn also goes to a TurnLog.
+
+    Recent turns are shown verbatim (answers clipped) within the history
+    budget left after the summary. When they overflow it, the oldest are
+    compacted into the summary: a count of earlier turns, their most
+    frequent NLU keywords, and one-line digests of the latest compacted
+    turns, the oldest digests dropped first to stay within
+    `summary_tokens`. Every part of the history is budgeted as it is
+    added, so the history never exceeds `context_tokens` however long the
+    conversation runs, and the memory it holds is bounded the same way.
+    """
+
+    def __init__(self, persona: str = "general", context_tokens: Optional[int] = None,
+                 summary_tokens: Optional[int] = None):
+        config = get_conversation_config()
+        self.persona = persona
+        self.context_tokens = config["context_tokens"] if context_tokens is None else context_tokens
+        self.summary_tokens = config["summary_tokens"] if summary_tokens is None else summary_tokens
+        self.turn_count = 0
+        self.compacted = 0
+        self.topics: Counter = Counter()
+        # (line, tokens) digests of the latest compacted turns
+        self._digests: Deque[Tuple[str, int]] = deque()
+        self._digest_tokens = 0
+        # (text, tokens, digest line, keywords) of the turns shown verbatim, oldest first
+        self._window: Deque[Tuple[str, int, str, List[str]]] = deque()
+        self._window_tokens = 0
+        self._history: Optional[str] = None
+        self.revision = uuid.uuid4().hex
+        # Whether a turn or the persona changed since the store last saved this conversation
+        self.unsaved = True
+
+    @property
+    def window_budget(self) -> int:
+        return self.context_tokens - self.summary_tokens
+
+    def add_turn(self, question: str, answer: str, keywords: List[str]) -> None:
+        """Show a new turn verbatim, compacting the oldest shown turns until the window fits its budget."""
+
+        text = f"User: {question}\nAssistant: {clip_tokens(answer, self.window_budget // 3)}\n"
+        digest = (f"- Asked: {clip_tokens(question, DIGEST_QUESTION_TOKENS)} "
+                  f"Answered: {clip_tokens(answer, DIGEST_ANSWER_TOKENS)}\n")
+        self._show(text, digest, keywords)
+        self.turn_count += 1
+        self.unsaved = True
+
+    def _show(self, text: str, digest: str, keywords: List[str]) -> None:
+        tokens = estimate_tokens(text)
+        self._window.append((text, tokens, digest, keywords))
+        self._window_tokens += tokens
+        while self._window_tokens > self.window_budget:
+            _, tokens, digest, keywords = self._window.popleft()
+            self._window_tokens -= tokens
+            self._compact(digest, keywords)
+        self._history = None
+
+    def _compact(self, digest: str, keywords: List[str]) -> None:
+        self.compacted += 1
+        self.topics.update(keyword.lower() for keyword in keywords)
+        if len(self.topics) > TOPIC_LIMIT:
+            self.topics = Counter(dict(self.topics.most_common(TOPIC_LIMIT)))
+        tokens = estimate_tokens(digest)
+        self._digests.append((digest, tokens))
+        self._digest_tokens += tokens
+        budget = self.summary_tokens - self.summary_tokens // 4 - SUMMARY_HEADER_TOKENS
+        while self._digest_tokens > budget:
+            self._digest_tokens -= self._digests.popleft()[1]
+
+    def history(self) -> str:
+        """Summary of compacted turns and the recent turns, re-rendered only after a turn is added."""
+
+        if self._history is None:
+            parts = []
+            if self.compacted:
+                parts.append(f"Earlier turns ({self.compacted}), summarized:\n")
+                if self.topics:
+                    topics = ", ".join(f"{topic} ({count})" for topic, count in self.topics.most_common(SUMMARY_TOPICS))
+                    parts.append(clip_tokens(f"Topics: {topics}", self.summary_tokens // 4 - 1) + "\n")
+                parts.extend(line for line, _ in self._digests)
+                if self._window:
+                    parts.append("Recent turns:\n")
+            parts.extend(text for text, _, _, _ in self._window)
+            self._history = "".join(parts).rstrip("\n") or FIRST_TURN_HISTORY
+        return self._history
+
+    def prompt(self, question: str, nlu_analysis: Dict[str, Any]) -> str:
+        return build_conversation_prompt(question, self.history(), self.persona, nlu_analysis=nlu_analysis)
+
+    async def ask(self, question: str, timeout: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Answer `question` in context and add it as a turn. Returns the turn for
+        the log and the /generate-shaped result. `question` must have passed check_question.
+        """
+
+        nlu_result = await analyze_nlu_async(question)
+        with stage("prompt"):
+            prompt = self.prompt(question, nlu_result)
+        response_text, cache_status = await generate_with_watsonx_cached_async(
+            prompt, timeout=timeout, fallback=lambda: fallback_advice(nlu_result)
+        )
+
+        keywords = [kw["text"] for kw in nlu_result.get("keywords", [])]
+        turn = {
+            "index": self.turn_count,
+            "question": question,
+            "answer": response_text,
+            "persona": self.persona,
+            "keywords": keywords,
+            "cache_status": cache_status,
+            "created": time.time()
+        }
+        self.add_turn(question, response_text, keywords)
+        return turn, {
+            "response": response_text,
+            "cache_status": cache_status,
+            "persona": self.persona,
+            "nlu_analysis": nlu_result,
+            "prompt": prompt
+        }
+
+    def context(self) -> Dict[str, Any]:
+        """How the history is currently made up."""
+
+        return {
+            "turns": self.turn_count,
+            "compacted_turns": self.compacted,
+            "verbatim_turns": len(self._window),
+            "history_tokens": estimate_tokens(self.history()) if self.turn_count else 0,
+            "context_tokens": self.context_tokens
+        }
+
+    def nbytes(self) -> int:
+        """Approximate process memory held by this conversation, counted toward the store's limit."""
+
+        # The rendered history is held between prompts; count its largest size whether rendered yet or not
+        size = CONVERSATION_OVERHEAD_BYTES + self.context_tokens * BYTES_PER_TOKEN
+        for text, _, digest, keywords in self._window:
+            size += sys.getsizeof(text) + sys.getsizeof(digest) + sum(sys.getsizeof(k) for k in keywords)
+        size += sum(sys.getsizeof(line) for line, _ in self._digests)
+        return size + sum(sys.getsizeof(topic) + 64 for topic in self.topics)
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serializable prompt-side state; the turns themselves live in the TurnLog."""
+
+        return {
+            "persona": self.persona,
+            "turn_count": self.turn_count,
+            "compacted": self.compacted,
+            "topics": dict(self.topics),
+            "digests": [line for line, _ in self._digests],
+            "window": [[text, digest, keywords] for text, _, digest, keywords in self._window],
+            "revision": self.revision
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Conversation":
+        conversation = cls(state["persona"])
+        conversation.compacted = state["compacted"]
+        conversation.topics = Counter(state["topics"])
+        for line in state["digests"]:
+            conversation._digests.append((line, estimate_tokens(line)))
+            conversation._digest_tokens += estimate_tokens(line)
+        # Re-showing the window re-applies the budgets, which may have changed since the save
+        for text, digest, keywords in state["window"]:
+            conversation._show(text, digest, keywords)
+        conversation.turn_count = state["turn_count"]
+        conversation.revision = state["revision"]
+        conversation.unsaved = False
+        return conversation
+
+class TurnLog:
+    """
+    Append-only log of every turn of every conversation, held in process
+    memory; it is lost with the process. Subclasses store it elsewhere.
+    """
+
+    # Whether turns outlive this process (and so outlive the live conversation)
+    durable = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns: Dict[str, List[Dict[str, Any]]] = {}
+        self._sizes: Dict[str, int] = {}
+
+    def append(self, conversation_id: str, turn: Dict[str, Any]) -> None:
+        size = sys.getsizeof(turn["question"]) + sys.getsizeof(turn["answer"]) + 512
+        with self._lock:
+            self._turns.setdefault(conversation_id, []).append(turn)
+            self._sizes[conversation_id] = self._sizes.get(conversation_id, 0) + size
+
+    def read(self, conversation_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            turns = self._turns.get(conversation_id, [])
+            return turns[offset:offset + limit if limit is not None else None]
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._turns.pop(conversation_id, None)
+            self._sizes.pop(conversation_id, None)
+
+    def expire(self, idle_seconds: float) -> int:
+        """Drop the turns of conversations idle for `idle_seconds`; in memory they go with the conversation instead."""
+        return 0
+
+    def nbytes(self, conversation_id: str) -> int:
+        """Process memory held for one conversation's turns."""
+        return self._sizes.get(conversation_id, 0)
+
+class SQLiteTurnLog(TurnLog):
+    """Turn log in a local sqlite file, shareable between worker processes and kept across restarts."""
+
+    durable = True
+
+    def __init__(self, path: str, table: str = "conversation_turns"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(conversation_id TEXT NOT NULL, turn_index INTEGER NOT NULL, turn TEXT NOT NULL, "
+            "PRIMARY KEY (conversation_id, turn_index))"
+        )
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}_activity (conversation_id TEXT PRIMARY KEY, last_active REAL NOT NULL)"
+        )
+
+    def append(self, conversation_id: str, turn: Dict[str, Any]) -> None:
+        payload = json.dumps(turn, separators=(",", ":"))
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (conversation_id, turn_index, turn) VALUES (?, ?, ?)",
+                (conversation_id, turn["index"], payload)
+            )
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table}_activity (conversation_id, last_active) VALUES (?, ?)",
+                (conversation_id, time.time())
+            )
+
+    def read(self, conversation_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT turn FROM {self.table} WHERE conversation_id = ? ORDER BY turn_index LIMIT ? OFFSET ?",
+                (conversation_id, -1 if limit is None else limit, offset)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute(f"DELETE FROM {self.table}_activity WHERE conversation_id = ?", (conversation_id,))
+
+    def expire(self, idle_seconds: float) -> int:
+        cutoff = time.time() - idle_seconds
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            deleted = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE conversation_id IN "
+                f"(SELECT conversation_id FROM {self.table}_activity WHERE last_active < ?)", (cutoff,)
+            ).rowcount
+            self._conn.execute(f"DELETE FROM {self.table}_activity WHERE last_active < ?", (cutoff,))
+        return deleted
+
+    def nbytes(self, conversation_id: str) -> int:
+        return 0
+
+class ConversationStore:
+    """
+    Live Conversations by id, bounded by memory rather than count: once
+    the live conversations and their in-memory turn logs hold more than
+    `max_bytes`, the least recently used are evicted. Entries also expire
+    after `ttl` seconds without use.
+
+    Without a backend an evicted or expired conversation is gone, turns
+    included. With a shared backend every save is written through and the
+    turns go to a durable TurnLog, so eviction only drops the live copy:
+    a lookup rebuilds it from the stored state when the revision differs,
+    which lets any worker serve any conversation. Concurrent turns on one
+    conversation from different workers: the last save wins.
+    """
+
+    # Seconds between sweeps of idle conversations' turns from a durable log
+    EXPIRE_INTERVAL = 60.0
+
+    def __init__(self, max_bytes: int = 64 << 20, ttl: Optional[float] = 86400.0,
+                 backend: Optional[CacheBackend] = None, log: Optional[TurnLog] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        self.log = TurnLog() if log is None else log
+        self._live: "OrderedDict[str, Tuple[Conversation, Optional[float]]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._next_expire = time.monotonic() + self.EXPIRE_INTERVAL
+        self._stats = {"created": 0, "turns": 0, "saves": 0, "loads": 0, "evictions": 0, "expirations": 0}
+
+    def new_id(self) -> str:
+        """Id for a new conversation, which is stored by its first save."""
+
+        self._stats["created"] += 1
+        return uuid.uuid4().hex
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        entry = self._live.get(conversation_id)
+        conversation = None
+        if entry is not None:
+            if entry[1] is None or entry[1] > time.monotonic():
+                conversation = entry[0]
+            else:
+                self._drop(conversation_id)
+                self._stats["expirations"] += 1
+
+        if self.backend is not None:
+            state = self.backend.get(conversation_id)
+            if state is None:
+                self._drop(conversation_id)
+                return None
+            if conversation is None or conversation.revision != state["revision"]:
+                conversation = Conversation.from_state(state)
+                self._stats["loads"] += 1
+
+        if conversation is not None:
+            self._touch(conversation_id, conversation)
+        return conversation
+
+    def record(self, conversation_id: str, conversation: Conversation, turn: Dict[str, Any]) -> None:
+        """Append a turn to the log and save the conversation it was added to."""
+
+        self.log.append(conversation_id, turn)
+        self._stats["turns"] += 1
+        self.save(conversation_id, conversation)
+        if self.log.durable and self.ttl and time.monotonic() >= self._next_expire:
+            self._next_expire = time.monotonic() + self.EXPIRE_INTERVAL
+            self.log.expire(self.ttl)
+
+    def save(self, conversation_id: str, conversation: Conversation) -> None:
+        """Record a conversation's current state under a new revision."""
+
+        conversation.revision = uuid.uuid4().hex
+        conversation.unsaved = False
+        self._stats["saves"] += 1
+        self._touch(conversation_id, conversation)
+        if self.backend is not None:
+            self.backend.set(conversation_id, conversation.state(), self.ttl)
+
+    def turns(self, conversation_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.log.read(conversation_id, offset, limit)
+
+    def delete(self, conversation_id: str) -> bool:
+        found = conversation_id in self._live
+        self._drop(conversation_id)
+        if self.backend is not None:
+            found = found or self.backend.get(conversation_id) is not None
+            self.backend.delete(conversation_id)
+            self.log.delete(conversation_id)
+        return found
+
+    def _drop(self, conversation_id: str) -> None:
+        """Forget the live copy, and the turns too when the log keeps them only in memory."""
+
+        self._live.pop(conversation_id, None)
+        self._bytes -= self._sizes.pop(conversation_id, 0)
+        if not self.log.durable:
+            self.log.delete(conversation_id)
+
+    def _touch(self, conversation_id: str, conversation: Conversation) -> None:
+        size = conversation.nbytes() + self.log.nbytes(conversation_id)
+        self._bytes += size - self._sizes.get(conversation_id, 0)
+        self._sizes[conversation_id] = size
+        self._live[conversation_id] = (conversation, time.monotonic() + self.ttl if self.ttl else None)
+        self._live.move_to_end(conversation_id)
+        # The conversation in use is never the one evicted
+        while self._bytes > self.max_bytes and len(self._live) > 1:
+            self._drop(next(iter(self._live)))
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "live": len(self._live), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+@lru_cache(maxsize=1)
+def get_conversation_store() -> ConversationStore:
+    """
+    Initialize the conversation store: live conversations and in-memory turn logs are
+    kept within CONVERSATION_STORE_MEMORY_MB, each dropped after CONVERSATION_TTL idle
+    seconds. Set CONVERSATION_STORE_BACKEND=sqlite to persist state and turns to
+    CONVERSATION_STORE_PATH, shared between workers and kept across restarts.
+    """
+    backend = log = None
+    if os.getenv("CONVERSATION_STORE_BACKEND", "").lower() == "sqlite":
+        path = os.getenv("CONVERSATION_STORE_PATH", "conversations.sqlite3")
+        backend = SQLiteCacheBackend(path, table="conversations")
+        log = SQLiteTurnLog(path)
+
+    return ConversationStore(
+        max_bytes=int(float(os.getenv("CONVERSATION_STORE_MEMORY_MB", "64")) * (1 << 20)),
+        ttl=float(os.getenv("CONVERSATION_TTL", "86400")),
+        backend=backend,
+        log=log
+    )
@@ -0,0 +1,186 @@
+import asyncio
+import contextlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, AsyncIterator, Callable, Iterator, Optional, Set
+
+if TYPE_CHECKING:
+    import httpx
+
+@lru_cache(maxsize=1)
+def get_httpx():
+    """
+    Import httpx on first use. It pulls in httpcore, trio and rich (about a
+    quarter of a second), and with the offline engines it is never needed.
+    """
+    import httpx
+    return httpx
+
+class AsyncEngine:
+    """
+    Non-blocking execution engine for the IBM backend calls.
+
+    Remote services are reached through one pooled keep-alive HTTP client per
+    event loop; sync-only SDK code runs on a bounded thread pool instead of the
+    event loop. Every call is subject to a timeout and to a shared concurrency
+    limit so a slow upstream cannot exhaust the worker.
+    """
+
+    def __init__(self, nlu_endpoint: Optional[str] = None, watsonx_endpoint: Optional[str] = None,
+                 timeout: float = 30.0, max_concurrency: int = 32, max_connections: int = 64,
+                 thread_workers: Optional[int] = None):
+        self.nlu_endpoint = nlu_endpoint.rstrip("/") if nlu_endpoint else None
+        self.watsonx_endpoint = watsonx_endpoint.rstrip("/") if watsonx_endpoint else None
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.executor = ThreadPoolExecutor(max_workers=thread_workers or max_concurrency,
+                                           thread_name_prefix="ibm-api")
+        self._lock = threading.Lock()
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._sync_client: Optional["httpx.Client"] = None
+        # Closing of clients left behind by earlier loops, awaited by aclose
+        self._retiring: Set["asyncio.Task"] = set()
+
+    @property
+    def remote(self) -> bool:
+        """Whether any service is reached over HTTP."""
+        return bool(self.nlu_endpoint or self.watsonx_endpoint)
+
+    def _limits(self) -> "httpx.Limits":
+        return get_httpx().Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+
+    def _loop_resources(self, client: bool = True):
+        """Return the semaphore and (created on first need) HTTP client bound to the running event loop."""
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # asyncio primitives and connection pools cannot be shared across loops
+            if self._client is not None:
+                task = loop.create_task(self._close_client(self._loop, self._client))
+                self._retiring.add(task)
+                task.add_done_callback(self._retiring.discard)
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._client = None
+        if client and self._client is None:
+            self._client = get_httpx().AsyncClient(limits=self._limits(), timeout=self.timeout)
+        return self._semaphore, self._client
+
+    def _get_sync_client(self) -> "httpx.Client":
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = get_httpx().Client(limits=self._limits(), timeout=self.timeout)
+            return self._sync_client
+
+    async def post_json(self, url: str, payload: Dict[str, Any],
+                        timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POST a JSON payload over the pooled client and return the decoded body."""
+
+        semaphore, client = self._loop_resources()
+        timeout = self.timeout if timeout is None else timeout
+        async with semaphore:
+            response = await asyncio.wait_for(client.post(url, json=payload, timeout=timeout), timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def post_json_sync(self, url: str, payload: Dict[str, Any],
+                       timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Blocking counterpart of post_json for sync callers."""
+
+        response = self._get_sync_client().post(url, json=payload,
+                                                timeout=self.timeout if timeout is None else timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def stream_events(self, url: str, payload: Dict[str, Any],
+                            timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """POST a JSON payload and yield each decoded Server-Sent Event `data:` payload."""
+
+        semaphore, client = self._loop_resources()
+        timeout = self.timeout if timeout is None else timeout
+        async with semaphore:
+            async with client.stream("POST", url, json=payload, timeout=timeout) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        yield json.loads(line[5:])
+
+    def stream_events_sync(self, url: str, payload: Dict[str, Any],
+                           timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Blocking counterpart of stream_events for sync callers."""
+
+        with self._get_sync_client().stream("POST", url, json=payload,
+                                            timeout=self.timeout if timeout is None else timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith("data:"):
+                    yield json.loads(line[5:])
+
+    async def run_sync(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Run a blocking function on the engine's thread pool."""
+
+        semaphore, _ = self._loop_resources(client=False)
+        timeout = self.timeout if timeout is None else timeout
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(loop.run_in_executor(self.executor, func, *args), timeout)
+
+    async def warm_up(self) -> None:
+        """
+        Create this loop's HTTP client (loading TLS certificates takes tens of
+        milliseconds) if any service is remote, and start one pool thread, so
+        the first request does not.
+        """
+
+        self._loop_resources(client=self.remote)
+        await asyncio.get_running_loop().run_in_executor(self.executor, lambda: None)
+
+    @staticmethod
+    async def _close_client(loop: asyncio.AbstractEventLoop, client: "httpx.AsyncClient") -> None:
+        """Close a client on the loop its connections belong to."""
+
+        if loop is asyncio.get_running_loop():
+            await client.aclose()
+        elif loop.is_running():
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+        else:
+            # A closed loop cannot close its transports; emptying the pool still frees the sockets with it
+            with contextlib.suppress(RuntimeError):
+                await client.aclose()
+
+    async def aclose(self) -> None:
+        """Close pooled connections: the current loop's client and any left behind by earlier loops."""
+
+        if self._client is not None:
+            await self._close_client(self._loop, self._client)
+            self._client = None
+            self._loop = None
+        loop = asyncio.get_running_loop()
+        retiring = [task for task in self._retiring if task.get_loop() is loop]
+        if retiring:
+            await asyncio.gather(*retiring, return_exceptions=True)
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+@lru_cache(maxsize=1)
+def get_engine() -> AsyncEngine:
+    """
+    Initialize the shared backend engine.
+    NLU_ENDPOINT / WATSONX_ENDPOINT point at HTTP services (e.g. the local stub);
+    when unset, the in-process mocks run on the thread pool.
+    """
+    return AsyncEngine(
+        nlu_endpoint=os.getenv("NLU_ENDPOINT") or None,
+        watsonx_endpoint=os.getenv("WATSONX_ENDPOINT") or None,
+        timeout=float(os.getenv("IBM_API_TIMEOUT", "30")),
+        max_concurrency=int(os.getenv("IBM_API_MAX_CONCURRENCY", "32")),
+        max_connections=int(os.getenv("IBM_API_MAX_CONNECTIONS", "64"))
+    )
@@ -1,61 +1,485 @@
+import asyncio
+import copy
 import os
 import json
-from typing import Dict, Any, Optional
+import hashlib
+import re
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional
 from functools import lru_cache
-import random
+import threading
+
+from app.cache import LRUCache, SQLiteCacheBackend, canonicalize_prompt, content_key
+from app.engine import get_engine
+from app.metrics import DEGRADED_RESPONSES, NLU_TIERS, stage
+from app.nlu_engine import analyze_local, get_nlu_engine
+from app.resilience import UpstreamUnavailable, get_backend
+from app.batcher import MicroBatcher
+from app.singleflight import SingleFlight
+from app.templates import render_prompt, fit_expense_lines
+
+# Decoding parameters sent with every Watsonx generation request
+GENERATION_PARAMS = {"decoding_method": "greedy", "max_new_tokens": 900, "repetition_penalty": 1.05}
+
+# Upstream call counters, used to check how often each backend is actually hit
+_upstream_calls = {"nlu": 0, "generate": 0}
+_upstream_calls_lock = threading.Lock()
+
+def _count_upstream_call(service: str) -> None:
+    """Record one call to an upstream service."""
+    with _upstream_calls_lock:
+        _upstream_calls[service] += 1
+
+def get_upstream_call_counts() -> Dict[str, int]:
+    """Return how many times each upstream service has been called."""
+    with _upstream_calls_lock:
+        return dict(_upstream_calls)
+
+@lru_cache(maxsize=1)
+def get_nlu_cache() -> LRUCache:
+    """
+    Initialize the NLU result cache.
+    Set NLU_CACHE_BACKEND=sqlite to share entries between workers through NLU_CACHE_PATH.
+    """
+    backend = None
+    if os.getenv("NLU_CACHE_BACKEND", "").lower() == "sqlite":
+        backend = SQLiteCacheBackend(os.getenv("NLU_CACHE_PATH", "nlu_cache.sqlite3"), table="nlu")
+    
+    return LRUCache(
+        maxsize=int(os.getenv("NLU_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("NLU_CACHE_TTL", "3600")),
+        backend=backend
+    )
+
+# Concurrent identical analyses share one upstream call
+_nlu_flights = SingleFlight()
+
+@lru_cache(maxsize=1)
+def get_nlu_routing() -> Dict[str, float]:
+    """
+    Tiered NLU routing thresholds. The local engine answers texts it is at least
+    NLU_LOCAL_CONFIDENCE sure about and no longer than NLU_LOCAL_MAX_CHARS; the rest go to NLU_ENDPOINT.
+    """
+    return {
+        "min_confidence": float(os.getenv("NLU_LOCAL_CONFIDENCE", "0.6")),
+        "max_chars": int(os.getenv("NLU_LOCAL_MAX_CHARS", "500"))
+    }
+
+def _local_nlu_tier(text: str):
+    """Run the local engine; return its result and why the remote tier is or is not needed."""
+    
+    result, confidence = get_nlu_engine().analyze_scored(text)
+    routing = get_nlu_routing()
+    if len(text) > routing["max_chars"]:
+        return result, "long_text"
+    if confidence < routing["min_confidence"]:
+        return result, "low_confidence"
+    return result, "confident"
 
-# Mock IBM Watson NLU Analysis
 def analyze_nlu(text: str) -> Dict[str, Any]:
     """
-    Mock implementation of IBM Watson NLU analysis.
-    In production, this would connect to actual IBM Watson NLU service.
+    Analyze text with the tiered analyzer: the offline engine first, then IBM Watson NLU
+    (through the cache) for long or low-confidence texts when NLU_ENDPOINT is set.
+    If the remote call fails, the local result is returned.
     """
     
-    # Mock sentiment analysis
-    sentiments = ["positive", "negative", "neutral"]
-    sentiment_scores = {"positive": 0.8, "negative": 0.2, "neutral": 0.6}
+    if not get_engine().nlu_endpoint:
+        NLU_TIERS.inc(("local", "no_remote"))
+        return analyze_local(text)
+    
+    local_result, reason = _local_nlu_tier(text)
+    if reason == "confident":
+        NLU_TIERS.inc(("local", reason))
+        return local_result
     
-    selected_sentiment = random.choice(sentiments)
+    cache = get_nlu_cache()
+    key = content_key(text)
     
-    # Mock keyword extraction
-    financial_keywords = ["money", "savings", "budget", "expenses", "income", "investment", "debt", "loan", "financial", "spending"]
-    keywords = random.sample(financial_keywords, min(3, len(financial_keywords)))
+    cached = cache.get(key)
+    if cached is not None:
+        NLU_TIERS.inc(("remote", reason))
+        return cached
     
-    # Mock entity extraction
-    entities = []
-    if "month" in text.lower():
-        entities.append({"text": "month", "type": "TIME"})
-    if "year" in text.lower():
-        entities.append({"text": "year", "type": "TIME"})
-    if "$" in text or "dollar" in text.lower():
-        entities.append({"text": "dollar", "type": "MONEY"})
+    try:
+        result = _analyze_nlu_upstream(text)
+    except Exception:
+        NLU_TIERS.inc(("local", "remote_error"))
+        return local_result
+    cache.set(key, result)
+    NLU_TIERS.inc(("remote", reason))
+    return result
+
+async def analyze_nlu_async(text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Non-blocking variant of analyze_nlu for use inside async routes.
+    Concurrent remote calls for the same normalized text share one upstream analysis.
+    """
     
+    with stage("nlu"):
+        if not get_engine().nlu_endpoint:
+            NLU_TIERS.inc(("local", "no_remote"))
+            return analyze_local(text)
+        
+        local_result, reason = _local_nlu_tier(text)
+        if reason == "confident":
+            NLU_TIERS.inc(("local", reason))
+            return local_result
+        
+        cache = get_nlu_cache()
+        key = content_key(text)
+        
+        cached = cache.get(key)
+        if cached is not None:
+            NLU_TIERS.inc(("remote", reason))
+            return cached
+        
+        async def analyze() -> Dict[str, Any]:
+            result = await _analyze_nlu_upstream_async(text, timeout)
+            cache.set(key, result)
+            return result
+        
+        try:
+            result, shared = await _nlu_flights.do(key, analyze)
+        except UpstreamUnavailable as e:
+            NLU_TIERS.inc(("local", _fallback_reason(e)))
+            return local_result
+        except Exception:
+            NLU_TIERS.inc(("local", "remote_error"))
+            return local_result
+        NLU_TIERS.inc(("remote", reason))
+        # Every caller gets its own copy, as with a cache hit
+        return copy.deepcopy(result) if shared else result
+
+def _fallback_reason(error: UpstreamUnavailable) -> str:
+    """Metric label for why an upstream answer was replaced by a local or template one."""
+    return {"circuit open": "breaker_open", "deadline exceeded": "deadline"}.get(error.reason, "remote_error")
+
+def get_nlu_tier_stats() -> Dict[str, Any]:
+    """Analyses served by each tier, and each tier's share of all analyses."""
+    
+    counts = {"local": 0, "remote": 0}
+    reasons: Dict[str, int] = {}
+    for (tier, reason), count in NLU_TIERS.snapshot().items():
+        counts[tier] += count
+        reasons[f"{tier}:{reason}"] = count
+    total = sum(counts.values())
     return {
-        "sentiment": {
-            "document": {
-                "score": sentiment_scores[selected_sentiment],
-                "label": selected_sentiment
-            }
-        },
-        "keywords": [{"text": kw, "relevance": round(random.uniform(0.5, 1.0), 2)} for kw in keywords],
-        "entities": entities[:3]  # Limit to 3 entities
+        "counts": counts,
+        "fractions": {tier: round(count / total, 4) if total else 0.0 for tier, count in counts.items()},
+        "reasons": reasons
     }
 
+def get_nlu_cache_stats() -> Dict[str, Any]:
+    """NLU cache counters plus single-flight coalescing and tier routing counters."""
+    
+    stats = get_nlu_cache().stats()
+    stats["single_flight"] = _nlu_flights.stats()
+    stats["tiers"] = get_nlu_tier_stats()
+    return stats
+
+def _analyze_nlu_upstream(text: str) -> Dict[str, Any]:
+    """Call the configured Watson NLU service."""
+    
+    engine = get_engine()
+    _count_upstream_call("nlu")
+    return engine.post_json_sync(f"{engine.nlu_endpoint}/v1/analyze", {"text": text})
+
+async def _analyze_nlu_upstream_async(text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Async counterpart of _analyze_nlu_upstream, behind the NLU circuit breaker, hedging and request deadline."""
+    
+    engine = get_engine()
+    
+    async def call(attempt_timeout: Optional[float]) -> Dict[str, Any]:
+        _count_upstream_call("nlu")
+        return await engine.post_json(f"{engine.nlu_endpoint}/v1/analyze", {"text": text}, timeout=attempt_timeout)
+    
+    return await get_backend("nlu").call(call, timeout)
+
 @lru_cache(maxsize=1)
 def get_watsonx_model():
     """
     Mock implementation of Watsonx model initialization.
     In production, this would initialize the actual IBM Watsonx Granite model.
+    Import the SDK inside this function rather than at module level, so it
+    loads during worker warm-up instead of on `import main`.
     """
     print("Mock: Initializing Watsonx Granite 3-2-8B Instruct model...")
     return "mock_granite_model"
 
+def _generation_payload(prompt: str) -> Dict[str, Any]:
+    """Request body for the Watsonx text generation endpoint."""
+    return {
+        "model_id": os.getenv("WATSONX_MODEL_ID", "ibm/granite-3-2-8b-instruct"),
+        "project_id": os.getenv("PROJECT_ID"),
+        "input": prompt,
+        "parameters": GENERATION_PARAMS
+    }
+
+@lru_cache(maxsize=1)
+def get_generation_cache() -> LRUCache:
+    """
+    Initialize the generation response cache.
+    Set GENERATION_CACHE_BACKEND=sqlite to persist entries to GENERATION_CACHE_PATH across restarts.
+    """
+    backend = None
+    if os.getenv("GENERATION_CACHE_BACKEND", "").lower() == "sqlite":
+        backend = SQLiteCacheBackend(os.getenv("GENERATION_CACHE_PATH", "generation_cache.sqlite3"),
+                                     table="generation")
+    
+    return LRUCache(
+        maxsize=int(os.getenv("GENERATION_CACHE_SIZE", "512")),
+        ttl=float(os.getenv("GENERATION_CACHE_TTL", "86400")),
+        backend=backend
+    )
+
+# Concurrent identical generations share one upstream call
+_generation_flights = SingleFlight()
+
+@lru_cache(maxsize=1)
+def get_generation_batcher() -> Optional[MicroBatcher]:
+    """
+    Initialize the generation micro-batcher, or None when batching is off.
+    With GENERATION_BATCH_ENABLED, concurrent prompts to WATSONX_ENDPOINT are sent together
+    to its /v1/generate_batch endpoint, up to GENERATION_BATCH_MAX_SIZE per call.
+    """
+    if os.getenv("GENERATION_BATCH_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return MicroBatcher(
+        _generate_batch_upstream_async,
+        max_size=int(os.getenv("GENERATION_BATCH_MAX_SIZE", "8")),
+        max_wait=float(os.getenv("GENERATION_BATCH_MAX_WAIT_MS", "10")) / 1000
+    )
+
+def get_generation_cache_stats() -> Dict[str, Any]:
+    """Generation cache counters plus single-flight coalescing and micro-batching counters."""
+    
+    stats = get_generation_cache().stats()
+    stats["single_flight"] = _generation_flights.stats()
+    batcher = get_generation_batcher()
+    stats["batching"] = batcher.stats() if batcher is not None else None
+    return stats
+
+def generation_cache_key(prompt: str) -> str:
+    """Cache key for a generation: the canonicalized prompt plus model id and decoding parameters."""
+    
+    payload = _generation_payload(canonicalize_prompt(prompt))
+    material = json.dumps([payload["model_id"], payload["parameters"], payload["input"]], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
 def generate_with_watsonx(prompt: str) -> str:
+    """Generate text with Watsonx, serving repeated prompts from the response cache."""
+    
+    return generate_with_watsonx_cached(prompt)[0]
+
+def generate_with_watsonx_cached(prompt: str):
+    """Like generate_with_watsonx, but returns (text, cache_status) with status "hit" or "miss"."""
+    
+    cache = get_generation_cache()
+    key = generation_cache_key(prompt)
+    
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, "hit"
+    
+    text = _generate_upstream(prompt)
+    cache.set(key, text)
+    return text, "miss"
+
+async def generate_with_watsonx_async(prompt: str, timeout: Optional[float] = None) -> str:
+    """Non-blocking variant of generate_with_watsonx for use inside async routes."""
+    
+    return (await generate_with_watsonx_cached_async(prompt, timeout=timeout))[0]
+
+async def generate_with_watsonx_cached_async(prompt: str, timeout: Optional[float] = None,
+                                             fallback: Optional[Callable[[], str]] = None,
+                                             kind: str = "generate"):
+    """
+    Non-blocking variant of generate_with_watsonx_cached.
+    Identical prompts already in flight are awaited rather than re-sent; those report "coalesced".
+    When Watsonx is unavailable (breaker open, deadline reached, call failed) and a
+    `fallback` is given, its text is returned with status "degraded" and not cached.
+    """
+    
+    cache = get_generation_cache()
+    key = generation_cache_key(prompt)
+    
+    async def generate() -> str:
+        text = await _generate_upstream_async(prompt, timeout)
+        cache.set(key, text)
+        return text
+    
+    with stage("generate"):
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, "hit"
+        
+        try:
+            text, shared = await _generation_flights.do(key, generate)
+        except UpstreamUnavailable as e:
+            if fallback is None:
+                raise
+            DEGRADED_RESPONSES.inc((kind, _fallback_reason(e)))
+            return fallback(), "degraded"
+        return text, "coalesced" if shared else "miss"
+
+def _generate_upstream(prompt: str) -> str:
+    """Call the configured Watsonx service, falling back to the in-process mock."""
+    
+    engine = get_engine()
+    if engine.watsonx_endpoint:
+        _count_upstream_call("generate")
+        result = engine.post_json_sync(f"{engine.watsonx_endpoint}/v1/generate", _generation_payload(prompt))
+        return result["results"][0]["generated_text"]
+    return _mock_generate(prompt)
+
+async def _generate_upstream_async(prompt: str, timeout: Optional[float] = None) -> str:
+    """
+    Async counterpart of _generate_upstream, behind the Watsonx circuit breaker,
+    hedging and request deadline; the mock runs on the engine's thread pool.
+    """
+    
+    engine = get_engine()
+    
+    batcher = get_generation_batcher()
+    
+    async def call(attempt_timeout: Optional[float]) -> str:
+        if engine.watsonx_endpoint and batcher is not None:
+            return await batcher.submit(prompt, attempt_timeout)
+        if engine.watsonx_endpoint:
+            _count_upstream_call("generate")
+            result = await engine.post_json(f"{engine.watsonx_endpoint}/v1/generate",
+                                            _generation_payload(prompt), timeout=attempt_timeout)
+            return result["results"][0]["generated_text"]
+        return await engine.run_sync(_mock_generate, prompt, timeout=attempt_timeout)
+    
+    return await get_backend("watsonx").call(call, timeout)
+
+async def _generate_batch_upstream_async(prompts: List[str], timeout: Optional[float] = None) -> List[str]:
+    """Generate several prompts in one call to the Watsonx service's batch endpoint."""
+    
+    engine = get_engine()
+    _count_upstream_call("generate")
+    payload = _generation_payload(prompts[0])
+    del payload["input"]
+    payload["inputs"] = prompts
+    result = await engine.post_json(f"{engine.watsonx_endpoint}/v1/generate_batch", payload, timeout=timeout)
+    return [item["generated_text"] for item in result["results"]]
+
+def generate_with_watsonx_stream(prompt: str) -> Iterator[str]:
+    """
+    Generate text with Watsonx, yielding it token by token as it is produced.
+    Cached responses are replayed as tokens; completed streams are added to the cache.
+    """
+    
+    cache = get_generation_cache()
+    key = generation_cache_key(prompt)
+    
+    cached = cache.get(key)
+    if cached is not None:
+        yield from split_tokens(cached)
+        return
+    
+    engine = get_engine()
+    tokens = []
+    if engine.watsonx_endpoint:
+        _count_upstream_call("generate")
+        for event in engine.stream_events_sync(f"{engine.watsonx_endpoint}/v1/generate_stream",
+                                               _generation_payload(prompt)):
+            token = event["results"][0]["generated_text"]
+            tokens.append(token)
+            yield token
+    else:
+        for token in split_tokens(_mock_generate(prompt)):
+            tokens.append(token)
+            yield token
+    cache.set(key, "".join(tokens))
+
+async def generate_with_watsonx_stream_async(prompt: str, timeout: Optional[float] = None,
+                                             fallback: Optional[Callable[[], str]] = None,
+                                             kind: str = "generate") -> AsyncIterator[str]:
+    """
+    Non-blocking variant of generate_with_watsonx_stream.
+    If Watsonx is unavailable before the first token and a `fallback` is given,
+    its text is streamed instead (and not cached); a failure mid-stream is raised.
+    """
+    
+    cache = get_generation_cache()
+    key = generation_cache_key(prompt)
+    
+    cached = cache.get(key)
+    if cached is not None:
+        for token in split_tokens(cached):
+            yield token
+        return
+    
+    engine = get_engine()
+    tokens = []
+    try:
+        if engine.watsonx_endpoint:
+            async for token in _stream_upstream_async(prompt, timeout):
+                tokens.append(token)
+                yield token
+        else:
+            for token in split_tokens(await _generate_upstream_async(prompt, timeout)):
+                tokens.append(token)
+                yield token
+    except UpstreamUnavailable as e:
+        if fallback is None or tokens:
+            raise
+        DEGRADED_RESPONSES.inc((kind, _fallback_reason(e)))
+        for token in split_tokens(fallback()):
+            yield token
+        return
+    cache.set(key, "".join(tokens))
+
+async def _stream_upstream_async(prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Stream from the Watsonx service behind its circuit breaker and the request
+    deadline. Streams are not hedged, and their durations are not latency samples.
+    """
+    
+    engine = get_engine()
+    backend = get_backend("watsonx")
+    timeout = backend.check(timeout)
+    outcome = None
+    try:
+        _count_upstream_call("generate")
+        async for event in engine.stream_events(f"{engine.watsonx_endpoint}/v1/generate_stream",
+                                                _generation_payload(prompt), timeout=timeout):
+            yield event["results"][0]["generated_text"]
+        outcome = "success"
+    except Exception as e:
+        outcome = "failure"
+        raise UpstreamUnavailable("watsonx", "upstream error", e) from e
+    finally:
+        if outcome == "success":
+            backend.record_success()
+        elif outcome == "failure":
+            backend.record_failure()
+        else:
+            # Closed early by the consumer (client went away); no verdict on the upstream
+            backend.breaker.release()
+
+def fallback_advice(nlu_analysis: Optional[Dict[str, Any]] = None) -> str:
+    """General advice served when Watsonx is unavailable, naming the question's topics if known."""
+    
+    keywords = [kw["text"] for kw in (nlu_analysis or {}).get("keywords", [])[:3]]
+    topic_note = f" on {', '.join(keywords)}" if keywords else ""
+    return render_prompt("fallback_generate", topic_note=topic_note)
+
+def split_tokens(text: str) -> Iterator[str]:
+    """Split text into word tokens with their leading whitespace; joining them gives back the text."""
+    
+    for match in re.finditer(r"\s*\S+|\s+$", text):
+        yield match.group(0)
+
+def _mock_generate(prompt: str) -> str:
     """
     Mock implementation of Watsonx text generation.
     In production, this would call the actual IBM Granite model.
     """
     
+    _count_upstream_call("generate")
+    
     # Mock responses based on prompt content
     if "budget summary" in prompt.lower():
         return """
@@ -153,71 +577,210 @@ def generate_with_watsonx(prompt: str) -> str:
         Personal finance is personal - what works for others may need adjustment for your unique situation.
         """
 
+def _budget_summary_prompt(income: float, expenses: Dict[str, float], savings_goal: float,
+                           currency: str, user_type: str):
+    """Build the budget summary prompt and the figures returned alongside it."""
+    
+    # numpy is imported with app.analytics on first use, not at startup
+    from app.analytics import compute_user_metrics
+    metrics = compute_user_metrics(income, expenses, savings_goal=savings_goal)
+    total_expenses = metrics["total_expenses"]
+    disposable_income = metrics["surplus"]
+    shares = dict(zip(expenses, metrics["shares"]))
+    
+    # Create persona-specific prompt
+    expense_breakdown = fit_expense_lines(
+        [(cat, amt) for cat, amt in expenses.items()],
+        lambda cat, amt: f"- {cat}: {currency}{amt:,.2f} ({shares[cat]:.1f}%)",
+        lambda count, amt: f"- ... {count} more categories: {currency}{amt:,.2f}"
+    )
+    prompt = render_prompt(
+        "budget_summary",
+        user_type=user_type,
+        currency=currency,
+        income=income,
+        total_expenses=total_expenses,
+        savings_goal=savings_goal,
+        disposable_income=disposable_income,
+        expense_breakdown=expense_breakdown
+    )
+    
+    financial_data = {
+        "annual_income": metrics["annual_income"],
+        "annual_expenses": metrics["annual_expenses"],
+        "monthly_disposable": disposable_income,
+        "savings_potential": metrics["savings_potential"]
+    }
+    
+    return prompt, financial_data
+
+def _budget_summary_fallback(income: float, expenses: Dict[str, float], savings_goal: float,
+                             currency: str, financial_data: Dict[str, Any]) -> str:
+    """Template budget summary served when Watsonx is unavailable."""
+    
+    disposable_income = financial_data["monthly_disposable"]
+    left_over = disposable_income - savings_goal
+    if left_over >= 0:
+        savings_note = f"Your savings goal fits, with {currency}{left_over:,.2f} a month to spare."
+    else:
+        savings_note = (f"Your savings goal is {currency}{-left_over:,.2f} a month more than what is left "
+                        f"after expenses; trimming your largest categories would close the gap.")
+    return render_prompt(
+        "fallback_budget_summary",
+        currency=currency,
+        income=income,
+        total_expenses=sum(expenses.values()),
+        disposable_income=disposable_income,
+        savings_goal=savings_goal,
+        savings_note=savings_note
+    )
+
 def generate_budget_summary(income: float, expenses: Dict[str, float], savings_goal: float, 
                           currency: str, user_type: str) -> Dict[str, Any]:
     """Generate a comprehensive budget summary using mock Watsonx model."""
     
-    total_expenses = sum(expenses.values())
-    disposable_income = income - total_expenses
-    annual_income = income * 12
-    annual_expenses = total_expenses * 12
+    prompt, financial_data = _budget_summary_prompt(income, expenses, savings_goal, currency, user_type)
     
-    # Create persona-specific prompt
-    prompt = f"""
-    Create a financial summary for a {user_type} with:
-    - Monthly Income: {currency}{income:,.2f}
-    - Total Monthly Expenses: {currency}{total_expenses:,.2f}
-    - Savings Goal: {currency}{savings_goal:,.2f}
-    - Disposable Income: {currency}{disposable_income:,.2f}
+    response_text, cache_status = generate_with_watsonx_cached(prompt)
     
-    Expense Breakdown:
-    {chr(10).join([f"- {cat}: {currency}{amt:,.2f} ({amt/total_expenses*100:.1f}%)" for cat, amt in expenses.items()])}
+    return {
+        "prompt": prompt,
+        "response": response_text,
+        "cache_status": cache_status,
+        "financial_data": financial_data
+    }
+
+async def generate_budget_summary_async(income: float, expenses: Dict[str, float], savings_goal: float,
+                                        currency: str, user_type: str,
+                                        timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Non-blocking variant of generate_budget_summary."""
     
-    Provide budget summary with insights and recommendations.
-    """
+    with stage("prompt"):
+        prompt, financial_data = _budget_summary_prompt(income, expenses, savings_goal, currency, user_type)
     
-    response_text = generate_with_watsonx(prompt)
+    response_text, cache_status = await generate_with_watsonx_cached_async(
+        prompt, timeout=timeout, kind="budget_summary",
+        fallback=lambda: _budget_summary_fallback(income, expenses, savings_goal, currency, financial_data)
+    )
     
     return {
         "prompt": prompt,
         "response": response_text,
-        "financial_data": {
-            "annual_income": annual_income,
-            "annual_expenses": annual_expenses,
-            "monthly_disposable": disposable_income,
-            "savings_potential": max(0, disposable_income - savings_goal)
-        }
+        "cache_status": cache_status,
+        "financial_data": financial_data
     }
 
-def generate_spending_insights(monthly_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Generate spending insights using mock Watsonx model."""
+def goals_overview(goals: List[Dict[str, Any]]) -> str:
+    """One-line goal list for the spending overview prompt."""
+    
+    return ', '.join([f"{g['name']} (${g['amount']}, {g['months']} months)" for g in goals])
+
+def _spending_insights_prompt(monthly_data: Dict[str, Any]):
+    """Build the spending insights prompt and the analysis returned alongside it."""
     
     income = monthly_data.get("income", 0)
     expenses = monthly_data.get("expenses", {})
     goals = monthly_data.get("goals", [])
     
-    total_expenses = sum(expenses.values())
-    surplus = income - total_expenses
+    from app.analytics import compute_user_metrics
+    metrics = compute_user_metrics(income, expenses, goals=goals)
+    total_expenses = metrics["total_expenses"]
+    surplus = metrics["surplus"]
     
-    prompt = f"""
-    Analyze spending behavior for:
-    - Income: ${income:,.2f}
-    - Total Expenses: ${total_expenses:,.2f}
-    - Monthly Surplus: ${surplus:,.2f}
-    - Goals: {', '.join([f"{g['name']} (${g['amount']}, {g['months']} months)" for g in goals])}
+    prompt = render_prompt(
+        "spending_overview",
+        income=income,
+        total_expenses=total_expenses,
+        surplus=surplus,
+        goals=goals_overview(goals)
+    )
     
-    Provide detailed spending insights and recommendations.
-    """
+    analysis = {
+        "total_expenses": total_expenses,
+        "surplus": surplus,
+        "savings_rate": metrics["savings_rate"],
+        "goals_achievable": metrics["goals_achievable"]
+    }
     
-    response_text = generate_with_watsonx(prompt)
+    return prompt, analysis
+
+def spending_insights_fallback(income: float, analysis: Dict[str, Any]) -> str:
+    """Template spending insights served when Watsonx is unavailable."""
+    
+    if analysis["goals_achievable"]:
+        goals_note = "At this rate your current surplus covers your goals."
+    else:
+        goals_note = "At this rate your surplus does not yet cover all of your goals."
+    return render_prompt(
+        "fallback_spending_insights",
+        income=income,
+        total_expenses=analysis["total_expenses"],
+        surplus=analysis["surplus"],
+        savings_rate=analysis["savings_rate"],
+        goals_note=goals_note
+    )
+
+def _goal_simulation_args(monthly_data: Dict[str, Any]):
+    """simulate_goals arguments for a spending insights request, or None when simulation is off."""
+    
+    # numpy is imported with app.simulation on first use, not at startup
+    from app.simulation import get_simulation_config, split_fixed
+    if not get_simulation_config()["enabled"]:
+        return None
+    fixed, variable = split_fixed(monthly_data.get("expenses", {}))
+    options = monthly_data.get("simulation") or {}
+    return (monthly_data.get("income", 0), fixed, variable, monthly_data.get("goals", [])), options
+
+async def _simulate_goals_async(monthly_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Monte Carlo goal projection for the analysis block, off the event loop."""
+    
+    simulation = _goal_simulation_args(monthly_data)
+    if simulation is None:
+        return None
+    from app.simulation import simulate_goals_async
+    args, options = simulation
+    with stage("simulate"):
+        return await simulate_goals_async(*args, **options)
+
+def generate_spending_insights(monthly_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate spending insights using mock Watsonx model."""
+    
+    prompt, analysis = _spending_insights_prompt(monthly_data)
+    simulation = _goal_simulation_args(monthly_data)
+    if simulation is not None:
+        from app.simulation import simulate_goals
+        analysis["simulation"] = simulate_goals(*simulation[0], **simulation[1])
+    
+    response_text, cache_status = generate_with_watsonx_cached(prompt)
     
     return {
         "prompt": prompt,
         "response": response_text,
-        "analysis": {
-            "total_expenses": total_expenses,
-            "surplus": surplus,
-            "savings_rate": (surplus / income * 100) if income > 0 else 0,
-            "goals_achievable": all(surplus >= g["amount"] / g["months"] for g in goals)
-        }
-    }
\ No newline at end of file
+        "cache_status": cache_status,
+        "analysis": analysis
+    }
+
+async def generate_spending_insights_async(monthly_data: Dict[str, Any],
+                                           timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Non-blocking variant of generate_spending_insights."""
+    
+    with stage("prompt"):
+        prompt, analysis = _spending_insights_prompt(monthly_data)
+    
+    # The projection runs while the model answers
+    simulation, (response_text, cache_status) = await asyncio.gather(
+        _simulate_goals_async(monthly_data),
+        generate_with_watsonx_cached_async(
+            prompt, timeout=timeout, kind="spending_insights",
+            fallback=lambda: spending_insights_fallback(monthly_data.get("income", 0), analysis)
+        )
+    )
+    if simulation is not None:
+        analysis["simulation"] = simulation
+    
+    return {
+        "prompt": prompt,
+        "response": response_text,
+        "cache_status": cache_status,
+        "analysis": analysis
+    }
@@ -0,0 +1,467 @@
+import asyncio
+import codecs
+import csv
+import re
+from collections import defaultdict
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.categories import get_category_classifier
+
+# Parsers are fed in slices of at least this many bytes, off the event loop
+STATEMENT_FEED_BYTES = 1 << 18
+
+# Non-file form fields sent alongside a multipart upload are capped at this many bytes in total
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+# A CSV record or OFX transaction still incomplete after this many characters fails the upload
+# (an unclosed quote or missing line breaks), rather than buffering the rest of the file
+MAX_RECORD_CHARS = 1 << 20
+
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "trans date", "booking date"),
+    "amount": ("amount", "transaction amount", "value"),
+    "debit": ("debit", "debit amount", "withdrawal", "withdrawals", "money out", "paid out"),
+    "credit": ("credit", "credit amount", "deposit", "deposits", "money in", "paid in"),
+    "description": ("description", "merchant", "payee", "name", "details", "narrative", "memo"),
+    "category": ("category",),
+}
+
+OFX_FIELD = re.compile(r"<(DTPOSTED|TRNAMT|NAME|MEMO)>([^<\r\n]*)", re.IGNORECASE)
+AMOUNT_JUNK = re.compile(r"[^0-9.\-]")
+
+class StatementError(ValueError):
+    """An uploaded statement cannot be read: unknown format, missing columns or a malformed upload."""
+
+def categorize_transaction(description: str, category: str = "") -> str:
+    """
+    Canonical budget category for one transaction, from its own category
+    column if it has one, else its description. Category labels outside the
+    taxonomy are kept as lowercase_with_underscores; unknown descriptions are "other".
+    """
+
+    classify = get_category_classifier().classify
+    if category:
+        return classify(category) or category.strip().lower().replace(" ", "_")
+    return classify(description) or "other"
+
+def parse_amount(text: str) -> Optional[float]:
+    """A statement amount as a float: handles currency symbols, thousands separators and (negatives)."""
+
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    text = text.strip()
+    negative = text.startswith("(") and text.endswith(")") or text.endswith("-")
+    cleaned = AMOUNT_JUNK.sub("", text).rstrip("-")
+    if not cleaned:
+        return None
+    try:
+        value = float(cleaned)
+    except ValueError:
+        return None
+    return -abs(value) if negative else value
+
+def month_of(date: str, day_first: bool = False) -> Optional[str]:
+    """The "YYYY-MM" month of an ISO, OFX (YYYYMMDD...) or slash-separated (M/D/Y, or D/M/Y) date."""
+
+    date = date.strip()
+    if len(date) >= 7 and date[4] == "-":
+        return date[:7]
+    if len(date) >= 6 and date[:6].isdigit():
+        return f"{date[:4]}-{date[4:6]}"
+    parts = date.split("/")
+    if len(parts) != 3:
+        return None
+    month = parts[1] if day_first else parts[0]
+    year = parts[2].split(" ", 1)[0]
+    if not (month.isdigit() and year.isdigit()) or not 1 <= int(month) <= 12:
+        return None
+    if len(year) == 2:
+        year = f"20{year}"
+    return f"{year}-{int(month):02d}"
+
+class LedgerTotals:
+    """
+    Per-month, per-category running totals of a statement.
+
+    Memory grows with months x categories, not with the number of
+    transactions, so statements of any size aggregate in constant space.
+    Debits (negative amounts) are expenses; credits are income.
+    """
+
+    def __init__(self):
+        self.expenses: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.income: Dict[str, float] = defaultdict(float)
+        self.transactions = 0
+        self.skipped = 0
+        self.bytes = 0
+
+    def add(self, month: Optional[str], amount: Optional[float], description: str = "", category: str = "") -> None:
+        if month is None or amount is None:
+            self.skipped += 1
+            return
+        self.transactions += 1
+        if amount < 0:
+            self.expenses[(month, categorize_transaction(description, category))] -= amount
+        else:
+            self.income[month] += amount
+
+    def months(self) -> List[str]:
+        return sorted({month for month, _ in self.expenses} | set(self.income))
+
+    def monthly_expenses(self) -> Dict[str, Dict[str, float]]:
+        monthly: Dict[str, Dict[str, float]] = {}
+        for (month, category), amount in sorted(self.expenses.items()):
+            monthly.setdefault(month, {})[category] = round(amount, 2)
+        return monthly
+
+    def average_expenses(self) -> Dict[str, float]:
+        """Mean monthly spend per category over every month in the statement, largest first."""
+
+        months = len(self.months()) or 1
+        totals: Dict[str, float] = defaultdict(float)
+        for (_, category), amount in self.expenses.items():
+            totals[category] += amount
+        return {category: round(amount / months, 2)
+                for category, amount in sorted(totals.items(), key=lambda item: -item[1])}
+
+    def average_income(self) -> float:
+        return round(sum(self.income.values()) / (len(self.months()) or 1), 2)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "transactions": self.transactions,
+            "skipped": self.skipped,
+            "bytes": self.bytes,
+            "months": self.months(),
+            "monthly_expenses": self.monthly_expenses(),
+            "monthly_income": {month: round(amount, 2) for month, amount in sorted(self.income.items())},
+        }
+
+class CSVStatementParser:
+    """
+    Incremental CSV statement parser: feed it byte chunks of any size.
+
+    Only complete records are parsed; a partial last line, or a quoted field
+    still open at the end of a chunk, waits for the next one (up to
+    MAX_RECORD_CHARS). Quote state is
+    tracked incrementally, so each character is scanned once. The header row
+    picks the date, amount (or debit/credit), description and category columns.
+    """
+
+    def __init__(self, totals: LedgerTotals, day_first: bool = False):
+        self.totals = totals
+        self.day_first = day_first
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._pending = ""
+        # Quote state over _pending: its first _scanned characters are already scanned; whether a
+        # quoted field is open, and where the last quoted field opened and closed
+        self._scanned = 0
+        self._quoted = False
+        self._open_at = self._close_at = -2
+        self._columns: Optional[Dict[str, int]] = None
+
+    def feed(self, chunk: bytes) -> None:
+        self.totals.bytes += len(chunk)
+        text = self._pending + self._decoder.decode(chunk)
+        end = self._record_end(text)
+        self._scanned = len(text) - end
+        self._open_at -= end
+        self._close_at -= end
+        self._pending = text[end:]
+        if len(self._pending) > MAX_RECORD_CHARS:
+            raise StatementError(f"A CSV record runs past {MAX_RECORD_CHARS} characters: "
+                                 "check for an unclosed quote or missing line breaks")
+        if end:
+            self._parse(text[:end])
+
+    def _record_end(self, text: str) -> int:
+        """
+        End of the last complete record in `text` (0 if none), advancing the
+        quote state over the part not scanned by earlier calls. As in csv, a
+        quote only opens a quoted field at the start of a field (or as the
+        second half of an escaped ""), so a stray quote such as 12" is text.
+        """
+
+        quoted, open_at, close_at = self._quoted, self._open_at, self._close_at
+        find = text.find
+        at = find('"', self._scanned)
+        while at >= 0:
+            if quoted:
+                quoted, close_at = False, at
+            elif at - 1 == close_at:
+                # The second half of an escaped "": the same field goes on
+                quoted = True
+            elif at == 0 or text[at - 1] in ",\r\n":
+                # Pending text always starts a record, so position 0 starts a field
+                quoted, open_at = True, at
+            at = find('"', at + 1)
+        self._quoted, self._open_at, self._close_at = quoted, open_at, close_at
+        # A newline inside the open quoted field is part of it, not a record end. A quote that
+        # closed it as the last character may yet turn out to be the first half of an escaped ""
+        pending_field = quoted or close_at == len(text) - 1
+        return text.rfind("\n", 0, open_at if pending_field else len(text)) + 1
+
+    def close(self) -> None:
+        text = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        if text.strip():
+            self._parse(text)
+        if self._columns is None:
+            raise StatementError("The CSV statement is empty")
+
+    def _header(self, row: List[str]) -> Dict[str, int]:
+        names = [name.strip().lower() for name in row]
+        columns = {}
+        for field, aliases in CSV_COLUMNS.items():
+            for alias in aliases:
+                if alias in names:
+                    columns[field] = names.index(alias)
+                    break
+        if "date" not in columns or not ("amount" in columns or "debit" in columns or "credit" in columns):
+            raise StatementError("The CSV header needs a date column and an amount or debit/credit column")
+        return columns
+
+    def _parse(self, text: str) -> None:
+        rows = csv.reader(text.splitlines(keepends=True))
+        if self._columns is None:
+            for row in rows:
+                if row:
+                    self._columns = self._header(row)
+                    break
+            else:
+                return
+        columns = self._columns
+        date_col = columns["date"]
+        amount_col, debit_col, credit_col = columns.get("amount"), columns.get("debit"), columns.get("credit")
+        description_col, category_col = columns.get("description"), columns.get("category")
+        width = max(columns.values()) + 1
+        day_first = self.day_first
+        # LedgerTotals.add, inlined: this loop runs once per transaction
+        totals = self.totals
+        expenses, income = totals.expenses, totals.income
+        added = skipped = 0
+
+        for row in rows:
+            if len(row) < width:
+                if row:
+                    skipped += 1
+                continue
+            if amount_col is not None:
+                value = row[amount_col]
+                try:
+                    amount = float(value)
+                except ValueError:
+                    amount = parse_amount(value) if value else None
+            else:
+                debit = parse_amount(row[debit_col]) if debit_col is not None and row[debit_col] else None
+                credit = parse_amount(row[credit_col]) if credit_col is not None and row[credit_col] else None
+                amount = -abs(debit) if debit else (abs(credit) if credit is not None else None)
+            date = row[date_col]
+            month = date[:7] if date[4:5] == "-" else month_of(date, day_first)
+            if month is None or amount is None:
+                skipped += 1
+                continue
+            added += 1
+            if amount < 0:
+                category = categorize_transaction(row[description_col] if description_col is not None else "",
+                                                  row[category_col] if category_col is not None else "")
+                expenses[(month, category)] -= amount
+            else:
+                income[month] += amount
+
+        totals.transactions += added
+        totals.skipped += skipped
+
+class OFXStatementParser:
+    """Incremental OFX/QFX statement parser: each <STMTTRN> block is one transaction."""
+
+    def __init__(self, totals: LedgerTotals, day_first: bool = False):
+        self.totals = totals
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+        self._seen_ofx = False
+
+    def feed(self, chunk: bytes) -> None:
+        self.totals.bytes += len(chunk)
+        text = self._pending + self._decoder.decode(chunk)
+        self._seen_ofx = self._seen_ofx or "<OFX>" in text.upper()
+        start = 0
+        while True:
+            end = text.find("</STMTTRN>", start)
+            if end < 0:
+                break
+            self._transaction(text[start:end])
+            start = end + len("</STMTTRN>")
+        # Keep only the unfinished transaction, if any
+        opening = text.find("<STMTTRN>", start)
+        self._pending = text[opening:] if opening >= 0 else text[max(start, len(text) - len("<STMTTRN>")):]
+        if len(self._pending) > MAX_RECORD_CHARS:
+            raise StatementError(f"An OFX <STMTTRN> runs past {MAX_RECORD_CHARS} characters without closing")
+
+    def close(self) -> None:
+        self._pending = ""
+        if not self._seen_ofx:
+            raise StatementError("The OFX statement has no <OFX> element")
+
+    def _transaction(self, block: str) -> None:
+        fields = {name.upper(): value.strip() for name, value in OFX_FIELD.findall(block)}
+        amount = parse_amount(fields["TRNAMT"]) if fields.get("TRNAMT") else None
+        self.totals.add(month_of(fields.get("DTPOSTED", "")), amount,
+                        fields.get("NAME") or fields.get("MEMO", ""))
+
+STATEMENT_PARSERS: Dict[str, Callable[[LedgerTotals, bool], Any]] = {
+    "csv": CSVStatementParser,
+    "ofx": OFXStatementParser,
+}
+
+def detect_format(filename: str = "", content_type: str = "", head: bytes = b"") -> str:
+    """"csv" or "ofx", from the file extension, then the content type, then the first bytes."""
+
+    suffix = filename.lower().rsplit(".", 1)[-1] if "." in filename else ""
+    if suffix in ("ofx", "qfx"):
+        return "ofx"
+    if suffix == "csv":
+        return "csv"
+    if "ofx" in content_type:
+        return "ofx"
+    if "csv" in content_type:
+        return "csv"
+    sample = head[:1024].lstrip().upper()
+    return "ofx" if sample.startswith(b"OFXHEADER") or b"<OFX>" in sample else "csv"
+
+class _StatementSink:
+    """Buffers statement bytes and feeds them to the parser, off the event loop, in large slices."""
+
+    def __init__(self, totals: LedgerTotals, day_first: bool, statement_format: Optional[str],
+                 filename: str = "", content_type: str = ""):
+        self.totals = totals
+        self.day_first = day_first
+        self.format = statement_format
+        self.filename = filename
+        self.content_type = content_type
+        self.parser = None
+        self._buffer: List[bytes] = []
+        self._size = 0
+
+    def write(self, data: bytes) -> None:
+        if data:
+            self._buffer.append(data)
+            self._size += len(data)
+
+    async def flush(self, final: bool = False) -> None:
+        if self._size < STATEMENT_FEED_BYTES and not (final and self._size):
+            return
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._size = 0
+        if self.parser is None:
+            kind = self.format or detect_format(self.filename, self.content_type, data)
+            self.parser = STATEMENT_PARSERS[kind](self.totals, self.day_first)
+        await asyncio.to_thread(self.parser.feed, data)
+
+    async def close(self) -> None:
+        await self.flush(final=True)
+        if self.parser is None:
+            raise StatementError("No statement data was uploaded")
+        self.parser.close()
+
+class _MultipartStatement:
+    """python-multipart callbacks routing the first file part to a statement sink, and small fields to a dict."""
+
+    def __init__(self, boundary: bytes, make_sink: Callable[[str, str], _StatementSink]):
+        self.make_sink = make_sink
+        self.sink: Optional[_StatementSink] = None
+        self.fields: Dict[str, str] = {}
+        self._field_bytes = 0
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._target: Optional[str] = None
+        self._data: List[bytes] = []
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._part_begin,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+            "on_header_field": lambda data, start, end: self._add_header(data[start:end], b""),
+            "on_header_value": lambda data, start, end: self._add_header(b"", data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+        })
+
+    def _add_header(self, name: bytes, value: bytes) -> None:
+        self._header_name += name
+        self._header_value += value
+
+    def _header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _part_begin(self) -> None:
+        self._headers = {}
+        self._target = None
+        self._data = []
+
+    def _headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"filename" in options:
+            if self.sink is not None:
+                raise StatementError("Upload one statement file per request")
+            self.sink = self.make_sink(options[b"filename"].decode("utf-8", "replace"),
+                                       self._headers.get(b"content-type", b"").decode("latin-1"))
+            self._target = "file"
+        else:
+            self._target = options.get(b"name", b"").decode("utf-8", "replace")
+
+    def _part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._target == "file":
+            self.sink.write(data[start:end])
+            return
+        self._field_bytes += end - start
+        if self._field_bytes > MAX_FORM_FIELD_BYTES:
+            raise StatementError("Form fields are too large")
+        self._data.append(data[start:end])
+
+    def _part_end(self) -> None:
+        if self._target not in (None, "file"):
+            self.fields[self._target] = b"".join(self._data).decode("utf-8", "replace")
+
+async def read_statement(chunks: AsyncIterator[bytes], content_type: str = "",
+                         statement_format: Optional[str] = None,
+                         day_first: bool = False) -> Tuple[LedgerTotals, Dict[str, str]]:
+    """
+    Stream a CSV or OFX statement into per-category monthly totals.
+
+    `chunks` is the request body: either a multipart/form-data upload (the
+    first file part is the statement, other parts are returned as form
+    fields) or the raw file. Neither the upload nor the parsed rows are
+    ever held whole, so memory stays flat however large the statement is.
+    """
+
+    totals = LedgerTotals()
+    media_type, options = parse_options_header(content_type)
+    if media_type == b"multipart/form-data":
+        if b"boundary" not in options:
+            raise StatementError("The multipart upload has no boundary")
+        upload = _MultipartStatement(options[b"boundary"],
+                                     lambda filename, part_type: _StatementSink(totals, day_first, statement_format,
+                                                                                filename, part_type))
+        async for chunk in chunks:
+            upload.parser.write(chunk)
+            if upload.sink is not None:
+                await upload.sink.flush()
+        upload.parser.finalize()
+        if upload.sink is None:
+            raise StatementError("The upload has no statement file")
+        await upload.sink.close()
+        return totals, upload.fields
+
+    sink = _StatementSink(totals, day_first, statement_format, content_type=content_type)
+    async for chunk in chunks:
+        sink.write(chunk)
+        await sink.flush()
+    await sink.close()
+    return totals, {}
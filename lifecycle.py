@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, Tuple
+
+from app.categories import get_category_classifier
+from app.conversations import get_conversation_store
+from app.engine import get_engine, get_httpx
+from app.ibm_api import (
+    get_generation_batcher, get_generation_cache, get_nlu_cache, get_nlu_routing, get_watsonx_model
+)
+from app.nlu_engine import get_nlu_engine
+from app.sessions import get_session_store
+from app.templates import get_template_registry
+from app.utils import (
+    build_conversation_prompt, build_persona_prompt, build_prompt_with_nlu, build_spending_insight_prompt
+)
+
+WARMUP_TEXT = "I want to save $500 a month for an emergency fund while paying off my student loan by next year"
+WARMUP_EXPENSES = {"rent": 1200.0, "food": 400.0, "transportation": 300.0}
+
+class Readiness:
+    """
+    Worker lifecycle state for the /ready endpoint: starting -> ready -> draining.
+
+    /health only says the process is up; /ready says it has finished warming
+    up and is not shutting down, i.e. it should be sent traffic.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "starting"
+        self.warmup_seconds = None
+        self.steps: Dict[str, float] = {}
+        self.error = None
+
+    def mark_ready(self, steps: Dict[str, float], seconds: float) -> None:
+        with self._lock:
+            self.steps = steps
+            self.warmup_seconds = seconds
+            if self.state == "starting":
+                self.state = "ready"
+
+    def mark_failed(self, error: str) -> None:
+        with self._lock:
+            self.error = error
+            if self.state == "starting":
+                self.state = "ready"
+
+    def mark_draining(self) -> None:
+        with self._lock:
+            self.state = "draining"
+
+    def is_ready(self) -> bool:
+        return self.state == "ready"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"status": self.state, "warmup_seconds": self.warmup_seconds,
+                    "warmup_steps": dict(self.steps), "warmup_error": self.error}
+
+@lru_cache(maxsize=1)
+def get_readiness() -> Readiness:
+    return Readiness()
+
+@lru_cache(maxsize=1)
+def warmup_enabled() -> bool:
+    """Whether workers warm up before reporting ready (WARMUP_ENABLED, on by default)."""
+    return os.getenv("WARMUP_ENABLED", "true").lower() not in ("0", "false", "no")
+
+def _warm_nlu() -> None:
+    get_nlu_routing()
+    get_nlu_cache()
+    # Runs every matcher and regex once, so their lazily built state exists too
+    get_nlu_engine().analyze_scored(WARMUP_TEXT)
+
+def _warm_prompts() -> None:
+    nlu = get_nlu_engine().analyze(WARMUP_TEXT)
+    build_prompt_with_nlu(WARMUP_TEXT, "student", nlu_analysis=nlu)
+    build_conversation_prompt(WARMUP_TEXT, WARMUP_TEXT, "student", nlu_analysis=nlu)
+    build_persona_prompt(4000.0, WARMUP_EXPENSES, 500.0, "$", "student")
+    build_persona_prompt(4000.0, WARMUP_EXPENSES, 500.0, "$", "professional")
+    build_spending_insight_prompt({"income": 4000.0, "expenses": WARMUP_EXPENSES, "user_type": "professional",
+                                   "goals": [{"name": "Emergency Fund", "amount": 10000, "months": 12}]})
+
+def _warm_http_client() -> None:
+    # Import httpx here, off the event loop, when some service is remote
+    if get_engine().remote:
+        get_httpx()
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], Any]]] = [
+    ("watsonx_model", get_watsonx_model),
+    ("templates", get_template_registry),
+    ("nlu", _warm_nlu),
+    ("categories", get_category_classifier),
+    ("prompts", _warm_prompts),
+    ("generation_cache", get_generation_cache),
+    ("generation_batcher", get_generation_batcher),
+    ("sessions", get_session_store),
+    ("conversations", get_conversation_store),
+    ("http_client", _warm_http_client),
+]
+
+def warm_up() -> Dict[str, float]:
+    """
+    Build every lazily initialized resource a request would otherwise pay for.
+
+    Nothing here reaches an upstream service or writes a cache entry, so
+    warm-up leaves the caches and upstream call counters untouched. Returns
+    seconds spent per step. The engine's per-loop client is warmed separately
+    by warm_up_worker, on the loop that will serve requests.
+    """
+
+    steps = {}
+    for name, step in WARMUP_STEPS:
+        start = time.perf_counter()
+        step()
+        steps[name] = round(time.perf_counter() - start, 6)
+    return steps
+
+async def warm_up_worker() -> None:
+    """Warm up off the event loop, then mark this worker ready; /health answers throughout."""
+
+    readiness = get_readiness()
+    if not warmup_enabled():
+        readiness.mark_ready({}, 0.0)
+        return
+    start = time.perf_counter()
+    try:
+        steps = await asyncio.to_thread(warm_up)
+        engine_start = time.perf_counter()
+        await get_engine().warm_up()
+        steps["engine"] = round(time.perf_counter() - engine_start, 6)
+    except Exception as e:
+        # A cold worker still serves correctly, so a failed warm-up must not keep it out of rotation
+        readiness.mark_failed(f"Warm-up failed: {str(e)}")
+        return
+    readiness.mark_ready(steps, round(time.perf_counter() - start, 6))
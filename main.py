@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+import asyncio
 import os
 
 # Load environment variables
@@ -8,6 +9,9 @@ load_dotenv()
 
 # Import routes
 from app.routes import router
+from app.engine import get_engine
+from app.lifecycle import get_readiness, warm_up_worker
+from app.responses import CompressionMiddleware, get_compression_config
 
 # Create FastAPI application
 app = FastAPI(
@@ -25,9 +29,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large, non-streamed responses (RESPONSE_COMPRESSION / RESPONSE_COMPRESSION_MIN_BYTES)
+compression = get_compression_config()
+if compression["mode"] != "off":
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=compression["minimum_size"],
+        allow_brotli=compression["mode"] == "auto"
+    )
+
 # Include routes
 app.include_router(router, prefix="/api/v1")
 
+# Strong reference to the warm-up task so it is not garbage collected mid-run
+_warmup_tasks = set()
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Warm up in the background; /api/v1/ready reports 503 until it finishes."""
+    task = asyncio.create_task(warm_up_worker())
+    _warmup_tasks.add(task)
+    task.add_done_callback(_warmup_tasks.discard)
+
+@app.on_event("shutdown")
+async def close_backend_clients():
+    """Release pooled upstream connections."""
+    get_readiness().mark_draining()
+    await get_engine().aclose()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -39,5 +68,5 @@ async def root():
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    from app.server import run
+    run()
\ No newline at end of file
@@ -0,0 +1,268 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache, wraps
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+
+from app.templates import PERSONA_CONTEXT
+
+# Latency buckets in seconds, from sub-millisecond prompt rendering up to slow generations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Route template of the request being handled, used to label stage timings
+_current_route: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_route", default="none")
+
+# Per-request scratch record shared between the route handler and the wrapped endpoint
+_current_request: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "metrics_request", default=None)
+
+@lru_cache(maxsize=1)
+def metrics_enabled() -> bool:
+    """Whether timings are recorded (METRICS_ENABLED, on by default)."""
+    return os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        """Current value per label set."""
+        with self._lock:
+            return dict(self._values)
+
+class Counter(_Metric):
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                                for labels, value in items]
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests currently in flight."""
+
+    kind = "gauge"
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram per label set.
+
+    Each observation is one bisect and a few increments under a lock, so it
+    is cheap enough to record on every request.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # per-bucket counts (last slot is +Inf), then sum
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = self.header()
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+REQUESTS = Counter("finance_api_requests_total", "Requests handled, by route, method, status and persona.",
+                   ("route", "method", "status", "persona"))
+REQUEST_SECONDS = Histogram("finance_api_request_seconds", "End-to-end handler latency by route.", ("route",))
+REQUESTS_IN_FLIGHT = Gauge("finance_api_requests_in_flight", "Requests currently being handled, by route.", ("route",))
+STAGE_SECONDS = Histogram("finance_api_stage_seconds", "Latency of each pipeline stage, by route.", ("stage", "route"))
+STAGES_IN_FLIGHT = Gauge("finance_api_stage_in_flight", "Pipeline stages currently running.", ("stage",))
+NLU_TIERS = Counter("finance_api_nlu_tier_total", "NLU analyses by the tier that served them and why.",
+                    ("tier", "reason"))
+
+UPSTREAM_OUTCOMES = Counter("finance_api_upstream_outcomes_total",
+                            "Upstream calls by backend and outcome (success, failure, rejected, deadline, "
+                            "hedged, hedge_won).", ("backend", "outcome"))
+DEGRADED_RESPONSES = Counter("finance_api_degraded_responses_total",
+                             "Template answers served because an upstream was unavailable, by kind and reason.",
+                             ("kind", "reason"))
+
+_METRICS = [REQUESTS, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, STAGE_SECONDS, STAGES_IN_FLIGHT, NLU_TIERS,
+            UPSTREAM_OUTCOMES, DEGRADED_RESPONSES]
+
+class stage:
+    """
+    Time one pipeline stage: `with stage("nlu"): ...`.
+
+    Works around awaits too. The route label defaults to the request being
+    handled ("none" outside a request); pass `route` for work that outlives
+    the handler, such as a streamed response body.
+    """
+
+    __slots__ = ("name", "route", "_start")
+
+    def __init__(self, name: str, route: Optional[str] = None):
+        self.name = name
+        self.route = route
+
+    def __enter__(self) -> "stage":
+        self._start = None
+        if metrics_enabled():
+            STAGES_IN_FLIGHT.inc((self.name,))
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._start is not None:
+            STAGE_SECONDS.observe((self.name, self.route or _current_route.get()), time.perf_counter() - self._start)
+            STAGES_IN_FLIGHT.dec((self.name,))
+
+def current_route() -> str:
+    """Route template of the request being handled."""
+    return _current_route.get()
+
+def persona_label(persona: Optional[str]) -> str:
+    """Known personas as-is, anything else as "other", to keep label cardinality bounded."""
+    if persona is None:
+        return "none"
+    return persona if persona in PERSONA_CONTEXT else "other"
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that records request counts, latency, in-flight requests and the
+    parse / serialize stages around the endpoint.
+
+    Parse covers body reading and Pydantic validation (handler start to
+    endpoint start), serialize covers response encoding (endpoint end to
+    handler end). The persona label is taken from the request model's
+    `persona` or `user_type` field.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = self._timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(endpoint)
+        async def timed(*args: Any, **kwargs: Any) -> Any:
+            record = _current_request.get()
+            if record is not None:
+                record["endpoint_start"] = time.perf_counter()
+                for value in kwargs.values():
+                    persona = getattr(value, "persona", None) or getattr(value, "user_type", None)
+                    if persona is not None:
+                        record["persona"] = persona_label(persona)
+                        break
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if record is not None:
+                    record["endpoint_end"] = time.perf_counter()
+        return timed
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_handler(request):
+            if not metrics_enabled():
+                return await handler(request)
+            record = {"persona": "none"}
+            route_token = _current_route.set(route)
+            request_token = _current_request.set(record)
+            REQUESTS_IN_FLIGHT.inc((route,))
+            status = "500"
+            start = time.perf_counter()
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+                return response
+            except HTTPException as e:
+                status = str(e.status_code)
+                raise
+            except RequestValidationError:
+                # Answered with 422 by the app's validation handler: a client error, not a failure
+                status = "422"
+                raise
+            finally:
+                end = time.perf_counter()
+                REQUESTS_IN_FLIGHT.dec((route,))
+                REQUEST_SECONDS.observe((route,), end - start)
+                REQUESTS.inc((route, request.method, status, record["persona"]))
+                if "endpoint_start" in record:
+                    STAGE_SECONDS.observe(("parse", route), record["endpoint_start"] - start)
+                if "endpoint_end" in record and status != "500":
+                    STAGE_SECONDS.observe(("serialize", route), end - record["endpoint_end"])
+                _current_request.reset(request_token)
+                _current_route.reset(route_token)
+
+        return timed_handler
+
+def render_metrics(extra: Optional[Dict[str, Tuple[str, Dict[Tuple[Tuple[str, str], ...], float]]]] = None) -> str:
+    """
+    All metrics in Prometheus text exposition format.
+
+    `extra` adds series computed at scrape time: {name: (type, {((label, value), ...): value})}.
+    """
+
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for name, (kind, samples) in (extra or {}).items():
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples.items():
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+            lines.append(f"{name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,327 @@
+import math
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+# Financial topics: canonical keyword -> surface forms. Multi-word forms are
+# matched as phrases, so "student loans" yields "student loan", not "loan".
+FINANCIAL_LEXICON = {
+    "money": ["money", "cash"],
+    "savings": ["save", "saves", "saving", "savings", "saved"],
+    "budget": ["budget", "budgets", "budgeting"],
+    "expenses": ["expense", "expenses", "costs", "bills", "bill"],
+    "spending": ["spend", "spends", "spending", "spent"],
+    "income": ["income", "salary", "paycheck", "paychecks", "wages", "earnings"],
+    "investment": ["invest", "investing", "investment", "investments"],
+    "debt": ["debt", "debts"],
+    "loan": ["loan", "loans"],
+    "student loan": ["student loan", "student loans"],
+    "mortgage": ["mortgage", "mortgages"],
+    "rent": ["rent", "renting"],
+    "credit card": ["credit card", "credit cards"],
+    "credit score": ["credit score", "credit scores"],
+    "interest rate": ["interest rate", "interest rates", "apr"],
+    "emergency fund": ["emergency fund", "emergency funds", "rainy day fund"],
+    "retirement": ["retirement", "retire", "retiring", "pension"],
+    "401k": ["401k", "401 k"],
+    "ira": ["ira", "iras", "roth ira", "roth"],
+    "stocks": ["stock", "stocks", "equities"],
+    "bonds": ["bond", "bonds"],
+    "index fund": ["index fund", "index funds", "etf", "etfs"],
+    "taxes": ["tax", "taxes", "irs"],
+    "insurance": ["insurance", "premium", "premiums"],
+    "groceries": ["grocery", "groceries", "food"],
+    "utilities": ["utilities", "utility"],
+    "subscriptions": ["subscription", "subscriptions"],
+    "car payment": ["car payment", "car payments", "car loan"],
+    "financial": ["financial", "finance", "finances"],
+    "net worth": ["net worth"],
+    "cash flow": ["cash flow"],
+    "down payment": ["down payment"],
+    "tuition": ["tuition"],
+    "side hustle": ["side hustle", "side income", "freelance", "freelancing"],
+}
+
+# Broad topics rank below specific ones when relevance ties
+GENERIC_KEYWORDS = {"money": 0.6, "financial": 0.6}
+
+# Sentiment weights on a -3..3 scale
+SENTIMENT_LEXICON = {
+    "good": 1.5, "great": 2.0, "excellent": 2.5, "happy": 2.0, "glad": 1.5, "love": 2.0,
+    "confident": 1.5, "comfortable": 1.2, "excited": 2.0, "optimistic": 2.0, "hopeful": 1.5,
+    "hope": 1.0, "secure": 1.2, "stable": 1.0, "improve": 1.0, "improving": 1.2, "progress": 1.2,
+    "growing": 1.0, "afford": 0.8, "thrilled": 2.5, "proud": 2.0, "relieved": 1.5, "bonus": 1.2,
+    "paid off": 1.5, "debt free": 2.0, "on track": 1.5, "raise": 0.8,
+    "worried": -2.0, "worry": -2.0, "worrying": -2.0, "stressed": -2.0, "stress": -1.8,
+    "stressful": -2.0, "anxious": -2.0, "afraid": -2.0, "scared": -2.0, "struggling": -2.0,
+    "struggle": -1.8, "overwhelmed": -2.2, "broke": -2.0, "drowning": -2.5, "behind": -1.0,
+    "overdue": -1.5, "late": -1.0, "bad": -1.5, "terrible": -2.5, "awful": -2.5, "lost": -1.5,
+    "lose": -1.3, "losing": -1.5, "fired": -2.0, "laid off": -2.0, "unemployed": -2.0,
+    "bankrupt": -3.0, "bankruptcy": -2.5, "tight": -1.0, "expensive": -1.0, "sad": -2.0,
+    "frustrated": -2.0, "upset": -2.0, "panic": -2.5, "collections": -1.5, "default": -1.5,
+}
+
+NEGATORS = ["not", "no", "never", "don't", "dont", "can't", "cant", "cannot", "won't", "wont",
+            "isn't", "aren't", "wasn't", "doesn't", "didn't", "hardly", "without"]
+
+INTENSIFIERS = {"very": 1.3, "really": 1.3, "extremely": 1.6, "so": 1.2, "super": 1.3, "totally": 1.3,
+                "incredibly": 1.5, "quite": 1.1, "somewhat": 0.8, "slightly": 0.7}
+
+# Frequency words reported as TIME entities, as the Watson mock always did
+TIME_WORDS = {"month": "month", "months": "month", "monthly": "month", "year": "year", "years": "year",
+              "yearly": "year", "annual": "year", "annually": "year", "week": "week", "weekly": "week"}
+
+# Spelled-out durations and dates, matched as phrases alongside the lexicons
+_COUNT_WORDS = ["a", "an", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+                "eleven", "twelve", "eighteen", "twenty", "thirty"]
+_UNITS = ["day", "days", "week", "weeks", "month", "months", "year", "years"]
+DATE_PHRASES = ([f"{when} {unit}" for when in ("next", "last", "this") for unit in ("week", "month", "year", "quarter")]
+                + ["today", "tomorrow", "yesterday", "january", "february", "march", "april", "june", "july",
+                   "august", "september", "october", "november", "december"])
+DURATION_PHRASES = [f"{count} {unit}" for count in _COUNT_WORDS for unit in _UNITS]
+
+NEGATION_WINDOW = 3
+NEGATION_SCALAR = -0.74
+MAX_KEYWORDS = 5
+MAX_ENTITIES = 5
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+_MONTH = (r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)")
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+
+# Entities that contain a digit or "$", in one pass; the group name is the entity type.
+# The leading lookaround rejects most positions on their first character, and the
+# pattern only runs when the text has a digit or "$" at all.
+_NUMERIC_ENTITY = re.compile(
+    rf"(?=[$\du])(?<![\w.,$])(?:"
+    rf"(?P<MONEY>(?:\$|usd\s?)\s?(?:{_NUMBER})(?:\s?(?:k|m|bn|thousand|million|billion)\b)?"
+    rf"|(?:{_NUMBER})\s?(?:k\s)?(?:dollars?|bucks|usd)\b)"
+    rf"|(?P<DURATION>(?:{_NUMBER})[\s-]?(?:days?|weeks?|months?|years?|yrs?)\b)"
+    rf"|(?P<DATE>\d{{4}}-\d{{2}}-\d{{2}}\b|\d{{1,2}}/\d{{1,2}}(?:/\d{{2,4}})?\b))",
+    re.IGNORECASE
+)
+# "May 5, 2025", "Sept 2026": only tried when a month token is present
+_MONTH_DATE = re.compile(rf"\b{_MONTH}\.?(?:\s\d{{1,2}}(?:st|nd|rd|th)?(?:,?\s\d{{4}})?|,?\s\d{{4}})\b", re.IGNORECASE)
+_MONTH_TOKENS = frozenset(["jan", "january", "feb", "february", "mar", "march", "apr", "april", "may", "jun", "june",
+                           "jul", "july", "aug", "august", "sep", "sept", "september", "oct", "october",
+                           "nov", "november", "dec", "december"])
+_HAS_NUMERIC = re.compile(r"[\d$]")
+
+class PhraseMatcher:
+    """
+    Word-level Aho–Corasick automaton.
+
+    Phrases are token sequences; `find` reports every occurrence of every
+    phrase in one left-to-right pass over the tokens, however many phrases
+    there are.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[Sequence[str], Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        for tokens, value in phrases:
+            state = 0
+            for token in tokens:
+                nxt = self._goto[state].get(token)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][token] = nxt
+                    self._goto.append({})
+                    self._output.append([])
+                state = nxt
+            self._output[state].append((len(tokens), value))
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(token, 0)
+                # Inherit matches that end here via the failure link (shorter suffix phrases)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def find(self, tokens: Sequence[str]) -> List[Tuple[int, int, Any]]:
+        """Return (start, end, value) for every phrase occurrence, ordered by end position."""
+
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        state = 0
+        for end, token in enumerate(tokens, 1):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length, value in output[state]:
+                matches.append((end - length, end, value))
+        return matches
+
+class LocalNLUEngine:
+    """
+    Deterministic offline replacement for Watson NLU.
+
+    Keywords, sentiment terms and spelled-out dates/durations come from one
+    precompiled phrase matcher over the lexicons; money amounts and numeric
+    dates and durations from a single combined regex. Output uses the Watson NLU
+    schema: `sentiment.document.{score,label}` (score in 0..1, 0.5 neutral),
+    `keywords[{text,relevance}]` and `entities[{text,type}]`.
+    """
+
+    def __init__(self, keywords: Dict[str, Sequence[str]] = FINANCIAL_LEXICON,
+                 sentiment: Dict[str, float] = SENTIMENT_LEXICON):
+        phrases = []
+        for canonical, forms in keywords.items():
+            weight = GENERIC_KEYWORDS.get(canonical, 1.0)
+            for form in forms:
+                tokens = tuple(_TOKEN.findall(form))
+                phrases.append((tokens, ("keyword", canonical, weight * (1 + 0.5 * (len(tokens) - 1)))))
+        for term, weight in sentiment.items():
+            phrases.append((tuple(_TOKEN.findall(term)), ("sentiment", weight)))
+        for word in NEGATORS:
+            phrases.append(((word,), ("negator",)))
+        for word, factor in INTENSIFIERS.items():
+            phrases.append(((word,), ("intensifier", factor)))
+        for word, canonical in TIME_WORDS.items():
+            phrases.append(((word,), ("entity", "TIME", canonical)))
+        for phrase in DATE_PHRASES:
+            phrases.append((tuple(phrase.split()), ("entity", "DATE", phrase)))
+        for phrase in DURATION_PHRASES:
+            phrases.append((tuple(phrase.split()), ("entity", "DURATION", phrase)))
+        self.matcher = PhraseMatcher(phrases)
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        return self.analyze_scored(text)[0]
+
+    def analyze_scored(self, text: str) -> Tuple[Dict[str, Any], float]:
+        """
+        Analyze text and rate how far the result can be trusted, from 0 to 1.
+
+        Confidence averages topic evidence (lexicon keywords found, saturating
+        at two) and sentiment certainty: 1 when all sentiment terms agree,
+        0.5 when they cancel out, 0.7 for plain neutral text. Negation makes
+        both sentiment cases less certain.
+        """
+
+        lowered = text.lower().replace("’", "'")
+        tokens = _TOKEN.findall(lowered)
+        matches = self.matcher.find(tokens)
+        # Leftmost-longest first, so overlapping shorter phrases can be skipped
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+
+        keyword_scores: Dict[str, float] = {}
+        keyword_order: Dict[str, int] = {}
+        phrase_entities: List[Tuple[int, int, str, str]] = []
+        keyword_end = sentiment_end = entity_end = 0
+        last_negator = last_intensifier = -NEGATION_WINDOW - 1
+        intensity = 1.0
+        raw_sentiment = 0.0
+        sentiment_mass = 0.0
+        keyword_hits = 0
+        negated = False
+
+        for start, end, value in matches:
+            kind = value[0]
+            if kind == "keyword":
+                if start < keyword_end:
+                    continue
+                keyword_end = end
+                keyword_hits += 1
+                canonical = value[1]
+                keyword_scores[canonical] = keyword_scores.get(canonical, 0.0) + value[2]
+                keyword_order.setdefault(canonical, start)
+            elif kind == "sentiment":
+                if start < sentiment_end:
+                    continue
+                sentiment_end = end
+                weight = value[1]
+                if start - last_intensifier == 1:
+                    weight *= intensity
+                if 0 < start - last_negator <= NEGATION_WINDOW:
+                    weight *= NEGATION_SCALAR
+                raw_sentiment += weight
+                sentiment_mass += abs(weight)
+            elif kind == "negator":
+                last_negator = start
+                negated = True
+            elif kind == "intensifier":
+                last_intensifier, intensity = start, value[1]
+            else:
+                if start < entity_end:
+                    continue
+                entity_end = end
+                phrase_entities.append((start, end, value[2], value[1]))
+
+        normalized = raw_sentiment / math.sqrt(raw_sentiment * raw_sentiment + 4)
+        if normalized >= 0.05:
+            label = "positive"
+        elif normalized <= -0.05:
+            label = "negative"
+        else:
+            label = "neutral"
+
+        top = max(keyword_scores.values(), default=0.0)
+        ranked = sorted(keyword_scores, key=lambda k: (-keyword_scores[k], keyword_order[k]))[:MAX_KEYWORDS]
+
+        # Phrase entities come leftmost-longest, with those inside a longer one ("month" in "next month")
+        # already dropped; numeric entities are merged in by character offset the same way
+        found = [entity[2:] for entity in phrase_entities]
+        if _HAS_NUMERIC.search(text):
+            spanned = []
+            for m in _NUMERIC_ENTITY.finditer(text):
+                entity_text = m.group().strip()
+                start = m.start() + m.group().index(entity_text)
+                spanned.append((start, start + len(entity_text), entity_text, m.lastgroup))
+            if not _MONTH_TOKENS.isdisjoint(tokens):
+                spanned += [(m.start(), m.end(), m.group(), "DATE") for m in _MONTH_DATE.finditer(text)]
+            if spanned:
+                if phrase_entities:
+                    spans = [m.span() for m in _TOKEN.finditer(lowered)]
+                    spanned += [(spans[start][0], spans[end - 1][1], entity_text, entity_type)
+                                for start, end, entity_text, entity_type in phrase_entities]
+                spanned.sort(key=lambda entity: (entity[0], entity[0] - entity[1]))
+                found = []
+                entity_end = 0
+                for start, end, entity_text, entity_type in spanned:
+                    if start >= entity_end:
+                        entity_end = end
+                        found.append((entity_text, entity_type))
+        entities = []
+        seen = set()
+        for entity_text, entity_type in found:
+            if entity_text.lower() not in seen:
+                seen.add(entity_text.lower())
+                entities.append({"text": entity_text, "type": entity_type})
+
+        topic_evidence = min(1.0, keyword_hits / 2)
+        if sentiment_mass:
+            sentiment_certainty = 0.5 + 0.5 * abs(raw_sentiment) / sentiment_mass
+        else:
+            sentiment_certainty = 0.7
+        if negated:
+            sentiment_certainty *= 0.8
+        confidence = round((topic_evidence + sentiment_certainty) / 2, 3) if tokens else 1.0
+
+        return {
+            "sentiment": {
+                "document": {
+                    "score": round((normalized + 1) / 2, 2),
+                    "label": label
+                }
+            },
+            "keywords": [{"text": k, "relevance": round(0.5 + 0.5 * keyword_scores[k] / top, 2)} for k in ranked],
+            "entities": entities[:MAX_ENTITIES]
+        }, confidence
+
+@lru_cache(maxsize=1)
+def get_nlu_engine() -> LocalNLUEngine:
+    """Compile the lexicons once per process."""
+    return LocalNLUEngine()
+
+def analyze_local(text: str, engine: Optional[LocalNLUEngine] = None) -> Dict[str, Any]:
+    """Analyze text with the offline engine."""
+    return (engine or get_nlu_engine()).analyze(text)
@@ -0,0 +1,283 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, Awaitable, Callable, Optional, TypeVar
+
+from app.metrics import UPSTREAM_OUTCOMES
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() by which the current request must be answered, if the client set one
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+class UpstreamUnavailable(Exception):
+    """
+    An upstream call was not made or did not succeed: its breaker is open,
+    the request deadline ran out, or every attempt failed. Callers with a
+    degraded answer catch this and serve it instead.
+    """
+
+    def __init__(self, backend: str, reason: str, cause: Optional[BaseException] = None):
+        self.backend = backend
+        self.reason = reason
+        self.cause = cause
+        detail = f": {cause}" if cause is not None else ""
+        super().__init__(f"{backend} unavailable ({reason}){detail}")
+
+@lru_cache(maxsize=1)
+def get_resilience_config() -> Dict[str, Any]:
+    """
+    Breaker, hedging and deadline settings.
+    A breaker opens after BREAKER_FAILURE_THRESHOLD consecutive failures and
+    lets one probe through after BREAKER_RESET_SECONDS. A hedge is sent when
+    an attempt is slower than the HEDGE_QUANTILE of recent latencies (at least
+    HEDGE_MIN_DELAY_MS), for at most HEDGE_BUDGET of calls.
+    """
+    return {
+        "failure_threshold": int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+        "reset_seconds": float(os.getenv("BREAKER_RESET_SECONDS", "15")),
+        "hedge_enabled": os.getenv("HEDGE_ENABLED", "true").lower() not in ("0", "false", "no"),
+        "hedge_quantile": float(os.getenv("HEDGE_QUANTILE", "0.95")),
+        "hedge_min_delay": float(os.getenv("HEDGE_MIN_DELAY_MS", "20")) / 1000,
+        "hedge_budget": float(os.getenv("HEDGE_BUDGET", "0.1")),
+        "default_deadline": float(os.getenv("REQUEST_DEADLINE_MS") or 0) / 1000 or None,
+        "deadline_reserve": float(os.getenv("DEADLINE_RESERVE_MS", "20")) / 1000,
+    }
+
+def set_request_deadline(seconds: Optional[float]) -> None:
+    """Give the current request `seconds` to complete (None: no deadline)."""
+    _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker: closed -> open -> half_open -> closed.
+
+    While open, calls are rejected at once instead of queueing behind a slow
+    or failing upstream. After `reset_seconds` a single probe call is let
+    through; its success closes the breaker, its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in half-open state only one probe at a time."""
+
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = "half_open"
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """End a call without a verdict (e.g. the caller was cancelled), freeing the half-open probe slot."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self.opened += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+class LatencyTracker:
+    """Recent successful call latencies, for picking the hedging delay."""
+
+    def __init__(self, window: int = 256):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The q-quantile of the window, or None until there are enough samples to estimate it."""
+
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 20:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+class ResilientBackend:
+    """
+    One upstream service behind a circuit breaker, with hedged requests and
+    the request deadline applied to every call.
+
+    A call that has not answered within the recent p95 latency gets one
+    duplicate; whichever answers first wins and the other is cancelled.
+    Hedges are capped at `hedge_budget` of calls so a slow upstream is not
+    hit with double the load.
+    """
+
+    def __init__(self, name: str, config: Optional[Dict[str, Any]] = None):
+        config = config or get_resilience_config()
+        self.name = name
+        self.config = config
+        self.breaker = CircuitBreaker(config["failure_threshold"], config["reset_seconds"])
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+
+    def _attempt_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """The caller's timeout, cut down to the request deadline minus a reserve for the fallback."""
+
+        remaining = remaining_time()
+        if remaining is None:
+            return timeout
+        remaining -= self.config["deadline_reserve"]
+        if remaining <= 0:
+            UPSTREAM_OUTCOMES.inc((self.name, "deadline"))
+            raise UpstreamUnavailable(self.name, "deadline exceeded")
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def check(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Admit one call: raise UpstreamUnavailable if the breaker is open or the
+        deadline has passed, otherwise return the timeout the call should use.
+        Pair with record_success / record_failure.
+        """
+
+        timeout = self._attempt_timeout(timeout)
+        if not self.breaker.allow():
+            UPSTREAM_OUTCOMES.inc((self.name, "rejected"))
+            raise UpstreamUnavailable(self.name, "circuit open")
+        with self._lock:
+            self.calls += 1
+        return timeout
+
+    def record_success(self, seconds: Optional[float] = None) -> None:
+        self.breaker.record_success()
+        if seconds is not None:
+            self.latency.observe(seconds)
+        UPSTREAM_OUTCOMES.inc((self.name, "success"))
+
+    def record_failure(self) -> None:
+        self.breaker.record_failure()
+        UPSTREAM_OUTCOMES.inc((self.name, "failure"))
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.config["hedge_enabled"]:
+            return None
+        p = self.latency.quantile(self.config["hedge_quantile"])
+        if p is None:
+            return None
+        with self._lock:
+            if self.hedges >= self.config["hedge_budget"] * self.calls:
+                return None
+        return max(p, self.config["hedge_min_delay"])
+
+    async def call(self, func: Callable[[Optional[float]], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """Run `func(timeout)` with breaker, deadline and hedging; failures surface as UpstreamUnavailable."""
+
+        timeout = self.check(timeout)
+        start = time.perf_counter()
+        try:
+            result = await self._hedged(func, timeout)
+        except asyncio.CancelledError:
+            # The caller went away; that says nothing about the upstream's health
+            self.breaker.release()
+            raise
+        except Exception as e:
+            remaining = remaining_time()
+            if remaining is not None and remaining <= self.config["deadline_reserve"]:
+                # Cut short by this request's own deadline, not necessarily an unhealthy upstream
+                self.breaker.release()
+                UPSTREAM_OUTCOMES.inc((self.name, "deadline"))
+                raise UpstreamUnavailable(self.name, "deadline exceeded", e) from e
+            self.record_failure()
+            raise UpstreamUnavailable(self.name, "upstream error", e) from e
+        self.record_success(time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, func: Callable[[Optional[float]], Awaitable[T]], timeout: Optional[float]) -> T:
+        primary = asyncio.ensure_future(func(timeout))
+        tasks = [primary]
+        try:
+            delay = self._hedge_delay()
+            if delay is None or (timeout is not None and timeout <= delay):
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            remaining = remaining_time()
+            if remaining is not None and remaining - self.config["deadline_reserve"] <= 0:
+                # No time left for a second attempt; keep waiting on the first
+                return await primary
+            with self._lock:
+                self.hedges += 1
+            UPSTREAM_OUTCOMES.inc((self.name, "hedged"))
+            hedge = asyncio.ensure_future(func(None if timeout is None else timeout - delay))
+            tasks.append(hedge)
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            UPSTREAM_OUTCOMES.inc((self.name, "hedge_won"))
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.quantile(0.95)
+        return {"state": self.breaker.state, "opened": self.breaker.opened, "calls": self.calls,
+                "hedges": self.hedges, "p95_ms": round(p95 * 1000, 3) if p95 is not None else None}
+
+@lru_cache(maxsize=None)
+def get_backend(name: str) -> ResilientBackend:
+    """The process-wide breaker/hedging state for one upstream ("nlu" or "watsonx")."""
+    return ResilientBackend(name)
+
+def get_resilience_stats() -> Dict[str, Any]:
+    return {name: get_backend(name).stats() for name in ("nlu", "watsonx")}
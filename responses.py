@@ -0,0 +1,199 @@
+import gzip
+import importlib.util
+import json
+import math
+import os
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional
+
+from fastapi import Query
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Echoed inputs and intermediate results, left out of non-verbose responses
+DEBUG_FIELDS = ("prompt", "nlu_analysis")
+
+@lru_cache(maxsize=1)
+def _orjson():
+    """orjson if installed (`pip install orjson`), else None and the stdlib encoder is used."""
+    if importlib.util.find_spec("orjson") is None:
+        return None
+    import orjson
+    return orjson
+
+def _finite(value: Any) -> Any:
+    """`value` with NaN and infinite floats replaced by None, as orjson writes them."""
+
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+def dumps(content: Any) -> bytes:
+    """
+    Compact UTF-8 JSON, the same document Starlette's JSONResponse would produce.
+
+    Non-finite floats are written as null by either encoder.
+    """
+
+    orjson = _orjson()
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    try:
+        text = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    except ValueError:
+        # Only documents holding NaN or infinity pay for the rewrite
+        text = json.dumps(_finite(content), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    return text.encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded with orjson when available.
+
+    Endpoints that return this directly also skip FastAPI's jsonable_encoder
+    pass, which copies the whole payload before it is encoded; their content
+    must already be plain JSON types (numpy scalars and arrays are accepted).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class ResponseOptions(NamedTuple):
+    verbose: bool
+    fields: Optional[List[str]]
+
+@lru_cache(maxsize=1)
+def verbose_by_default() -> bool:
+    """Whether responses include prompts and NLU details unless ?verbose=false (RESPONSE_VERBOSE, on by default)."""
+    return os.getenv("RESPONSE_VERBOSE", "true").lower() not in ("0", "false", "no")
+
+def response_options(verbose: Optional[bool] = Query(None, description="Include prompts and NLU details"),
+                     fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return")
+                     ) -> ResponseOptions:
+    """Query parameters shaping a response body, shared by the JSON and batch routes."""
+    selected = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+    return ResponseOptions(verbose_by_default() if verbose is None else verbose, selected)
+
+def shape(payload: Dict[str, Any], options: ResponseOptions) -> Dict[str, Any]:
+    """
+    Apply `options` to a response body: without verbose, DEBUG_FIELDS are
+    dropped at the top level and from nested results (e.g. summary.prompt);
+    with fields, only those top-level keys (plus status) are kept.
+    """
+
+    if not options.verbose:
+        payload = {
+            key: ({k: v for k, v in value.items() if k not in DEBUG_FIELDS} if isinstance(value, dict) else value)
+            for key, value in payload.items() if key not in DEBUG_FIELDS
+        }
+    if options.fields is not None:
+        payload = {key: value for key, value in payload.items() if key == "status" or key in options.fields}
+    return payload
+
+def json_response(payload: Dict[str, Any], options: ResponseOptions) -> FastJSONResponse:
+    return FastJSONResponse(shape(payload, options))
+
+@lru_cache(maxsize=1)
+def _brotli():
+    """brotli if installed (`pip install brotli`), else None and only gzip is offered."""
+    if importlib.util.find_spec("brotli") is None:
+        return None
+    import brotli
+    return brotli
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip compression of complete response bodies of at least
+    `minimum_size` bytes, whichever the client accepts with the higher
+    q-value (brotli on ties).
+
+    Streamed responses (SSE, NDJSON) pass through untouched: compressing
+    them would hold tokens back in the compressor's buffer.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, allow_brotli: bool = True,
+                 gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.allow_brotli = allow_brotli
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _encoding(self, scope: Scope) -> Optional[str]:
+        """The accepted coding with the highest q-value (brotli on ties); q=0 refuses a coding."""
+
+        accepted: Dict[str, float] = {}
+        for part in Headers(scope=scope).get("accept-encoding", "").split(","):
+            coding, *params = (item.strip() for item in part.split(";"))
+            quality = 1.0
+            for param in params:
+                name, _, value = param.partition("=")
+                if name.strip().lower() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if coding:
+                accepted[coding.lower()] = quality
+
+        candidates = ["br", "gzip"] if self.allow_brotli and _brotli() is not None else ["gzip"]
+        # "*" covers the codings not listed by name
+        best, best_quality = None, 0.0
+        for coding in candidates:
+            quality = accepted.get(coding, accepted.get("*", 0.0))
+            if quality > best_quality:
+                best, best_quality = coding, quality
+        return best
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return _brotli().compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = self._encoding(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        started = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, started
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether the response is streamed
+                start = message
+                return
+            if started or message["type"] != "http.response.body":
+                await send(message)
+                return
+            started = True
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if not message.get("more_body", False) and len(body) >= self.minimum_size \
+                    and "content-encoding" not in headers:
+                body = self._compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+@lru_cache(maxsize=1)
+def get_compression_config() -> Dict[str, Any]:
+    """
+    Response compression settings: RESPONSE_COMPRESSION ("auto" = brotli or
+    gzip as accepted, "gzip", or "off") for bodies of RESPONSE_COMPRESSION_MIN_BYTES or more.
+    """
+    return {
+        "mode": os.getenv("RESPONSE_COMPRESSION", "auto").lower(),
+        "minimum_size": int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024")),
+    }
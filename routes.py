@@ -1,12 +1,36 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
 import json
 
-from app.ibm_api import analyze_nlu, generate_with_watsonx, generate_budget_summary, generate_spending_insights
+from app.ibm_api import (
+    analyze_nlu_async, generate_with_watsonx_cached_async, generate_with_watsonx_stream_async,
+    generate_budget_summary_async, generate_spending_insights_async, get_nlu_cache_stats,
+    get_generation_cache_stats, get_nlu_tier_stats, get_upstream_call_counts, fallback_advice
+)
 from app.utils import build_prompt_with_nlu, build_simple_prompt
+from app.batch import map_ordered, ndjson_lines
+from app.metrics import TimedRoute, current_route, render_metrics, stage
+from app.lifecycle import get_readiness
+from app.resilience import get_resilience_config, get_resilience_stats, set_request_deadline
+from app.ledger import LedgerTotals, read_statement
+from app.categories import MAX_GOAL_MONTHS, get_category_classifier
+from app.sessions import BudgetSession, get_session_store
+from app.conversations import Conversation, check_question, get_conversation_store
+from app.responses import FastJSONResponse, ResponseOptions, dumps, json_response, response_options, shape
 
-router = APIRouter()
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+async def apply_request_deadline(x_request_timeout_ms: Optional[float] = Header(None)):
+    """Give upstream calls the client's deadline (X-Request-Timeout-Ms, else REQUEST_DEADLINE_MS)."""
+    if x_request_timeout_ms is not None and x_request_timeout_ms > 0:
+        set_request_deadline(x_request_timeout_ms / 1000)
+    else:
+        set_request_deadline(get_resilience_config()["default_deadline"])
+
+router = APIRouter(route_class=TimedRoute, default_response_class=FastJSONResponse,
+                   dependencies=[Depends(apply_request_deadline)])
 
 # Request Models
 class NLURequest(BaseModel):
@@ -23,54 +47,135 @@ class BudgetSummaryRequest(BaseModel):
     currency: str = "$"
     user_type: str = "general"
 
+class SimulationOptions(BaseModel):
+    paths: Optional[int] = Field(None, ge=100, le=200000)
+    seed: Optional[int] = Field(None, ge=0)
+    income_volatility: Optional[float] = Field(None, ge=0, le=2)
+    expense_volatility: Optional[float] = Field(None, ge=0, le=2)
+    annual_rate: Optional[float] = Field(None, ge=-0.5, le=1)
+    current_savings: float = 0.0
+
+class Goal(BaseModel):
+    name: str
+    amount: float = Field(..., gt=0, allow_inf_nan=False)
+    months: int = Field(..., ge=1, le=MAX_GOAL_MONTHS)
+
+def goal_dicts(goals: Optional[List[Goal]]) -> Optional[List[Dict[str, Any]]]:
+    return None if goals is None else [goal.model_dump() for goal in goals]
+
 class SpendingInsightsRequest(BaseModel):
     income: float
     expenses: Dict[str, float]
-    goals: List[Dict[str, Any]]
+    goals: List[Goal]
     user_type: str = "general"
+    simulation: Optional[SimulationOptions] = None
+
+    def monthly_data(self) -> Dict[str, Any]:
+        return {
+            "income": self.income,
+            "expenses": self.expenses,
+            "goals": goal_dicts(self.goals),
+            "user_type": self.user_type,
+            "simulation": self.simulation.model_dump(exclude_none=True) if self.simulation else None
+        }
+
+class ConversationTurnRequest(BaseModel):
+    question: str
+    persona: Optional[str] = None
+
+class BudgetSessionEdit(BaseModel):
+    set: Dict[str, float] = {}
+    remove: List[str] = []
+    income: Optional[float] = None
+    goals: Optional[List[Goal]] = None
+    user_type: Optional[str] = None
 
 # Routes
 @router.post("/nlu")
-async def analyze_text(request: NLURequest):
+async def analyze_text(request: NLURequest, options: ResponseOptions = Depends(response_options)):
     """Analyze text using IBM Watson NLU (mock implementation)."""
     try:
-        result = analyze_nlu(request.text)
-        return {
+        result = await analyze_nlu_async(request.text)
+        return json_response({
             "status": "success",
             "analysis": result,
             "text": request.text
-        }
+        }, options)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"NLU analysis failed: {str(e)}")
 
 @router.post("/generate")
-async def generate_response(request: GenerateRequest):
+async def generate_response(request: GenerateRequest, options: ResponseOptions = Depends(response_options)):
     """Generate personalized financial advice using Watsonx (mock implementation)."""
     try:
-        # Get NLU analysis
-        nlu_result = analyze_nlu(request.question)
+        # Get NLU analysis once; the same result feeds the prompt and the response
+        nlu_result = await analyze_nlu_async(request.question)
         
         # Build enriched prompt
-        enriched_prompt = build_prompt_with_nlu(request.question, request.persona)
+        with stage("prompt"):
+            enriched_prompt = build_prompt_with_nlu(request.question, request.persona, nlu_analysis=nlu_result)
         
         # Generate response
-        response_text = generate_with_watsonx(enriched_prompt)
+        response_text, cache_status = await generate_with_watsonx_cached_async(
+            enriched_prompt, fallback=lambda: fallback_advice(nlu_result)
+        )
         
-        return {
+        return json_response({
             "status": "success",
             "response": response_text,
+            "cache_status": cache_status,
             "persona": request.persona,
             "nlu_analysis": nlu_result,
             "prompt": enriched_prompt
-        }
+        }, options)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Response generation failed: {str(e)}")
 
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {dumps(data).decode()}\n\n"
+
+@router.post("/generate/stream")
+async def generate_response_stream(request: GenerateRequest,
+                                   options: ResponseOptions = Depends(response_options)):
+    """Stream personalized financial advice token by token as Server-Sent Events.
+    
+    Emits an `nlu` event with the analysis, one unnamed event per token
+    (`{"token": ...}`), then `done` - or `error` if generation fails midway.
+    """
+    try:
+        nlu_result = await analyze_nlu_async(request.question)
+        with stage("prompt"):
+            enriched_prompt = build_prompt_with_nlu(request.question, request.persona, nlu_analysis=nlu_result)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Response generation failed: {str(e)}")
+    
+    # The body is streamed after this handler returns, so bind the route label now
+    route = current_route()
+    
+    async def events():
+        yield _sse_event(shape({"persona": request.persona, "nlu_analysis": nlu_result}, options), event="nlu")
+        try:
+            with stage("generate", route=route):
+                async for token in generate_with_watsonx_stream_async(
+                    enriched_prompt, fallback=lambda: fallback_advice(nlu_result)
+                ):
+                    yield _sse_event({"token": token})
+        except Exception as e:
+            yield _sse_event({"detail": f"Response generation failed: {str(e)}"}, event="error")
+            return
+        yield _sse_event({"status": "success"}, event="done")
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.post("/budget-summary")
-async def create_budget_summary(request: BudgetSummaryRequest):
+async def create_budget_summary(request: BudgetSummaryRequest,
+                                options: ResponseOptions = Depends(response_options)):
     """Generate comprehensive budget summary."""
     try:
-        result = generate_budget_summary(
+        result = await generate_budget_summary_async(
             income=request.income,
             expenses=request.expenses,
             savings_goal=request.savings_goal,
@@ -78,35 +183,330 @@ async def create_budget_summary(request: BudgetSummaryRequest):
             user_type=request.user_type
         )
         
-        return {
+        return json_response({
             "status": "success",
             "summary": result,
             "user_type": request.user_type
-        }
+        }, options)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Budget summary generation failed: {str(e)}")
 
 @router.post("/spending-insights")
-async def analyze_spending(request: SpendingInsightsRequest):
+async def analyze_spending(request: SpendingInsightsRequest,
+                           options: ResponseOptions = Depends(response_options)):
     """Generate detailed spending insights and recommendations."""
     try:
-        monthly_data = {
-            "income": request.income,
-            "expenses": request.expenses,
-            "goals": request.goals,
+        result = await generate_spending_insights_async(request.monthly_data())
+        
+        return json_response({
+            "status": "success",
+            "insights": result,
             "user_type": request.user_type
-        }
+        }, options)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Spending analysis failed: {str(e)}")
+
+# Budget sessions: the budget is stored server-side and edited with deltas such as
+# {"set": {"food": 450}}; only what an edit changed is recomputed, and the model only
+# answers again when the prompt it would see has changed
+def _session_or_404(session_id: str) -> BudgetSession:
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Budget session not found or expired")
+    return session
+
+async def _session_insights(session_id: str, session: BudgetSession, changed: List[str],
+                            options: ResponseOptions) -> FastJSONResponse:
+    try:
+        result = await session.insights()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Spending analysis failed: {str(e)}")
+    finally:
+        # Edits are kept even when the model call fails
+        if session.unsaved:
+            get_session_store().save(session_id, session)
+    return json_response({
+        "status": "success",
+        "session_id": session_id,
+        "revision": session.revision,
+        "changed": changed,
+        "insights": result,
+        "user_type": session.user_type
+    }, options)
+
+@router.post("/sessions")
+async def create_budget_session(request: SpendingInsightsRequest,
+                                options: ResponseOptions = Depends(response_options)):
+    """Store a budget server-side and return its spending insights along with the session id."""
+    try:
+        session = BudgetSession(request.income, request.expenses, goal_dicts(request.goals), request.user_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid budget: {str(e)}")
+    return await _session_insights(get_session_store().new_id(), session,
+                                   ["income", "expenses", "goals", "user_type"], options)
+
+@router.patch("/sessions/{session_id}")
+async def edit_budget_session(session_id: str, edit: BudgetSessionEdit,
+                              options: ResponseOptions = Depends(response_options)):
+    """Apply an edit to a stored budget and return the updated spending insights."""
+    session = _session_or_404(session_id)
+    try:
+        changed = session.apply(set_expenses=edit.set, remove=edit.remove, income=edit.income,
+                                goals=goal_dicts(edit.goals), user_type=edit.user_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid edit: {str(e)}")
+    return await _session_insights(session_id, session, changed, options)
+
+@router.get("/sessions/{session_id}")
+async def get_budget_session(session_id: str):
+    """A stored budget and its current figures, without calling the model."""
+    session = _session_or_404(session_id)
+    return {
+        "status": "success",
+        "session_id": session_id,
+        "revision": session.revision,
+        "income": session.income,
+        "expenses": session.expenses,
+        "goals": session.goals,
+        "user_type": session.user_type,
+        "analysis": session.analysis()
+    }
+
+@router.delete("/sessions/{session_id}")
+async def delete_budget_session(session_id: str):
+    """Forget a stored budget."""
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="Budget session not found or expired")
+    return {"status": "success", "session_id": session_id}
+
+# Conversations: follow-up questions are answered with the earlier turns in context; every
+# turn is logged, and the prompt carries a summary of older turns plus the latest ones within
+# a fixed token budget, however long the conversation runs
+def _conversation_or_404(conversation_id: str) -> Conversation:
+    conversation = get_conversation_store().get(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found or expired")
+    return conversation
+
+async def _conversation_turn(conversation_id: str, conversation: Conversation, question: str,
+                             options: ResponseOptions) -> FastJSONResponse:
+    try:
+        question = check_question(question)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid question: {str(e)}")
+    try:
+        turn, result = await conversation.ask(question)
+        get_conversation_store().record(conversation_id, conversation, turn)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Response generation failed: {str(e)}")
+    return json_response({
+        "status": "success",
+        "conversation_id": conversation_id,
+        "turn": turn["index"],
+        **result,
+        "context": conversation.context()
+    }, options)
+
+@router.post("/conversations")
+async def create_conversation(request: GenerateRequest, options: ResponseOptions = Depends(response_options)):
+    """Start a conversation with its first question; follow-ups go to /conversations/{conversation_id}."""
+    conversation = Conversation(request.persona or "general")
+    return await _conversation_turn(get_conversation_store().new_id(), conversation, request.question, options)
+
+@router.post("/conversations/{conversation_id}")
+async def continue_conversation(conversation_id: str, request: ConversationTurnRequest,
+                                options: ResponseOptions = Depends(response_options)):
+    """Answer a follow-up question with the conversation so far in context."""
+    conversation = _conversation_or_404(conversation_id)
+    if request.persona:
+        conversation.persona = request.persona
+    return await _conversation_turn(conversation_id, conversation, request.question, options)
+
+@router.get("/conversations/{conversation_id}")
+async def get_conversation(conversation_id: str, offset: int = Query(0, ge=0),
+                           limit: int = Query(50, ge=1, le=500)):
+    """A page of the conversation's turn log, oldest first, and the history its next prompt will carry."""
+    conversation = _conversation_or_404(conversation_id)
+    return {
+        "status": "success",
+        "conversation_id": conversation_id,
+        "persona": conversation.persona,
+        "turns": get_conversation_store().turns(conversation_id, offset, limit),
+        "history": conversation.history(),
+        "context": conversation.context()
+    }
+
+@router.delete("/conversations/{conversation_id}")
+async def delete_conversation(conversation_id: str):
+    """Forget a conversation and its turns."""
+    if not get_conversation_store().delete(conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found or expired")
+    return {"status": "success", "conversation_id": conversation_id}
+
+# Statement uploads: a CSV or OFX bank export, as multipart/form-data or the raw file body,
+# is streamed into per-category monthly totals that feed the budget engine
+async def _read_ledger(request: Request, statement_format: Optional[str], day_first: bool) -> LedgerTotals:
+    try:
+        with stage("ingest"):
+            totals, _ = await read_statement(request.stream(), request.headers.get("content-type", ""),
+                                             statement_format=statement_format, day_first=day_first)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not read statement: {str(e)}")
+    if not totals.transactions:
+        raise HTTPException(status_code=400, detail="Could not read statement: no transactions found")
+    return totals
+
+@router.post("/ledger/budget-summary")
+async def ledger_budget_summary(request: Request,
+                                savings_goal: float = Query(0.0),
+                                currency: str = Query("$"),
+                                user_type: str = Query("general"),
+                                income: Optional[float] = Query(None, description="Monthly income; default: mean monthly credits"),
+                                statement_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ofx)$"),
+                                day_first: bool = Query(False, description="Slash dates are D/M/Y rather than M/D/Y"),
+                                options: ResponseOptions = Depends(response_options)):
+    """Budget summary from an uploaded CSV/OFX statement, aggregated to mean monthly spend per category."""
+    totals = await _read_ledger(request, statement_format, day_first)
+    try:
+        result = await generate_budget_summary_async(
+            income=totals.average_income() if income is None else income,
+            expenses=totals.average_expenses(),
+            savings_goal=savings_goal,
+            currency=currency,
+            user_type=user_type
+        )
         
-        result = generate_spending_insights(monthly_data)
+        return json_response({
+            "status": "success",
+            "summary": result,
+            "ledger": totals.summary(),
+            "user_type": user_type
+        }, options)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Budget summary generation failed: {str(e)}")
+
+@router.post("/ledger/spending-insights")
+async def ledger_spending_insights(request: Request,
+                                   goals: str = Query("[]", description="JSON list of {name, amount, months}"),
+                                   user_type: str = Query("general"),
+                                   income: Optional[float] = Query(None, description="Monthly income; default: mean monthly credits"),
+                                   statement_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ofx)$"),
+                                   day_first: bool = Query(False, description="Slash dates are D/M/Y rather than M/D/Y"),
+                                   options: ResponseOptions = Depends(response_options)):
+    """Spending insights from an uploaded CSV/OFX statement, aggregated to mean monthly spend per category."""
+    try:
+        goal_list = goal_dicts(SpendingInsightsRequest.model_validate(
+            {"income": 0, "expenses": {}, "goals": json.loads(goals)}
+        ).goals)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid goals: {str(e)}")
+    totals = await _read_ledger(request, statement_format, day_first)
+    try:
+        result = await generate_spending_insights_async({
+            "income": totals.average_income() if income is None else income,
+            "expenses": totals.average_expenses(),
+            "goals": goal_list,
+            "user_type": user_type
+        })
         
-        return {
+        return json_response({
             "status": "success",
             "insights": result,
-            "user_type": request.user_type
-        }
+            "ledger": totals.summary(),
+            "user_type": user_type
+        }, options)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Spending analysis failed: {str(e)}")
 
+# Batch routes: each accepts a JSON array and streams one NDJSON record per item,
+# in input order: {"index": i, "status": "success", ...} or {"index": i, "status": "error", "detail": ...}
+async def _batch_nlu_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    request = NLURequest.model_validate(item)
+    return {"analysis": await analyze_nlu_async(request.text), "text": request.text}
+
+async def _batch_budget_summary_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    request = BudgetSummaryRequest.model_validate(item)
+    result = await generate_budget_summary_async(
+        income=request.income,
+        expenses=request.expenses,
+        savings_goal=request.savings_goal,
+        currency=request.currency,
+        user_type=request.user_type
+    )
+    return {"summary": result, "user_type": request.user_type}
+
+async def _batch_spending_insights_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    request = SpendingInsightsRequest.model_validate(item)
+    result = await generate_spending_insights_async(request.monthly_data())
+    return {"insights": result, "user_type": request.user_type}
+
+def _batch_response(worker, items: List[Any], concurrency: int, options: ResponseOptions) -> StreamingResponse:
+    async def shaped(item: Dict[str, Any]) -> Dict[str, Any]:
+        return shape(await worker(item), options)
+    
+    return StreamingResponse(ndjson_lines(map_ordered(shaped, items, concurrency)),
+                             media_type="application/x-ndjson")
+
+@router.post("/batch/nlu")
+async def batch_analyze_text(items: List[Any], concurrency: int = Query(16, ge=1, le=64),
+                             options: ResponseOptions = Depends(response_options)):
+    """Analyze many texts in one call; results stream back as NDJSON."""
+    return _batch_response(_batch_nlu_item, items, concurrency, options)
+
+@router.post("/batch/budget-summary")
+async def batch_budget_summary(items: List[Any], concurrency: int = Query(16, ge=1, le=64),
+                               options: ResponseOptions = Depends(response_options)):
+    """Generate many budget summaries in one call; results stream back as NDJSON."""
+    return _batch_response(_batch_budget_summary_item, items, concurrency, options)
+
+@router.post("/batch/spending-insights")
+async def batch_spending_insights(items: List[Any], concurrency: int = Query(16, ge=1, le=64),
+                                  options: ResponseOptions = Depends(response_options)):
+    """Generate many spending analyses in one call; results stream back as NDJSON."""
+    return _batch_response(_batch_spending_insights_item, items, concurrency, options)
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for the result caches, single-flight coalescing and upstream breaker state."""
+    return {
+        "status": "success",
+        "nlu": get_nlu_cache_stats(),
+        "generation": get_generation_cache_stats(),
+        "categories": get_category_classifier().stats(),
+        "sessions": get_session_store().stats(),
+        "conversations": get_conversation_store().stats(),
+        "upstreams": get_resilience_stats()
+    }
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request counts, per-stage latency histograms and in-flight gauges in Prometheus text format."""
+    upstream = get_upstream_call_counts()
+    upstreams = get_resilience_stats()
+    return PlainTextResponse(
+        render_metrics({
+            "finance_api_upstream_calls_total": ("counter", {
+                (("service", service),): count for service, count in upstream.items()
+            }),
+            "finance_api_nlu_tier_fraction": ("gauge", {
+                (("tier", tier),): fraction for tier, fraction in get_nlu_tier_stats()["fractions"].items()
+            }),
+            "finance_api_breaker_state": ("gauge", {
+                (("backend", name),): BREAKER_STATES[stats["state"]] for name, stats in upstreams.items()
+            })
+        }),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once this worker has warmed up, 503 while starting or draining."""
+    readiness = get_readiness()
+    return JSONResponse(
+        status_code=200 if readiness.is_ready() else 503,
+        content=readiness.snapshot()
+    )
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
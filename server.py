@@ -0,0 +1,72 @@
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+from typing import List, Optional
+
+import uvicorn
+from uvicorn.supervisors import ChangeReload, Multiprocess
+
+from app.lifecycle import get_readiness
+
+logger = logging.getLogger("uvicorn.error")
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that reports "draining" on /ready as soon as SIGTERM or
+    SIGINT arrives. uvicorn then stops accepting connections and lets
+    in-flight requests finish, up to the graceful shutdown timeout.
+    """
+
+    def handle_exit(self, sig, frame) -> None:
+        get_readiness().mark_draining()
+        super().handle_exit(sig, frame)
+
+def _fastest(preferred: str, module: str, fallback: str) -> str:
+    return preferred if importlib.util.find_spec(module) is not None else fallback
+
+def build_config(argv: Optional[List[str]] = None) -> uvicorn.Config:
+    """uvicorn settings from the command line, with HOST / PORT / WEB_CONCURRENCY / GRACEFUL_TIMEOUT defaults."""
+
+    parser = argparse.ArgumentParser(description="Run the Personal Finance Chatbot API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY") or 0) or os.cpu_count() or 1,
+                        help="worker processes (default: WEB_CONCURRENCY, else the CPU count)")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--reload", action="store_true", help="single auto-reloading process for development")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args(argv)
+
+    return uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=1 if args.reload else args.workers,
+        reload=args.reload,
+        # uvloop and httptools are optional (uvicorn[standard]); fall back to the pure-Python stack
+        loop=_fastest("uvloop", "uvloop", "asyncio"),
+        http=_fastest("httptools", "httptools", "h11"),
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+
+def run(argv: Optional[List[str]] = None) -> None:
+    """Serve `main:app` with N workers; the same steps as uvicorn.run, with DrainingServer."""
+
+    config = build_config(argv)
+    server = DrainingServer(config=config)
+    logger.info("Starting %d worker(s), loop=%s, http=%s", config.workers, config.loop, config.http)
+
+    if config.should_reload:
+        sock = config.bind_socket()
+        ChangeReload(config, target=server.run, sockets=[sock]).run()
+    elif config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+        if not server.started:
+            sys.exit(3)
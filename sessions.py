@@ -0,0 +1,327 @@
+import asyncio
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from app.cache import CacheBackend, SQLiteCacheBackend
+from app.categories import BENCHMARK_CATEGORIES, FIXED_EXPENSE_CATEGORIES, MAX_GOAL_MONTHS, canonical_category, goal_deadline
+from app.ibm_api import generate_with_watsonx_cached_async, goals_overview, spending_insights_fallback
+from app.metrics import stage
+from app.templates import render_prompt
+
+def _aggregate_keys(label: str) -> Tuple[str, ...]:
+    """The running sums an expense label counts toward: the total, plus fixed and its benchmark category if any."""
+
+    category = canonical_category(label)
+    keys = ("total",)
+    if category in FIXED_EXPENSE_CATEGORIES:
+        keys += ("fixed",)
+    if category in BENCHMARK_CATEGORIES.values():
+        keys += (category,)
+    return keys
+
+def _amount(value: Any, name: str) -> float:
+    amount = float(value)
+    if not math.isfinite(amount):
+        raise ValueError(f"{name} must be a finite number")
+    return amount
+
+def _goal(goal: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(goal, dict) or not {"name", "amount", "months"} <= goal.keys():
+        raise ValueError("each goal needs a name, amount and months")
+    if not 1 <= _amount(goal["months"], "goal months") <= MAX_GOAL_MONTHS:
+        raise ValueError(f"goal months must be between 1 and {MAX_GOAL_MONTHS}")
+    if _amount(goal["amount"], "goal amount") <= 0:
+        raise ValueError("goal amount must be positive")
+    return goal
+
+class BudgetSession:
+    """
+    One user's budget, kept server-side so clients can send edits instead of the whole budget.
+
+    Total, fixed and benchmark-category spend are exact running sums
+    (Fractions) adjusted by each edited expense, so an edit costs the same
+    however many expenses there are and the sums never drift from the
+    expenses they add up. The goal text, the prompt and the model's answer
+    are rebuilt only when an input they depend on has changed: an edit that
+    leaves income, total spend and goals as they were reuses the last answer.
+    """
+
+    def __init__(self, income: float, expenses: Dict[str, float], goals: List[Dict[str, Any]],
+                 user_type: str = "general"):
+        self.income = 0.0
+        self.user_type = user_type
+        self.expenses: Dict[str, float] = {}
+        self.goals: List[Dict[str, Any]] = []
+        self.revision = uuid.uuid4().hex
+        self._keys: Dict[str, Tuple[str, ...]] = {}
+        self._sums: Dict[str, Fraction] = {}
+        self._goal_monthly: List[float] = []
+        self._goals_text = ""
+        self._prompt_inputs: Optional[Tuple[float, float, str]] = None
+        self._prompt = ""
+        # (prompt, text) of the last answer generated for this session
+        self._answer: Optional[Tuple[str, str]] = None
+        self._simulation_inputs: Optional[Tuple[float, float, float, str]] = None
+        self._simulation_result: Optional[Dict[str, Any]] = None
+        # Whether inputs or the kept answer changed since the store last saved this session
+        self.unsaved = True
+        self.apply(income=income, set_expenses=expenses, goals=goals)
+
+    def apply(self, set_expenses: Optional[Dict[str, float]] = None, remove: Iterable[str] = (),
+              income: Optional[float] = None, goals: Optional[List[Dict[str, Any]]] = None,
+              user_type: Optional[str] = None) -> List[str]:
+        """
+        Apply one edit: set or add expenses, remove expenses, replace income,
+        goals or user type. The edit is validated as a whole before anything
+        changes. Returns the inputs it actually changed.
+        """
+
+        set_expenses = {label: _amount(amount, f"expense {label!r}") for label, amount in (set_expenses or {}).items()}
+        remove = [label for label in remove if label in self.expenses and label not in set_expenses]
+        income = None if income is None else _amount(income, "income")
+        goals = None if goals is None else [_goal(goal) for goal in goals]
+
+        changed = []
+        expense_changed = False
+        for label, amount in set_expenses.items():
+            expense_changed |= self._set_expense(label, amount)
+        for label in remove:
+            self._set_expense(label, None)
+            expense_changed = True
+        if expense_changed:
+            changed.append("expenses")
+        if income is not None and income != self.income:
+            self.income = income
+            changed.append("income")
+        if goals is not None and goals != self.goals:
+            self.goals = goals
+            self._goal_monthly = [float(goal["amount"]) / goal_deadline(goal["months"]) for goal in goals]
+            self._goals_text = goals_overview(goals)
+            changed.append("goals")
+        if user_type is not None and user_type != self.user_type:
+            self.user_type = user_type
+            changed.append("user_type")
+        if changed:
+            self.unsaved = True
+        return changed
+
+    def _set_expense(self, label: str, amount: Optional[float]) -> bool:
+        """Set (or with None, remove) one expense and adjust the sums it counts toward."""
+
+        old = self.expenses.get(label)
+        if old == amount:
+            return False
+        keys = self._keys.get(label)
+        if keys is None:
+            keys = self._keys[label] = _aggregate_keys(label)
+        delta = (Fraction(amount) if amount is not None else 0) - (Fraction(old) if old is not None else 0)
+        sums = self._sums
+        for key in keys:
+            sums[key] = sums.get(key, 0) + delta
+        if amount is None:
+            del self.expenses[label]
+            del self._keys[label]
+        else:
+            self.expenses[label] = amount
+        return True
+
+    def analysis(self) -> Dict[str, Any]:
+        """The /spending-insights analysis, plus the fixed/variable split and benchmark ratios, from the running sums."""
+
+        sums, income = self._sums, self.income
+        total = float(sums.get("total", 0))
+        surplus = income - total
+        ratio = lambda amount: amount / income * 100 if income > 0 else 0.0
+        analysis = {
+            "total_expenses": total,
+            "surplus": surplus,
+            "savings_rate": ratio(surplus),
+            "goals_achievable": all(surplus >= needed for needed in self._goal_monthly),
+            "fixed_total": float(sums.get("fixed", 0)),
+            "variable_total": float(sums.get("total", 0) - sums.get("fixed", 0)),
+        }
+        for name, category in BENCHMARK_CATEGORIES.items():
+            analysis[f"{name}_ratio"] = ratio(float(sums.get(category, 0)))
+        return analysis
+
+    def prompt(self) -> str:
+        """The spending overview prompt, re-rendered only when income, total spend or goals changed."""
+
+        total = float(self._sums.get("total", 0))
+        inputs = (self.income, total, self._goals_text)
+        if inputs != self._prompt_inputs:
+            self._prompt = render_prompt("spending_overview", income=self.income, total_expenses=total,
+                                         surplus=self.income - total, goals=self._goals_text)
+            self._prompt_inputs = inputs
+        return self._prompt
+
+    async def _answer_for(self, prompt: str, analysis: Dict[str, Any],
+                          timeout: Optional[float]) -> Tuple[str, str]:
+        if self._answer is not None and self._answer[0] == prompt:
+            return self._answer[1], "unchanged"
+        income = self.income
+        text, cache_status = await generate_with_watsonx_cached_async(
+            prompt, timeout=timeout, kind="spending_insights",
+            fallback=lambda: spending_insights_fallback(income, analysis)
+        )
+        # Another edit may have landed while the model was answering
+        if cache_status != "degraded" and self.prompt() == prompt:
+            self._answer = (prompt, text)
+            self.unsaved = True
+        return text, cache_status
+
+    async def _simulation(self) -> Optional[Dict[str, Any]]:
+        """Monte Carlo goal projection, rerun only when income, fixed or variable spend, or goals changed."""
+
+        # numpy is imported with app.simulation on first use, not at startup
+        from app.simulation import get_simulation_config, simulate_goals_async
+        if not get_simulation_config()["enabled"]:
+            return None
+        fixed, total = self._sums.get("fixed", 0), self._sums.get("total", 0)
+        inputs = (self.income, float(fixed), float(total - fixed), self._goals_text)
+        if inputs != self._simulation_inputs:
+            with stage("simulate"):
+                simulation = await simulate_goals_async(inputs[0], inputs[1], inputs[2], self.goals)
+            self._simulation_inputs, self._simulation_result = inputs, simulation
+        return self._simulation_result
+
+    async def insights(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Spending insights for the current state, shaped like generate_spending_insights.
+        The model is only called when the prompt differs from the one last answered
+        (cache_status "unchanged" otherwise); degraded answers are not kept.
+        """
+
+        with stage("prompt"):
+            analysis = self.analysis()
+            prompt = self.prompt()
+        simulation, (text, cache_status) = await asyncio.gather(
+            self._simulation(), self._answer_for(prompt, analysis, timeout)
+        )
+        if simulation is not None:
+            analysis["simulation"] = simulation
+        return {
+            "prompt": prompt,
+            "response": text,
+            "cache_status": cache_status,
+            "analysis": analysis
+        }
+
+    def state(self) -> Dict[str, Any]:
+        """JSON-serializable inputs and last answer, as persisted by SessionStore."""
+
+        return {
+            "income": self.income,
+            "expenses": self.expenses,
+            "goals": self.goals,
+            "user_type": self.user_type,
+            "revision": self.revision,
+            "answer": list(self._answer) if self._answer is not None else None,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "BudgetSession":
+        session = cls(state["income"], state["expenses"], state["goals"], state["user_type"])
+        session.revision = state["revision"]
+        session._answer = tuple(state["answer"]) if state.get("answer") else None
+        session.unsaved = False
+        return session
+
+class SessionStore:
+    """
+    Live BudgetSessions by id: an in-process LRU whose entries expire after
+    `ttl` seconds without use.
+
+    With a shared backend every save is written through, and a lookup
+    reads the stored state back: the live session is reused while its
+    revision matches, otherwise it is rebuilt from the stored inputs. That
+    lets any worker serve any session, and sessions survive restarts.
+    Concurrent edits to one session from different workers: the last save wins.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = 86400.0,
+                 backend: Optional[CacheBackend] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self._live: "OrderedDict[str, Tuple[BudgetSession, Optional[float]]]" = OrderedDict()
+        self._stats = {"created": 0, "saves": 0, "loads": 0, "evictions": 0, "expirations": 0}
+
+    def new_id(self) -> str:
+        """Id for a new session, which is stored by its first save."""
+
+        self._stats["created"] += 1
+        return uuid.uuid4().hex
+
+    def get(self, session_id: str) -> Optional[BudgetSession]:
+        entry = self._live.get(session_id)
+        session = None
+        if entry is not None:
+            if entry[1] is None or entry[1] > time.monotonic():
+                session = entry[0]
+            else:
+                del self._live[session_id]
+                self._stats["expirations"] += 1
+
+        if self.backend is not None:
+            state = self.backend.get(session_id)
+            if state is None:
+                self._live.pop(session_id, None)
+                return None
+            if session is None or session.revision != state["revision"]:
+                session = BudgetSession.from_state(state)
+                self._stats["loads"] += 1
+
+        if session is not None:
+            self._touch(session_id, session)
+        return session
+
+    def save(self, session_id: str, session: BudgetSession) -> None:
+        """Record a session's current inputs and answer under a new revision."""
+
+        session.revision = uuid.uuid4().hex
+        session.unsaved = False
+        self._stats["saves"] += 1
+        self._touch(session_id, session)
+        if self.backend is not None:
+            self.backend.set(session_id, session.state(), self.ttl)
+
+    def delete(self, session_id: str) -> bool:
+        found = self._live.pop(session_id, None) is not None
+        if self.backend is not None:
+            found = found or self.backend.get(session_id) is not None
+            self.backend.delete(session_id)
+        return found
+
+    def _touch(self, session_id: str, session: BudgetSession) -> None:
+        self._live[session_id] = (session, time.monotonic() + self.ttl if self.ttl else None)
+        self._live.move_to_end(session_id)
+        while len(self._live) > self.maxsize:
+            self._live.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "live": len(self._live)}
+
+@lru_cache(maxsize=1)
+def get_session_store() -> SessionStore:
+    """
+    Initialize the budget session store: up to SESSION_STORE_SIZE live sessions, each
+    dropped after SESSION_TTL idle seconds. Set SESSION_STORE_BACKEND=sqlite to persist
+    sessions to SESSION_STORE_PATH, shared between workers and kept across restarts.
+    """
+    backend = None
+    if os.getenv("SESSION_STORE_BACKEND", "").lower() == "sqlite":
+        backend = SQLiteCacheBackend(os.getenv("SESSION_STORE_PATH", "sessions.sqlite3"), table="sessions")
+
+    return SessionStore(
+        maxsize=int(os.getenv("SESSION_STORE_SIZE", "10000")),
+        ttl=float(os.getenv("SESSION_TTL", "86400")),
+        backend=backend
+    )
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+from app.categories import FIXED_EXPENSE_CATEGORIES, MAX_GOAL_MONTHS, canonical_category, goal_deadline
+
+# Paths are simulated in blocks of at most this many month x path cells, bounding memory for long horizons
+BLOCK_CELLS = 1 << 21
+
+# Longest goal horizon simulated, in months
+MAX_HORIZON_MONTHS = MAX_GOAL_MONTHS
+
+# Fewest paths a long horizon is cut down to by SIMULATION_MAX_CELLS
+MIN_PATHS = 1000
+
+@lru_cache(maxsize=1)
+def get_simulation_config() -> Dict[str, Any]:
+    """
+    Goal simulation defaults: SIMULATION_PATHS Monte Carlo paths, monthly income and
+    variable-expense volatility (SIMULATION_INCOME_VOLATILITY, SIMULATION_EXPENSE_VOLATILITY,
+    as a fraction of the mean), SIMULATION_ANNUAL_RATE earned on savings, and
+    SIMULATION_PROCESSES worker processes for simulate_portfolio and batch requests (0: none).
+    SIMULATION_MAX_CELLS bounds the month x path cells one simulation draws: long horizons
+    get fewer paths (down to MIN_PATHS), keeping a request's cost flat.
+    """
+    return {
+        "enabled": os.getenv("SIMULATION_ENABLED", "true").lower() not in ("0", "false", "no"),
+        "paths": int(os.getenv("SIMULATION_PATHS", "10000")),
+        "income_volatility": float(os.getenv("SIMULATION_INCOME_VOLATILITY", "0.05")),
+        "expense_volatility": float(os.getenv("SIMULATION_EXPENSE_VOLATILITY", "0.15")),
+        "annual_rate": float(os.getenv("SIMULATION_ANNUAL_RATE", "0.04")),
+        "processes": int(os.getenv("SIMULATION_PROCESSES", "0")),
+        "max_cells": int(os.getenv("SIMULATION_MAX_CELLS", "1500000")),
+    }
+
+def split_fixed(expenses: Dict[str, float]):
+    """(fixed, variable) monthly spend: fixed categories are simulated without volatility."""
+
+    fixed = sum(amount for label, amount in expenses.items() if canonical_category(label) in FIXED_EXPENSE_CATEGORIES)
+    return fixed, sum(expenses.values()) - fixed
+
+def default_seed(*inputs: Any) -> int:
+    """A seed derived from the inputs, so the same budget always gets the same projection."""
+
+    material = json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(material).digest()[:8], "big")
+
+def simulate_goals(income: float, fixed_expenses: float, variable_expenses: float,
+                   goals: Sequence[Dict[str, Any]], paths: Optional[int] = None, seed: Optional[int] = None,
+                   income_volatility: Optional[float] = None, expense_volatility: Optional[float] = None,
+                   annual_rate: Optional[float] = None, current_savings: float = 0.0) -> Dict[str, Any]:
+    """
+    Monte Carlo projection of a savings pot and the goals it funds.
+
+    Each path draws a month x path matrix of mean-preserving lognormal
+    income and variable-expense shocks; fixed expenses stay put. Monthly
+    surplus (negative surplus draws the pot down) compounds at
+    `annual_rate` / 12, computed for all months at once as discounted
+    cumulative sums. Goals compete for the one pot in deadline order: a
+    goal succeeds on a path when the pot at its deadline covers it after
+    every earlier goal has been paid out. balance_after_goals is what is
+    left at the horizon once all goals are paid. Unset parameters come
+    from get_simulation_config; without a seed one is derived from the inputs.
+    Deadlines are whole months, rounded up. `paths` in the result is the
+    number simulated, after the SIMULATION_MAX_CELLS bound.
+    """
+
+    config = get_simulation_config()
+    paths = config["paths"] if paths is None else paths
+    income_volatility = config["income_volatility"] if income_volatility is None else income_volatility
+    expense_volatility = config["expense_volatility"] if expense_volatility is None else expense_volatility
+    annual_rate = config["annual_rate"] if annual_rate is None else annual_rate
+
+    ordered = sorted(goals, key=lambda goal: float(goal["months"]))
+    deadlines = np.array([goal_deadline(goal["months"]) for goal in ordered], dtype=np.intp)
+    amounts = np.array([float(goal["amount"]) for goal in ordered])
+    horizon = int(max(deadlines.max(initial=0), 12))
+    paths = min(paths, max(MIN_PATHS, config["max_cells"] // horizon))
+    if seed is None:
+        seed = default_seed(income, fixed_expenses, variable_expenses, list(goals), paths,
+                            income_volatility, expense_volatility, annual_rate, current_savings)
+
+    rate = annual_rate / 12
+    growth = (1 + rate) ** np.arange(1, horizon + 1)
+    discount = (1 / growth).astype(np.float32)[:, None]
+    # Pot needed at goal k's deadline: every goal up to k, each paid out at its own deadline
+    paid_out = amounts[None, :] * growth[deadlines - 1, None] / growth[deadlines - 1][None, :]
+    needed = np.where(np.tri(len(ordered), dtype=bool), paid_out, 0.0).sum(axis=1)
+    # Fixed expenses are the same on every path: their discounted running total is one vector
+    fixed_discounted = fixed_expenses * np.cumsum(1 / growth)
+    rows = np.append(deadlines - 1, horizon - 1)
+
+    rng = np.random.default_rng(seed)
+    successes = np.zeros(len(ordered), dtype=np.int64)
+    all_met = 0
+    final_balances = np.empty(paths)
+    block = max(2, BLOCK_CELLS // horizon)
+    for start in range(0, paths, block):
+        count = min(block, paths - start)
+        # Antithetic pairs: each draw is also used negated, halving the draws and the variance
+        shocks = rng.standard_normal((2, horizon, (count + 1) // 2), dtype=np.float32)
+        shocks = np.concatenate((shocks, -shocks), axis=2)[:, :, :count]
+        monthly_income = np.exp(shocks[0] * income_volatility - income_volatility ** 2 / 2) * income
+        monthly_variable = np.exp(shocks[1] * expense_volatility - expense_volatility ** 2 / 2) * variable_expenses
+        # B_t = g_t * (B_0 + sum_{k<=t} s_k / g_k) with g_t = (1 + rate) ** t, needed only at the deadlines and the end
+        discounted = np.cumsum((monthly_income - monthly_variable) * discount, axis=0, dtype=np.float64)[rows]
+        balances = growth[rows, None] * (current_savings + discounted - fixed_discounted[rows, None])
+
+        met = balances[:-1] >= needed[:, None]
+        successes += met.sum(axis=1)
+        all_met += int(met.all(axis=0).sum())
+        final_balances[start:start + count] = balances[-1]
+
+    # What is left at the horizon once every goal has been paid out
+    final_balances -= (amounts * growth[-1] / growth[deadlines - 1]).sum()
+    p10, p50, p90 = np.percentile(final_balances, [10, 50, 90])
+    return {
+        "paths": paths,
+        "seed": seed,
+        "horizon_months": horizon,
+        "goals": [
+            {"name": goal["name"], "months": int(deadline), "amount": float(amount),
+             "probability": round(float(hits) / paths, 4)}
+            for goal, deadline, amount, hits in zip(ordered, deadlines, amounts, successes)
+        ],
+        "all_goals_probability": round(all_met / paths, 4) if len(ordered) else None,
+        "balance_after_goals": {"p10": round(float(p10), 2), "p50": round(float(p50), 2), "p90": round(float(p90), 2)},
+        "assumptions": {
+            "income_volatility": income_volatility,
+            "expense_volatility": expense_volatility,
+            "annual_rate": annual_rate,
+            "current_savings": current_savings,
+        },
+    }
+
+def simulate_budget(income: float, expenses: Dict[str, float], goals: Sequence[Dict[str, Any]],
+                    **options: Any) -> Dict[str, Any]:
+    """simulate_goals for a plain expense dict; `options` are simulate_goals keyword arguments."""
+
+    fixed, variable = split_fixed(expenses)
+    return simulate_goals(income, fixed, variable, goals, **options)
+
+@lru_cache(maxsize=1)
+def get_simulation_pool() -> Optional[ProcessPoolExecutor]:
+    """Worker processes for simulations (SIMULATION_PROCESSES > 0), started on first use; else None."""
+
+    processes = get_simulation_config()["processes"]
+    return ProcessPoolExecutor(max_workers=processes) if processes > 0 else None
+
+async def simulate_goals_async(income: float, fixed_expenses: float, variable_expenses: float,
+                               goals: Sequence[Dict[str, Any]], **options: Any) -> Dict[str, Any]:
+    """
+    simulate_goals off the event loop: in the process pool when SIMULATION_PROCESSES
+    is set (concurrent batch items then simulate in parallel), else on a thread.
+    """
+
+    pool = get_simulation_pool()
+    call = partial(simulate_goals, income, fixed_expenses, variable_expenses, list(goals), **options)
+    if pool is not None:
+        return await asyncio.get_running_loop().run_in_executor(pool, call)
+    return await asyncio.to_thread(call)
+
+def simulate_portfolio(budgets: Sequence[Dict[str, Any]], processes: Optional[int] = None,
+                       **options: Any) -> List[Dict[str, Any]]:
+    """
+    Simulate many budgets ({income, expenses, goals}), in order. They are spread
+    over `processes` worker processes when above 1, by default the shared
+    SIMULATION_PROCESSES pool if there is one.
+    """
+
+    calls = [partial(simulate_budget, budget["income"], budget["expenses"], budget.get("goals", []), **options)
+             for budget in budgets]
+    if processes is None:
+        pool, processes = get_simulation_pool(), get_simulation_config()["processes"]
+    else:
+        pool = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    if pool is None:
+        return [call() for call in calls]
+    try:
+        return list(pool.map(_call, calls, chunksize=max(1, len(calls) // (processes * 4))))
+    finally:
+        if pool is not get_simulation_pool():
+            pool.shutdown()
+
+def _call(call):
+    return call()
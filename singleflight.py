@@ -0,0 +1,67 @@
+import asyncio
+from typing import Dict, Any, Awaitable, Callable, Tuple
+
+class _LeaderCancelled(Exception):
+    """Set on a flight whose leader was cancelled, so followers retry instead of failing."""
+
+class SingleFlight:
+    """
+    Collapse concurrent async calls that share a key into one execution.
+
+    The first caller (the leader) runs the function; callers arriving while
+    it is in flight await the same outcome, result or exception, instead of
+    issuing their own call. If the leader is cancelled, a waiting follower
+    takes over. Nothing is remembered once the call completes. Flights are
+    tracked per event loop, since their futures belong to one.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run `func` once per in-flight key; returns (result, shared) where shared is True for followers."""
+
+        loop = asyncio.get_running_loop()
+        while True:
+            future = self._calls.get((loop, key))
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                # shield: a follower giving up must not cancel the leader's call for everyone else
+                return await asyncio.shield(future), True
+            except _LeaderCancelled:
+                self.coalesced -= 1
+
+        future = loop.create_future()
+        self._calls[(loop, key)] = future
+        self.leaders += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            self.failures += 1
+            future.set_exception(e)
+            # Mark the exception as retrieved in case no follower was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[(loop, key)]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """Executions started, calls that joined one in flight, and failed executions."""
+
+        return {"leaders": self.leaders, "coalesced": self.coalesced,
+                "failures": self.failures, "in_flight": self.in_flight()}
@@ -1,8 +1,10 @@
 import streamlit as st
-import requests
 import json
 import base64
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Tuple
+
+from app.api_client import BackendClient, create_backend_client
 
 # Configure page
 st.set_page_config(
@@ -13,8 +15,7 @@ st.set_page_config(
 )
 
 # Custom CSS for frosted glass effect
-def set_background():
-    st.markdown("""
+BACKGROUND_CSS = """
     <style>
     .main {
         padding: 2rem;
@@ -96,7 +97,12 @@ def set_background():
         margin: 1rem 0;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def set_background():
+    # Streamlit drops any element a rerun does not emit again, so the style tag
+    # is re-sent each run; it is a single small, unchanged element
+    st.markdown(BACKGROUND_CSS, unsafe_allow_html=True)
 
 def container_wrapper(func):
     """Decorator to wrap page content in styled container."""
@@ -108,22 +114,30 @@ def container_wrapper(func):
     return wrapper
 
 # API Configuration
-BACKEND_URL = "http://127.0.0.1:8000"
+@st.cache_resource
+def get_api_client() -> BackendClient:
+    """One pooled keep-alive client per server process, shared by every rerun and session."""
+    return create_backend_client()
 
 # Initialize session state
 if "page" not in st.session_state:
     st.session_state.page = "home"
 
-def make_api_request(endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    """Make API request to backend."""
-    try:
-        response = requests.post(f"{BACKEND_URL}/api/v1/{endpoint}", json=data)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.ConnectionError:
-        return {"error": "Could not connect to backend service. Please ensure the FastAPI server is running on port 8000."}
-    except Exception as e:
-        return {"error": f"Request failed: {str(e)}"}
+# Minimum seconds between redraws of a streaming answer
+STREAM_RENDER_INTERVAL = 0.05
+
+def make_api_request(endpoint: str, data: Dict[str, Any], cached: bool = False) -> Dict[str, Any]:
+    """Make API request to backend; with `cached`, an identical earlier request is answered locally."""
+    return get_api_client().post(endpoint, data, cached=cached)
+
+def fan_out_api_requests(calls: Dict[str, Tuple[str, Dict[str, Any]]],
+                         cached: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Make several API requests concurrently: {name: (endpoint, data)} -> {name: result}."""
+    return get_api_client().fan_out(calls, cached=cached)
+
+def stream_api_request(endpoint: str, data: Dict[str, Any], cached: bool = False):
+    """Stream a Server-Sent Events response from the backend, yielding (event, data) pairs."""
+    return get_api_client().stream(endpoint, data, cached=cached)
 
 # Page Navigation
 def show_home():
@@ -236,17 +250,25 @@ def show_generate_page():
     if st.button("Send", key="gen_send"):
         try:
             data = json.loads(user_input)
-            result = make_api_request("generate", data)
             
             st.markdown("### AI Response:")
-            if "error" in result:
-                st.error(result["error"])
-            else:
-                # Display the response in a formatted way
-                if "response" in result:
-                    st.markdown(result["response"])
-                else:
-                    st.json(result)
+            # Render tokens as they arrive instead of waiting for the full answer
+            placeholder = st.empty()
+            tokens = []
+            last_render = 0.0
+            for event, payload in stream_api_request("generate/stream", data, cached=True):
+                if event == "error":
+                    st.error(payload.get("detail", "Request failed"))
+                    break
+                if "token" in payload:
+                    tokens.append(payload["token"])
+                    # Redraw at a bounded rate: re-rendering the markdown per token costs
+                    # time quadratic in the answer length
+                    now = time.monotonic()
+                    if now - last_render >= STREAM_RENDER_INTERVAL:
+                        placeholder.markdown("".join(tokens) + "▌")
+                        last_render = now
+            placeholder.markdown("".join(tokens))
         
         except json.JSONDecodeError:
             st.error("Please enter valid JSON format")
@@ -281,10 +303,22 @@ def show_budget_summary_page():
     user_input = st.text_area("Enter JSON with your budget information:", value=sample_budget, height=200)
     st.markdown('</div>', unsafe_allow_html=True)
     
+    with_insights = st.checkbox("Also analyze spending patterns", key="budget_insights")
+    
     if st.button("Send", key="budget_send"):
         try:
             data = json.loads(user_input)
-            result = make_api_request("budget-summary", data)
+            if with_insights:
+                # Both analyses run at once over the shared connection pool
+                insights_data = {"income": data.get("income"), "expenses": data.get("expenses"),
+                                 "goals": data.get("goals", []), "user_type": data.get("user_type", "general")}
+                results = fan_out_api_requests({"summary": ("budget-summary", data),
+                                                "insights": ("spending-insights", insights_data)},
+                                               cached=True)
+                result = results["summary"]
+            else:
+                results = {}
+                result = make_api_request("budget-summary", data, cached=True)
             
             st.markdown("### Budget Analysis:")
             if "error" in result:
@@ -295,6 +329,16 @@ def show_budget_summary_page():
                     st.markdown(result["summary"]["response"])
                 else:
                     st.json(result)
+            
+            if "insights" in results:
+                insights = results["insights"]
+                st.markdown("### Spending Analysis:")
+                if "error" in insights:
+                    st.error(insights["error"])
+                elif "insights" in insights and "response" in insights["insights"]:
+                    st.markdown(insights["insights"]["response"])
+                else:
+                    st.json(insights)
         
         except json.JSONDecodeError:
             st.error("Please enter valid JSON format")
@@ -335,7 +379,7 @@ def show_spending_insights_page():
     if st.button("Send", key="spending_send"):
         try:
             data = json.loads(user_input)
-            result = make_api_request("spending-insights", data)
+            result = make_api_request("spending-insights", data, cached=True)
             
             st.markdown("### Spending Analysis:")
             if "error" in result:
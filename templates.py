@@ -0,0 +1,366 @@
+import keyword
+import logging
+import os
+import string
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Built-in prompt templates (str.format syntax). Any of them can be overridden
+# by a `<name>.txt` file in PROMPT_TEMPLATE_DIR, which is picked up without a restart.
+DEFAULT_TEMPLATES = {
+    "simple": """
+{context}
+
+User Question: {user_input}
+
+Please respond clearly and concisely with actionable financial advice. Keep your response focused on personal finance topics only.
+""",
+    "nlu": """
+You are a personal finance assistant. {sentiment_context}
+
+{persona_instruction}
+
+Context: {keyword_context}
+{entity_context}
+
+User Question: {user_text}
+
+Provide clear, actionable financial advice. Focus only on personal finance topics and avoid medical, legal, or therapeutic advice.
+""",
+    "conversation": """
+You are a personal finance assistant. {sentiment_context}
+
+{persona_instruction}
+
+Conversation so far:
+{history}
+
+Context: {keyword_context}
+{entity_context}
+
+User Question: {user_text}
+
+Answer the latest question, using the conversation for context. Provide clear, actionable financial advice. Focus only on personal finance topics and avoid medical, legal, or therapeutic advice.
+""",
+    "student_budget": """
+Create a student-friendly budget summary:
+
+FINANCIAL SNAPSHOT:
+- Monthly Income: {currency}{income:,.2f}
+- Annual Income: {currency}{annual_income:,.2f}
+- Total Monthly Expenses: {currency}{total_expenses:,.2f}
+- After Expenses: {currency}{disposable_income:,.2f}
+- Savings Goal: {currency}{savings_goal:,.2f}
+- Surplus After Savings: {currency}{surplus_after_savings:,.2f}
+
+TOP SPENDING CATEGORIES:
+{top_expenses}
+
+Please provide a summary with these 5 sections in order:
+1. **Top Spending Categories** (list the 2 highest)
+2. **Money-Saving Tips** (3-4 practical suggestions)
+3. **Summary** (2-3 sentences about their financial situation)
+4. **Tips** (2-3 actionable next steps)
+5. **Conclusion** (encouraging closing statement)
+
+Keep the language simple and encouraging for a student audience.
+""",
+    "professional_budget": """
+Create a professional budget analysis:
+
+EXECUTIVE SUMMARY:
+- Monthly Income: {currency}{income:,.2f}
+- Annual Income: {currency}{annual_income:,.2f}
+- Total Monthly Expenses: {currency}{total_expenses:,.2f}
+- Net Disposable Income: {currency}{disposable_income:,.2f}
+- Target Savings: {currency}{savings_goal:,.2f}
+- Available Surplus: {currency}{surplus_after_savings:,.2f}
+
+EXPENSE ALLOCATION:
+{top_expenses}
+
+Provide analysis with these sections:
+1. **Top 3 Spending Categories** (with strategic insights)
+2. **Optimization Strategies** (3-4 professional recommendations)
+3. **Financial Health Summary** (analytical overview)
+4. **Strategic Recommendations** (growth-focused advice)
+5. **Professional Takeaway** (key actionable insight)
+
+Use professional language and focus on strategic financial planning.
+""",
+    "spending_insights": """
+Generate comprehensive spending insights for a {user_type}:
+
+# FINANCIAL DATA ANALYSIS
+
+## Income & Expense Overview
+- Monthly Income: ${income:,.2f}
+- Total Monthly Expenses: ${total_expenses:,.2f}
+- Monthly Surplus: ${surplus:,.2f}
+- Savings Rate: {savings_rate:.1f}%
+
+## Expense Breakdown
+Fixed Expenses (${fixed_total:,.2f}):
+{fixed_expenses}
+
+Variable Expenses (${variable_total:,.2f}):
+{variable_expenses}
+
+## Financial Goals
+{goal_analysis}
+
+## Benchmarks & Risk Analysis
+- Housing ratio: {housing_ratio:.1f}% (recommended: <30%)
+- Transportation: {transportation_ratio:.1f}% (recommended: <15%)
+- Food spending: {food_ratio:.1f}% (recommended: <12%)
+
+Provide detailed analysis in these 8 structured sections:
+
+1. **Spending Pattern Analysis** - Fixed vs Variable breakdown
+2. **Category Deep Dive** - Needs vs Wants classification  
+3. **Benchmark Comparison** - How expenses compare to recommended percentages
+4. **Goal Feasibility** - Analysis of financial goals achievability
+5. **Risk Assessment** - Identify concerning spending ratios
+6. **Optimization Opportunities** - Specific areas for improvement
+7. **Action Plan** - 3-4 concrete next steps
+8. **Long-term Strategy** - Forward-looking recommendations
+
+Use specific numbers from the data and provide actionable insights.
+""",
+    "budget_summary": """
+    Create a financial summary for a {user_type} with:
+    - Monthly Income: {currency}{income:,.2f}
+    - Total Monthly Expenses: {currency}{total_expenses:,.2f}
+    - Savings Goal: {currency}{savings_goal:,.2f}
+    - Disposable Income: {currency}{disposable_income:,.2f}
+    
+    Expense Breakdown:
+    {expense_breakdown}
+    
+    Provide budget summary with insights and recommendations.
+    """,
+    "spending_overview": """
+    Analyze spending behavior for:
+    - Income: ${income:,.2f}
+    - Total Expenses: ${total_expenses:,.2f}
+    - Monthly Surplus: ${surplus:,.2f}
+    - Goals: {goals}
+    
+    Provide detailed spending insights and recommendations.
+    """,
+    # Degraded answers, served without the model when Watsonx is unavailable or the request deadline is near
+    "fallback_generate": """Our advice service is busy right now, so here is some general guidance{topic_note}:
+
+- Track your spending for a month so you know where your money goes.
+- Build an emergency fund that covers three to six months of expenses.
+- Pay down high-interest debt before investing.
+- Automate saving a fixed share of every paycheck.
+
+Please ask again in a moment for advice tailored to your question.""",
+    "fallback_budget_summary": """Here is a quick summary of your budget while our advice service is busy:
+
+- Monthly income: {currency}{income:,.2f}
+- Monthly expenses: {currency}{total_expenses:,.2f}
+- Left after expenses: {currency}{disposable_income:,.2f}
+- Savings goal: {currency}{savings_goal:,.2f}
+
+{savings_note}
+
+Please try again in a moment for a full, personalised summary.""",
+    "fallback_spending_insights": """Here is a quick look at your spending while our advice service is busy:
+
+- Monthly income: ${income:,.2f}
+- Monthly expenses: ${total_expenses:,.2f}
+- Monthly surplus: ${surplus:,.2f}
+- Savings rate: {savings_rate:.1f}%
+
+{goals_note}
+
+Please try again in a moment for detailed insights.""",
+}
+
+# Interned persona and sentiment fragments, shared by every prompt that uses them
+PERSONA_CONTEXT = {persona: sys.intern(text) for persona, text in {
+    "student": "You are a helpful financial advisor speaking to a college student. Use simple language and focus on practical, low-cost solutions.",
+    "professional": "You are a financial advisor for working professionals. Provide strategic advice and consider more complex financial instruments.",
+    "general": "You are a helpful personal finance assistant. Provide clear, actionable advice."
+}.items()}
+
+PERSONA_INSTRUCTIONS = {persona: sys.intern(text) for persona, text in {
+    "student": "Tailor your advice for a college student with limited income and simple financial needs.",
+    "professional": "Provide advice suitable for a working professional with more complex financial goals.",
+    "general": "Provide advice suitable for the general population."
+}.items()}
+DEFAULT_PERSONA_INSTRUCTION = sys.intern("Provide helpful financial advice.")
+
+SENTIMENT_CONTEXT = {label: sys.intern(text) for label, text in {
+    "negative": "The user seems concerned or stressed about their financial situation. Provide reassuring and supportive advice.",
+    "positive": "The user appears optimistic about their financial situation. Provide encouraging guidance to maintain their momentum.",
+    "neutral": "Provide balanced and objective financial advice."
+}.items()}
+
+class PromptTemplate:
+    """
+    A template compiled once into static text segments and formatted slots.
+
+    The segments and slots are turned into a generated f-string function, so
+    rendering costs the same as a hand-written f-string and never re-parses
+    the template source.
+    """
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        self.segments: List[str] = []
+        self.slots: List[Tuple[str, str]] = []
+
+        literal = []
+        for text, field, spec, conversion in string.Formatter().parse(source):
+            literal.append(text)
+            if field is None:
+                continue
+            if (not field.isidentifier() or keyword.iskeyword(field) or field.startswith("_")
+                    or conversion or any(c in (spec or "") for c in "{}'\"\\")):
+                raise ValueError(f"Template '{name}': unsupported placeholder {{{field}}}")
+            self.segments.append(sys.intern("".join(literal)))
+            self.slots.append((field, spec or ""))
+            literal = []
+        self.segments.append(sys.intern("".join(literal)))
+        self.fields = frozenset(field for field, _ in self.slots)
+        self._render = self._compile()
+
+    def _compile(self) -> Callable[..., str]:
+        body = []
+        for i, (field, spec) in enumerate(self.slots):
+            body.append(f"{{_seg{i}}}{{{field}{':' + spec if spec else ''}}}")
+        body.append(f"{{_seg{len(self.slots)}}}")
+        params = "".join(f"{field}, " for field in sorted(self.fields))
+        code = f"def _render(*, {params}**_unused):\n    return f{''.join(body)!r}\n"
+        namespace = {f"_seg{i}": segment for i, segment in enumerate(self.segments)}
+        exec(compile(code, f"<prompt template {self.name}>", "exec"), namespace)
+        return namespace["_render"]
+
+    def render(self, **values: Any) -> str:
+        """Fill the slots; only the slot values are formatted, static text is reused as-is."""
+
+        return self._render(**values)
+
+class TemplateRegistry:
+    """
+    Compiled prompt templates by name.
+
+    Overrides in `template_dir` are checked at most every `reload_interval`
+    seconds and recompiled when their mtime changes; deleting an override
+    restores the built-in template. An override that fails to compile, or
+    uses placeholders the built-in template does not have, is logged and
+    ignored, and the last good version stays in use.
+    """
+
+    def __init__(self, defaults: Dict[str, str], template_dir: Optional[str] = None,
+                 reload_interval: float = 2.0):
+        self.defaults = defaults
+        self.template_dir = template_dir
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._templates = {name: PromptTemplate(name, source) for name, source in defaults.items()}
+        # Overrides may only use the placeholders the built-in template is rendered with
+        self._default_fields = {name: template.fields for name, template in self._templates.items()}
+        self._mtimes: Dict[str, Optional[float]] = {name: None for name in defaults}
+        self._last_check = 0.0
+        self.reload()
+
+    def reload(self) -> None:
+        """Recompile any template whose override file was added, changed or removed."""
+
+        with self._lock:
+            self._last_check = time.monotonic()
+            if not self.template_dir:
+                return
+            for name in self.defaults:
+                path = os.path.join(self.template_dir, f"{name}.txt")
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    mtime = None
+                if mtime == self._mtimes[name]:
+                    continue
+                # Recorded even when the override is rejected, so a bad file is reported once, not on every check
+                self._mtimes[name] = mtime
+                if mtime is None:
+                    self._templates[name] = PromptTemplate(name, self.defaults[name])
+                    continue
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        template = PromptTemplate(name, f.read())
+                    unknown = template.fields - self._default_fields[name]
+                    if unknown:
+                        raise ValueError(f"Template '{name}': unknown placeholders {sorted(unknown)}")
+                except (OSError, UnicodeDecodeError, ValueError) as e:
+                    # One broken override must not take down the other prompts: keep the last good version
+                    logger.warning("Ignoring prompt template override %s: %s", path, e)
+                    continue
+                self._templates[name] = template
+
+    def get(self, name: str) -> PromptTemplate:
+        if self.template_dir and time.monotonic() - self._last_check >= self.reload_interval:
+            self.reload()
+        return self._templates[name]
+
+    def render(self, name: str, **values: Any) -> str:
+        return self.get(name).render(**values)
+
+@lru_cache(maxsize=1)
+def get_template_registry() -> TemplateRegistry:
+    """
+    Compile all prompt templates.
+    PROMPT_TEMPLATE_DIR enables hot-reloadable `<name>.txt` overrides.
+    """
+    return TemplateRegistry(
+        DEFAULT_TEMPLATES,
+        template_dir=os.getenv("PROMPT_TEMPLATE_DIR") or None,
+        reload_interval=float(os.getenv("PROMPT_TEMPLATE_RELOAD_SECONDS", "2"))
+    )
+
+def render_prompt(name: str, **values: Any) -> str:
+    """Render a registered prompt template."""
+    return get_template_registry().render(name, **values)
+
+def expense_budget_bytes() -> int:
+    """Byte budget for a single rendered expense list (PROMPT_EXPENSE_BYTES)."""
+    return int(os.getenv("PROMPT_EXPENSE_BYTES", "4096"))
+
+def fit_expense_lines(items: Sequence[Tuple[str, float]], format_line: Callable[[str, float], str],
+                      format_omitted: Callable[[int, float], str],
+                      max_bytes: Optional[int] = None) -> str:
+    """
+    Render one line per (category, amount), keeping the joined text within `max_bytes`.
+
+    Lists that fit are returned unchanged. Otherwise the largest amounts are
+    kept (ties broken by name, so the result is deterministic), shown in
+    their original order, followed by one line summarizing what was dropped.
+    """
+
+    max_bytes = expense_budget_bytes() if max_bytes is None else max_bytes
+    lines = [format_line(cat, amt) for cat, amt in items]
+    sizes = [len(line.encode("utf-8")) + 1 for line in lines]
+    if sum(sizes) <= max_bytes + 1:
+        return "\n".join(lines)
+
+    order = sorted(range(len(items)), key=lambda i: (-items[i][1], items[i][0]))
+    budget = max_bytes - len(format_omitted(len(items), sum(amt for _, amt in items)).encode("utf-8"))
+    kept = set()
+    for i in order:
+        if sizes[i] > budget:
+            break
+        kept.add(i)
+        budget -= sizes[i]
+
+    omitted_total = sum(amt for i, (_, amt) in enumerate(items) if i not in kept)
+    selected = [lines[i] for i in range(len(lines)) if i in kept]
+    selected.append(format_omitted(len(items) - len(kept), omitted_total))
+    return "\n".join(selected)
@@ -0,0 +1,36 @@
+"""
+Cold-start budget: `import main` in a fresh interpreter must stay under STARTUP_BUDGET_MS.
+
+Run from the directory `main` is imported from (as the benchmarks are):
+
+    python -m pytest tests/test_startup.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+# Default when STARTUP_BUDGET_MS is unset or empty; about 1.7x a cold import on one slow core
+DEFAULT_BUDGET_MS = 1500.0
+RUNS = 3
+
+PROBE = ("import time\n"
+         "start = time.perf_counter()\n"
+         "import main\n"
+         "print(time.perf_counter() - start)\n")
+
+def import_main_ms() -> float:
+    result = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True,
+                            cwd=os.getcwd(), check=True)
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+def test_import_main_within_budget():
+    budget = float(os.getenv("STARTUP_BUDGET_MS") or DEFAULT_BUDGET_MS)
+    median = statistics.median(import_main_ms() for _ in range(RUNS))
+    assert median <= budget, f"import main took {median:.1f} ms, budget {budget:.0f} ms"
+
+def test_import_main_leaves_heavy_modules_unloaded():
+    probe = "import main, sys\nprint(sorted(name for name in ('numpy', 'httpx') if name in sys.modules))\n"
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                            cwd=os.getcwd(), check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
@@ -1,137 +1,100 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from app.ibm_api import analyze_nlu
+from app.templates import (
+    PERSONA_CONTEXT, PERSONA_INSTRUCTIONS, DEFAULT_PERSONA_INSTRUCTION, SENTIMENT_CONTEXT,
+    render_prompt, fit_expense_lines
+)
 
 def build_simple_prompt(user_input: str, persona: str = "general") -> str:
     """Build a simple prompt without NLU enrichment."""
     
-    persona_context = {
-        "student": "You are a helpful financial advisor speaking to a college student. Use simple language and focus on practical, low-cost solutions.",
-        "professional": "You are a financial advisor for working professionals. Provide strategic advice and consider more complex financial instruments.",
-        "general": "You are a helpful personal finance assistant. Provide clear, actionable advice."
-    }
-    
-    context = persona_context.get(persona.lower(), persona_context["general"])
+    context = PERSONA_CONTEXT.get(persona.lower(), PERSONA_CONTEXT["general"])
     
-    return f"""
-{context}
-
-User Question: {user_input}
+    return render_prompt("simple", context=context, user_input=user_input)
 
-Please respond clearly and concisely with actionable financial advice. Keep your response focused on personal finance topics only.
-"""
-
-def build_prompt_with_nlu(user_text: str, persona: str = "general") -> str:
-    """Build an enriched prompt using NLU analysis."""
+def _nlu_prompt_values(user_text: str, persona: str, nlu_analysis: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Template slot values derived from the question's NLU analysis."""
     
     # Get NLU insights
-    nlu_analysis = analyze_nlu(user_text)
+    if nlu_analysis is None:
+        nlu_analysis = analyze_nlu(user_text)
     
     sentiment = nlu_analysis.get("sentiment", {}).get("document", {})
     keywords = [kw["text"] for kw in nlu_analysis.get("keywords", [])]
     entities = [ent["text"] for ent in nlu_analysis.get("entities", [])]
     
     # Build context-aware prompt
-    sentiment_context = ""
-    if sentiment.get("label") == "negative":
-        sentiment_context = "The user seems concerned or stressed about their financial situation. Provide reassuring and supportive advice."
-    elif sentiment.get("label") == "positive":
-        sentiment_context = "The user appears optimistic about their financial situation. Provide encouraging guidance to maintain their momentum."
-    else:
-        sentiment_context = "Provide balanced and objective financial advice."
+    sentiment_context = SENTIMENT_CONTEXT.get(sentiment.get("label"), SENTIMENT_CONTEXT["neutral"])
     
     keyword_context = f"Key topics mentioned: {', '.join(keywords)}" if keywords else "General financial inquiry"
     entity_context = f"Important details: {', '.join(entities)}" if entities else ""
     
-    persona_instruction = {
-        "student": "Tailor your advice for a college student with limited income and simple financial needs.",
-        "professional": "Provide advice suitable for a working professional with more complex financial goals.",
-        "general": "Provide advice suitable for the general population."
-    }.get(persona.lower(), "Provide helpful financial advice.")
+    persona_instruction = PERSONA_INSTRUCTIONS.get(persona.lower(), DEFAULT_PERSONA_INSTRUCTION)
     
-    return f"""
-You are a personal finance assistant. {sentiment_context}
-
-{persona_instruction}
-
-Context: {keyword_context}
-{entity_context}
+    return {
+        "sentiment_context": sentiment_context,
+        "persona_instruction": persona_instruction,
+        "keyword_context": keyword_context,
+        "entity_context": entity_context,
+        "user_text": user_text
+    }
 
-User Question: {user_text}
+def build_prompt_with_nlu(user_text: str, persona: str = "general",
+                          nlu_analysis: Optional[Dict[str, Any]] = None) -> str:
+    """Build an enriched prompt using NLU analysis.
+    
+    Pass the request's existing ``nlu_analysis`` to avoid analyzing the same
+    text twice; it is only computed here when the caller has none.
+    """
+    
+    return render_prompt("nlu", **_nlu_prompt_values(user_text, persona, nlu_analysis))
 
-Provide clear, actionable financial advice. Focus only on personal finance topics and avoid medical, legal, or therapeutic advice.
-"""
+def build_conversation_prompt(user_text: str, history: str, persona: str = "general",
+                              nlu_analysis: Optional[Dict[str, Any]] = None) -> str:
+    """Build an enriched prompt for a follow-up question, with the conversation's rendered history."""
+    
+    return render_prompt("conversation", history=history, **_nlu_prompt_values(user_text, persona, nlu_analysis))
 
-def build_student_prompt(income: float, expenses: Dict[str, float], savings_goal: float, 
-                        currency: str = "$") -> str:
-    """Build budget summary prompt for student persona."""
+def _persona_budget_values(income: float, expenses: Dict[str, float], savings_goal: float,
+                           currency: str, share_label: str) -> Dict[str, Any]:
+    """Slot values shared by the student and professional budget templates."""
     
     total_expenses = sum(expenses.values())
     disposable_income = income - total_expenses
-    annual_income = income * 12
     
-    # Calculate percentages
-    expense_percentages = {cat: (amt / total_expenses * 100) for cat, amt in expenses.items()}
+    # Percentages are only needed for the top categories; with no spend they are 0, as in compute_budget_metrics
     top_expenses = sorted(expenses.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    return f"""
-Create a student-friendly budget summary:
-
-FINANCIAL SNAPSHOT:
-- Monthly Income: {currency}{income:,.2f}
-- Annual Income: {currency}{annual_income:,.2f}
-- Total Monthly Expenses: {currency}{total_expenses:,.2f}
-- After Expenses: {currency}{disposable_income:,.2f}
-- Savings Goal: {currency}{savings_goal:,.2f}
-- Surplus After Savings: {currency}{disposable_income - savings_goal:,.2f}
-
-TOP SPENDING CATEGORIES:
-{chr(10).join([f"- {cat}: {currency}{amt:,.2f} ({expense_percentages[cat]:.1f}% of expenses)" for cat, amt in top_expenses])}
-
-Please provide a summary with these 5 sections in order:
-1. **Top Spending Categories** (list the 2 highest)
-2. **Money-Saving Tips** (3-4 practical suggestions)
-3. **Summary** (2-3 sentences about their financial situation)
-4. **Tips** (2-3 actionable next steps)
-5. **Conclusion** (encouraging closing statement)
+    share = lambda amt: amt / total_expenses * 100 if total_expenses else 0.0
+    top_lines = fit_expense_lines(
+        top_expenses,
+        lambda cat, amt: f"- {cat}: {currency}{amt:,.2f} ({share(amt):.1f}% of {share_label})",
+        lambda count, amt: f"- ... {count} more categories: {currency}{amt:,.2f}"
+    )
+    
+    return {
+        "currency": currency,
+        "income": income,
+        "annual_income": income * 12,
+        "total_expenses": total_expenses,
+        "disposable_income": disposable_income,
+        "savings_goal": savings_goal,
+        "surplus_after_savings": disposable_income - savings_goal,
+        "top_expenses": top_lines
+    }
 
-Keep the language simple and encouraging for a student audience.
-"""
+def build_student_prompt(income: float, expenses: Dict[str, float], savings_goal: float, 
+                        currency: str = "$") -> str:
+    """Build budget summary prompt for student persona."""
+    
+    return render_prompt("student_budget",
+                         **_persona_budget_values(income, expenses, savings_goal, currency, "expenses"))
 
 def build_professional_prompt(income: float, expenses: Dict[str, float], savings_goal: float, 
                              currency: str = "$") -> str:
     """Build budget summary prompt for professional persona."""
     
-    total_expenses = sum(expenses.values())
-    disposable_income = income - total_expenses
-    annual_income = income * 12
-    
-    # Calculate percentages
-    expense_percentages = {cat: (amt / total_expenses * 100) for cat, amt in expenses.items()}
-    top_expenses = sorted(expenses.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    return f"""
-Create a professional budget analysis:
-
-EXECUTIVE SUMMARY:
-- Monthly Income: {currency}{income:,.2f}
-- Annual Income: {currency}{annual_income:,.2f}
-- Total Monthly Expenses: {currency}{total_expenses:,.2f}
-- Net Disposable Income: {currency}{disposable_income:,.2f}
-- Target Savings: {currency}{savings_goal:,.2f}
-- Available Surplus: {currency}{disposable_income - savings_goal:,.2f}
-
-EXPENSE ALLOCATION:
-{chr(10).join([f"- {cat}: {currency}{amt:,.2f} ({expense_percentages[cat]:.1f}% of total expenses)" for cat, amt in top_expenses])}
-
-Provide analysis with these sections:
-1. **Top 3 Spending Categories** (with strategic insights)
-2. **Optimization Strategies** (3-4 professional recommendations)
-3. **Financial Health Summary** (analytical overview)
-4. **Strategic Recommendations** (growth-focused advice)
-5. **Professional Takeaway** (key actionable insight)
-
-Use professional language and focus on strategic financial planning.
-"""
+    return render_prompt("professional_budget",
+                         **_persona_budget_values(income, expenses, savings_goal, currency, "total expenses"))
 
 def build_persona_prompt(income: float, expenses: Dict[str, float], savings_goal: float, 
                         currency: str, user_type: str) -> str:
@@ -150,59 +113,41 @@ def build_spending_insight_prompt(monthly_data: Dict[str, Any]) -> str:
     goals = monthly_data.get("goals", [])
     user_type = monthly_data.get("user_type", "general")
     
-    total_expenses = sum(expenses.values())
-    surplus = income - total_expenses
+    # numpy is imported with app.analytics on first use, not at startup
+    from app.analytics import compute_user_metrics
+    metrics = compute_user_metrics(income, expenses, goals=goals)
+    total_expenses = metrics["total_expenses"]
+    surplus = metrics["surplus"]
     
     # Categorize expenses
-    fixed_expenses = {k: v for k, v in expenses.items() if k.lower() in ["rent", "insurance", "loan_payment"]}
+    fixed_expenses = {k: v for (k, v), fixed in zip(expenses.items(), metrics["fixed_mask"]) if fixed}
     variable_expenses = {k: v for k, v in expenses.items() if k not in fixed_expenses}
     
     # Calculate goal timelines
     goal_analysis = []
-    for goal in goals:
-        monthly_needed = goal["amount"] / goal["months"]
-        achievable = "Yes" if surplus >= monthly_needed else "No"
+    for goal, monthly_needed, goal_met in zip(goals, metrics["goal_monthly_needed"], metrics["goal_achievable"]):
+        achievable = "Yes" if goal_met else "No"
         goal_analysis.append(f"- {goal['name']}: ${goal['amount']} in {goal['months']} months (${monthly_needed:.2f}/month) - Achievable: {achievable}")
     
-    return f"""
-Generate comprehensive spending insights for a {user_type}:
-
-# FINANCIAL DATA ANALYSIS
-
-## Income & Expense Overview
-- Monthly Income: ${income:,.2f}
-- Total Monthly Expenses: ${total_expenses:,.2f}
-- Monthly Surplus: ${surplus:,.2f}
-- Savings Rate: {(surplus/income*100):.1f}%
-
-## Expense Breakdown
-Fixed Expenses (${sum(fixed_expenses.values()):,.2f}):
-{chr(10).join([f"  - {cat}: ${amt:,.2f}" for cat, amt in fixed_expenses.items()])}
-
-Variable Expenses (${sum(variable_expenses.values()):,.2f}):
-{chr(10).join([f"  - {cat}: ${amt:,.2f}" for cat, amt in variable_expenses.items()])}
-
-## Financial Goals
-{chr(10).join(goal_analysis) if goal_analysis else "- No specific goals provided"}
-
-## Benchmarks & Risk Analysis
-- Housing ratio: {(expenses.get('rent', 0)/income*100):.1f}% (recommended: <30%)
-- Transportation: {(expenses.get('transportation', 0)/income*100):.1f}% (recommended: <15%)
-- Food spending: {(expenses.get('food', 0)/income*100):.1f}% (recommended: <12%)
-
-Provide detailed analysis in these 8 structured sections:
-
-1. **Spending Pattern Analysis** - Fixed vs Variable breakdown
-2. **Category Deep Dive** - Needs vs Wants classification  
-3. **Benchmark Comparison** - How expenses compare to recommended percentages
-4. **Goal Feasibility** - Analysis of financial goals achievability
-5. **Risk Assessment** - Identify concerning spending ratios
-6. **Optimization Opportunities** - Specific areas for improvement
-7. **Action Plan** - 3-4 concrete next steps
-8. **Long-term Strategy** - Forward-looking recommendations
-
-Use specific numbers from the data and provide actionable insights.
-"""
+    format_line = lambda cat, amt: f"  - {cat}: ${amt:,.2f}"
+    format_omitted = lambda count, amt: f"  - ... {count} more categories: ${amt:,.2f}"
+    
+    return render_prompt(
+        "spending_insights",
+        user_type=user_type,
+        income=income,
+        total_expenses=total_expenses,
+        surplus=surplus,
+        savings_rate=metrics["savings_rate"],
+        fixed_total=metrics["fixed_total"],
+        fixed_expenses=fit_expense_lines(list(fixed_expenses.items()), format_line, format_omitted),
+        variable_total=metrics["variable_total"],
+        variable_expenses=fit_expense_lines(list(variable_expenses.items()), format_line, format_omitted),
+        goal_analysis="\n".join(goal_analysis) if goal_analysis else "- No specific goals provided",
+        housing_ratio=metrics["housing_ratio"],
+        transportation_ratio=metrics["transportation_ratio"],
+        food_ratio=metrics["food_ratio"]
+    )
 
 def extract_cleaned_response(response_text: str) -> str:
     """Clean and format the model response."""